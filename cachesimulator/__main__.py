@@ -1,8 +1,45 @@
 #!/usr/bin/env python3
 
 import argparse
+import importlib
+import sys
 
-from cachesimulator.simulator import Simulator
+from cachesimulator.compress import check_compress_policy
+from cachesimulator.trace import parse_trace_addr, read_trace
+
+# Subcommands which may be given in place of the simulation arguments, mapped
+# to the modules whose main functions run them with the remaining arguments;
+# the modules are only imported when their subcommand is run, since some
+# (such as the batch runner and the simulation service) pull in heavy
+# dependencies like multiprocessing and asyncio
+SUBCOMMANDS = {
+    "batch": "cachesimulator.batch",
+    "benchmark": "cachesimulator.benchmark",
+    "coherence": "cachesimulator.coherence",
+    "fuzz": "cachesimulator.fuzz",
+    "generate": "cachesimulator.tracegen",
+    "serve": "cachesimulator.service",
+    "snapshot": "cachesimulator.snapshot",
+    "sweep": "cachesimulator.sweep",
+    "tenants": "cachesimulator.tenants",
+    "timing": "cachesimulator.timing",
+    "tlb": "cachesimulator.tlb",
+    "update": "cachesimulator.incremental",
+}
+
+
+# Returns True if the given number is a positive power of two
+def is_power_of_two(num):
+    return num > 0 and num & (num - 1) == 0
+
+
+# Parses a single address given on the command line, reporting an invalid
+# address as an argparse error
+def parse_cli_addr(token):
+    try:
+        return parse_trace_addr(token)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error)) from None
 
 
 # Parse command-line arguments passed to the program
@@ -25,36 +62,196 @@ def parse_cli_args():
     )
 
     parser.add_argument(
+        "--block-size",
+        type=int,
+        help="the size of each block in bytes (overrides --num-words-per-block)",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    addr_group = parser.add_mutually_exclusive_group(required=True)
+
+    addr_group.add_argument(
         "--word-addrs",
         nargs="+",
-        type=int,
-        required=True,
-        help="one or more base-10 word addresses",
+        type=parse_cli_addr,
+        help="one or more base-10 (or 0x-prefixed hexadecimal) word addresses, "
+        "each less than 2**64",
+    )
+
+    addr_group.add_argument(
+        "--trace-file",
+        help="the path of a trace file listing the word addresses to simulate",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
     )
 
     parser.add_argument(
         "--num-addr-bits",
         type=int,
         default=1,
-        help="the number of bits in each given word address",
+        help="the number of bits in each given word address (addresses wider "
+        "than 64 bits are not supported)",
     )
 
     parser.add_argument(
         "--replacement-policy",
-        choices=("lru", "mru"),
+        choices=("lru", "mru", "opt"),
         default="lru",
         # Ignore argument case (e.g. "mru" and "MRU" are equivalent)
         type=str.lower,
-        help="the cache replacement policy (LRU or MRU)",
+        help="the cache replacement policy (LRU, MRU, or OPT)",
+    )
+
+    parser.add_argument(
+        "--compress",
+        action="store_true",
+        help="skip repeated loop iterations in the trace which are all hits",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="report the time and peak memory of each stage of the simulation",
     )
 
-    return parser.parse_args()
+    parser.add_argument(
+        "--profile-output",
+        help="the path of a file to which cProfile stats will be written",
+    )
+
+    parser.add_argument(
+        "--sample-interval",
+        type=int,
+        default=1,
+        help="simulate only every Nth set and extrapolate the statistics",
+    )
+
+    parser.add_argument(
+        "--output-format",
+        choices=("table", "jsonl", "csv", "binary"),
+        default="table",
+        help="the format of the results (defaults to human-readable tables)",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of the file to which results will be written "
+        "(defaults to stdout; requires a machine-readable --output-format)",
+    )
+
+    parser.add_argument(
+        "--stats-output",
+        help="the path of the file to which summary statistics will be written "
+        "(requires a machine-readable --output-format)",
+    )
+
+    cli_args = parser.parse_args()
+
+    if cli_args.output_format == "table":
+        if cli_args.output is not None or cli_args.stats_output is not None:
+            parser.error(
+                "--output and --stats-output require a machine-readable --output-format"
+            )
+    elif (
+        cli_args.compress
+        or cli_args.profile
+        or cli_args.profile_output
+        or cli_args.sample_interval > 1
+    ):
+        parser.error(
+            "--output-format {} cannot be combined with --compress, --profile, "
+            "or --sample-interval".format(cli_args.output_format)
+        )
+    if cli_args.sample_interval < 1:
+        parser.error("--sample-interval must be positive")
+    if cli_args.sample_interval > 1 and (
+        cli_args.compress or cli_args.profile or cli_args.profile_output
+    ):
+        parser.error(
+            "--sample-interval cannot be combined with --compress or --profile"
+        )
+
+    if cli_args.compress:
+        try:
+            check_compress_policy(cli_args.replacement_policy)
+        except ValueError as error:
+            parser.error(str(error))
+
+    if not is_power_of_two(cli_args.word_size):
+        parser.error("--word-size must be a power of two")
+    # The block size in bytes is only needed to determine the number of words
+    # per block
+    block_size = cli_args.block_size
+    del cli_args.block_size
+    if block_size is not None:
+        if not is_power_of_two(block_size) or block_size < cli_args.word_size:
+            parser.error(
+                "--block-size must be a power of two no smaller than --word-size"
+            )
+        cli_args.num_words_per_block = block_size // cli_args.word_size
+
+    return cli_args
 
 
 def main():
-    cli_args = parse_cli_args()
+    if len(sys.argv) > 1 and sys.argv[1] in SUBCOMMANDS:
+        importlib.import_module(SUBCOMMANDS[sys.argv[1]]).main(sys.argv[2:])
+        return
+    sim_args = vars(parse_cli_args())
+    trace_file = sim_args.pop("trace_file")
+    if trace_file is not None:
+        # The trace is read lazily, so that it is read and decoded within
+        # the profiled parse stage of the simulation
+        sim_args["word_addrs"] = read_trace(trace_file)
+    sample_interval = sim_args.pop("sample_interval")
+    output_format = sim_args.pop("output_format")
+    output = sim_args.pop("output")
+    stats_output = sim_args.pop("stats_output")
+    if sample_interval > 1 or output_format != "table":
+        # Neither sampled nor machine-readable results need the full
+        # simulator, nor support compression or profiling
+        del sim_args["num_addr_bits"], sim_args["compress"]
+        del sim_args["profile"], sim_args["profile_output"]
+    if sample_interval > 1:
+        from cachesimulator.sampling import run_sampled_simulation
+
+        run_sampled_simulation(**sim_args, sample_interval=sample_interval)
+        return
+    if output_format != "table":
+        from cachesimulator.output import run_output_simulation
+
+        run_output_simulation(
+            **sim_args,
+            output_format=output_format,
+            output=output,
+            stats_output=stats_output,
+        )
+        return
+    # The simulator is imported only once the arguments have been parsed, so
+    # that --help and invalid arguments are reported without loading it
+    from cachesimulator.simulator import Simulator
+
+    profile = sim_args.pop("profile")
+    profile_output = sim_args.pop("profile_output")
+    if profile or profile_output:
+        from cachesimulator.profiler import Profiler
+
+        profiler = Profiler(stats_path=profile_output)
+    else:
+        profiler = None
     sim = Simulator()
-    sim.run_simulation(**vars(cli_args))
+    sim.run_simulation(**sim_args, profiler=profiler)
 
 
 if __name__ == "__main__":
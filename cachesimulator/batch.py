@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from cachesimulator.compress import check_compress_policy
+from cachesimulator.resultcache import (
+    DEFAULT_MAX_CACHE_SIZE,
+    ResultCache,
+    get_default_cache_dir,
+)
+from cachesimulator.simulator import Simulator
+from cachesimulator.stats import SimulationStats
+from cachesimulator.trace import read_trace
+
+# The simulation parameters which may be given for each job in a manifest,
+# mapped to their default values (None if the parameter is required)
+JOB_PARAMS = {
+    "cache_size": None,
+    "num_blocks_per_set": 1,
+    "num_words_per_block": 1,
+    "replacement_policy": "lru",
+    "num_addr_bits": 1,
+    "word_size": 4,
+    "addr_unit": "word",
+    "compress": False,
+    "sample_interval": 1,
+}
+# The replacement policies a job may use (in any case, as with the
+# --replacement-policy option)
+REPLACEMENT_POLICIES = ("lru", "mru", "opt")
+
+
+# Reads the list of jobs from the given manifest; a manifest is a JSON Lines
+# file where each line is an object with a trace_file (relative to the
+# manifest), an optional name, and the simulation parameters for the job
+def read_manifest(manifest_path):
+    manifest_dir = Path(manifest_path).parent
+    jobs = []
+    with open(manifest_path) as manifest_file:
+        for line in manifest_file:
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            if "trace_file" in job:
+                job["trace_file"] = str(manifest_dir / job["trace_file"])
+            jobs.append(job)
+    return jobs
+
+
+# Retrieves the keyword arguments to pass to Simulator.simulate for the given
+# job, raising a ValueError if the job is invalid
+def get_job_sim_args(job):
+    if "trace_file" not in job:
+        raise ValueError("job has no trace_file")
+    unknown_params = set(job) - set(JOB_PARAMS) - {"trace_file", "name"}
+    if unknown_params:
+        raise ValueError(
+            "unknown job parameters: {}".format(", ".join(sorted(unknown_params)))
+        )
+    sim_args = {}
+    for param, default in JOB_PARAMS.items():
+        if param not in job and default is None:
+            raise ValueError("job has no {}".format(param))
+        sim_args[param] = job.get(param, default)
+    sim_args["replacement_policy"] = get_replacement_policy(
+        sim_args["replacement_policy"]
+    )
+    if sim_args["compress"]:
+        check_compress_policy(sim_args["replacement_policy"])
+    return sim_args
+
+
+# Retrieves the given replacement policy in lowercase, raising a ValueError
+# if it is not a known policy
+def get_replacement_policy(replacement_policy):
+    if (
+        not isinstance(replacement_policy, str)
+        or replacement_policy.lower() not in REPLACEMENT_POLICIES
+    ):
+        raise ValueError(
+            "unknown replacement policy: {!r} (expected one of {})".format(
+                replacement_policy, ", ".join(REPLACEMENT_POLICIES)
+            )
+        )
+    return replacement_policy.lower()
+
+
+# Simulates the given addresses with the given job parameters (as returned by
+# get_job_sim_args), returning the statistics of the simulation as a
+# dictionary; if a sample interval greater than 1 is given, only a sample of
+# the sets are simulated, and the statistics are extrapolated from them
+def simulate_job(word_addrs, sim_args):
+    sim_args = dict(sim_args)
+    sample_interval = sim_args.pop("sample_interval", 1)
+    if sample_interval > 1:
+        from cachesimulator.sampling import simulate_sampled_cache
+
+        del sim_args["num_addr_bits"], sim_args["compress"]
+        return simulate_sampled_cache(
+            word_addrs=word_addrs, sample_interval=sample_interval, **sim_args
+        ).to_dict()
+    refs, _ = Simulator().simulate(word_addrs=word_addrs, **sim_args)
+    return SimulationStats.from_refs(refs).to_dict()
+
+
+# Runs a single job (within a worker process), returning the statistics of
+# the simulation, the number of seconds it took, and whether the statistics
+# were retrieved from the given result cache (if any) rather than simulated
+def run_job(job, result_cache=None):
+    start_time = time.perf_counter()
+    sim_args = get_job_sim_args(job)
+    if result_cache is not None:
+        key = result_cache.get_key(job["trace_file"], sim_args)
+        stats = result_cache.get(key)
+        if stats is not None:
+            return stats, time.perf_counter() - start_time, True
+    stats = simulate_job(read_trace(job["trace_file"]), sim_args)
+    if result_cache is not None:
+        result_cache.put(key, stats)
+    return stats, time.perf_counter() - start_time, False
+
+
+# Runs all given jobs on a pool of worker processes, yielding the result of
+# each job as it completes; the failure of one job does not affect the others
+def run_jobs(jobs, num_workers=None, result_cache=None):
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            executor.submit(run_job, job, result_cache): (job_num, job)
+            for job_num, job in enumerate(jobs)
+        }
+        for future in as_completed(futures):
+            job_num, job = futures[future]
+            result = {"job": job_num, **job}
+            try:
+                (
+                    result["stats"],
+                    result["elapsed_time"],
+                    result["cached"],
+                ) = future.result()
+            except Exception as error:
+                result["error"] = "{}: {}".format(type(error).__name__, error)
+            yield result
+
+
+# Parse command-line arguments passed to the batch subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator batch",
+        description="simulate the jobs listed in a manifest in parallel",
+    )
+
+    parser.add_argument(
+        "manifest", help="the path of a JSON Lines manifest listing the jobs to run"
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of the JSON Lines results file (defaults to stdout)",
+    )
+
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="the number of worker processes (defaults to the number of CPUs)",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always simulate every job, ignoring and not storing cached results",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        help="the directory in which results are cached (defaults to {})".format(
+            get_default_cache_dir()
+        ),
+    )
+
+    parser.add_argument(
+        "--max-cache-size",
+        type=int,
+        default=DEFAULT_MAX_CACHE_SIZE // (1024 * 1024),
+        help="the maximum total size in MiB of all cached results",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    jobs = read_manifest(cli_args.manifest)
+    if cli_args.output is None:
+        results_file = sys.stdout
+    else:
+        results_file = open(cli_args.output, "w")
+
+    if cli_args.no_cache:
+        result_cache = None
+    else:
+        result_cache = ResultCache(
+            cli_args.cache_dir, max_size=cli_args.max_cache_size * 1024 * 1024
+        )
+
+    num_failed = 0
+    try:
+        results = run_jobs(
+            jobs, num_workers=cli_args.num_workers, result_cache=result_cache
+        )
+        for num_done, result in enumerate(results, start=1):
+            results_file.write(json.dumps(result) + "\n")
+            results_file.flush()
+            job_name = result.get("name", result.get("trace_file"))
+            if "error" in result:
+                num_failed += 1
+                status = "failed ({})".format(result["error"])
+            elif result["cached"]:
+                status = "done (cached)"
+            else:
+                status = "done"
+            print(
+                "[{}/{}] {}: {}".format(num_done, len(jobs), job_name, status),
+                file=sys.stderr,
+            )
+    finally:
+        if results_file is not sys.stdout:
+            results_file.close()
+
+    if num_failed:
+        sys.exit("{} of {} jobs failed".format(num_failed, len(jobs)))
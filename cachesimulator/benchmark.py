@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import argparse
+import time
+
+from cachesimulator.cache import Cache
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.kernel import CacheKernel
+from cachesimulator.simulator import Simulator
+from cachesimulator.table import Table, format_count, get_table_width
+from cachesimulator.tracegen import generate_trace
+
+# The names of all benchmark table columns
+BENCHMARK_COL_NAMES = ("Benchmark", "Workload", "Refs", "Refs/s", "Speedup")
+# The default number of references simulated by each benchmark
+DEFAULT_NUM_REFS = 20000
+# The numbers of blocks per set of the caches compared by the associativity
+# benchmark, from direct-mapped to fully associative
+BENCHMARK_ASSOCIATIVITIES = (1, 16, 256, 4096)
+
+
+# The time taken by a single benchmarked workload, optionally alongside the
+# time taken by a baseline implementation of the same workload
+class BenchmarkResult(object):
+    def __init__(self, name, workload, num_refs, elapsed_time, baseline_time=None):
+        self.name = name
+        self.workload = workload
+        self.num_refs = num_refs
+        self.elapsed_time = elapsed_time
+        self.baseline_time = baseline_time
+
+    def get_refs_per_sec(self):
+        return self.num_refs / self.elapsed_time
+
+    # Retrieves how many times faster the workload ran than the baseline, or
+    # None if there is no baseline
+    def get_speedup(self):
+        if self.baseline_time is None:
+            return None
+        return self.baseline_time / self.elapsed_time
+
+
+# Retrieves the number of seconds taken to call the given function
+def time_call(func, *args, **kwargs):
+    start_time = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start_time
+
+
+# Retrieves the geometry for the given cache dimensions and the references
+# for the given word addresses
+def get_benchmark_refs(word_addrs, cache_size, num_blocks_per_set, num_words_per_block):
+    geometry = CacheGeometry(
+        cache_size,
+        num_blocks_per_set,
+        num_words_per_block,
+        max_word_addr=max(word_addrs),
+    )
+    refs = Simulator().get_addr_refs(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    return geometry, refs
+
+
+# Compares reading references one at a time against reading them with
+# Cache.read_refs, which reads runs of references to the same block in bulk
+def benchmark_hit_runs(num_refs):
+    results = []
+    for workload in ("strided", "zipfian"):
+        word_addrs = list(generate_trace(workload, num_refs, num_words=4096, seed=0))
+        geometry, refs = get_benchmark_refs(
+            word_addrs, cache_size=1024, num_blocks_per_set=4, num_words_per_block=8
+        )
+        read_args = (geometry.num_blocks_per_set, geometry.num_words_per_block, "lru")
+
+        def read_refs_one_at_a_time(cache):
+            for ref in refs:
+                cache.read_ref(*read_args, ref)
+
+        baseline_time = time_call(
+            read_refs_one_at_a_time,
+            Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits),
+        )
+        elapsed_time = time_call(
+            Cache(
+                num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+            ).read_refs,
+            *read_args,
+            refs,
+        )
+        results.append(
+            BenchmarkResult("hit-runs", workload, num_refs, elapsed_time, baseline_time)
+        )
+    return results
+
+
+# Compares simulating traces directly against simulating them with
+# compression (as with --compress), which skips loop iterations which are all
+# hits; the loop-heavy trace should be faster to simulate when compressed, and
+# the matrix multiplication (which has too few loops to be worth compressing)
+# should be no slower
+def benchmark_compress(num_refs):
+    sim = Simulator()
+    results = []
+    for workload, word_addrs in (
+        ("strided", list(generate_trace("strided", num_refs, stride=2, num_words=64))),
+        ("matmul", list(generate_trace("matmul", num_refs, size=32))),
+    ):
+        sim_args = dict(
+            num_blocks_per_set=4,
+            num_words_per_block=4,
+            cache_size=256,
+            replacement_policy="lru",
+            num_addr_bits=1,
+            word_addrs=word_addrs,
+        )
+        results.append(
+            BenchmarkResult(
+                "compress",
+                workload,
+                num_refs,
+                time_call(sim.simulate, compress=True, **sim_args),
+                time_call(sim.simulate, **sim_args),
+            )
+        )
+    return results
+
+
+# Measures the throughput of the simulation kernel, and of reading references
+# one at a time into a Cache (which finds blocks using the tag index of each
+# set; see Cache.is_hit and Cache.set_block), for caches of the same size but
+# increasing associativity; since blocks are found and replaced in constant
+# time, the throughput of the kernel should not depend on the associativity
+def benchmark_associativity(num_refs):
+    num_blocks = max(BENCHMARK_ASSOCIATIVITIES)
+    # Uniformly random references to twice as many blocks as the cache holds
+    word_addrs = list(
+        generate_trace("uniform", num_refs, num_words=num_blocks * 2, seed=0)
+    )
+    results = []
+    for num_blocks_per_set in BENCHMARK_ASSOCIATIVITIES:
+        geometry, refs = get_benchmark_refs(
+            word_addrs,
+            cache_size=num_blocks,
+            num_blocks_per_set=num_blocks_per_set,
+            num_words_per_block=1,
+        )
+        kernel = CacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+            evict_mru=False,
+        )
+        results.append(
+            BenchmarkResult(
+                "associativity",
+                "{}-way".format(num_blocks_per_set),
+                num_refs,
+                time_call(kernel.read_addrs, word_addrs, 0, bytearray(num_refs)),
+            )
+        )
+
+        def read_refs_one_at_a_time(cache):
+            for ref in refs:
+                cache.read_ref(num_blocks_per_set, 1, "lru", ref)
+
+        results.append(
+            BenchmarkResult(
+                "associativity-cache",
+                "{}-way".format(num_blocks_per_set),
+                num_refs,
+                time_call(
+                    read_refs_one_at_a_time,
+                    Cache(
+                        num_sets=geometry.num_sets,
+                        num_index_bits=geometry.num_index_bits,
+                    ),
+                ),
+            )
+        )
+    return results
+
+
+# All available benchmarks, mapped to the functions which run them
+BENCHMARKS = {
+    "hit-runs": benchmark_hit_runs,
+    "compress": benchmark_compress,
+    "associativity": benchmark_associativity,
+}
+
+
+# Displays the results of all benchmarks which were run
+def display_results(results, table_width):
+    table = Table.create_stats_table("Benchmarks", BENCHMARK_COL_NAMES, table_width)
+
+    for result in results:
+        speedup = result.get_speedup()
+        table.rows.append(
+            (
+                result.name,
+                result.workload,
+                format_count(result.num_refs),
+                "{:,.0f}".format(result.get_refs_per_sec()),
+                "{:.2f}x".format(speedup) if speedup is not None else "n/a",
+            )
+        )
+
+    print(table)
+
+
+# Parse command-line arguments passed to the benchmark subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator benchmark",
+        description="measure the throughput of the simulator",
+    )
+
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help="the benchmarks to run (one or more of: {}; defaults to all)".format(
+            ", ".join(BENCHMARKS)
+        ),
+    )
+
+    parser.add_argument(
+        "--num-refs",
+        type=int,
+        default=DEFAULT_NUM_REFS,
+        help="the number of references simulated by each benchmark",
+    )
+
+    cli_args = parser.parse_args(args)
+    for name in cli_args.names:
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: {}".format(name))
+    return cli_args
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    results = []
+    for name in cli_args.names or BENCHMARKS:
+        results.extend(BENCHMARKS[name](cli_args.num_refs))
+    table_width = get_table_width()
+    print()
+    display_results(results, table_width)
+    print()
@@ -1,16 +1,36 @@
 #!/usr/bin/env python3
 
+import itertools
+import operator
+
 from cachesimulator.bin_addr import BinaryAddress
-from cachesimulator.reference import ReferenceCacheStatus
+from cachesimulator.kernel import NO_NEXT_USE, CacheKernel, OptimalCacheKernel
+from cachesimulator.reference import ReferenceBatch, ReferenceCacheStatus
 from cachesimulator.word_addr import WordAddress
 
+# Retrieves the tag of the given block (see Cache.get_tag_ways)
+get_block_tag = operator.itemgetter("tag")
+
 
 class Cache(dict):
     # Initializes the reference cache with a fixed number of sets
     def __init__(self, cache=None, num_sets=None, num_index_bits=0):
+        # The simulation kernel which last read a batch of references (see
+        # read_refs), and the parameters it was created for; the kernel is
+        # kept between batches, so that reading a batch costs no more than
+        # the batch itself, and is released once the cache is read by any
+        # other means
+        self.kernel = None
+        self.kernel_params = None
         # A list of recently ordered addresses, ordered from least-recently
-        # used to most
-        self.recently_used_addrs = []
+        # used to most (see recently_used_addrs)
+        self._recently_used_addrs = []
+        # The position of the next use of each address among the references
+        # being read, used by the optimal (OPT) replacement policy
+        self.next_uses = {}
+        # The set at each index, mapped to an index of that set which maps the
+        # tag of each of its blocks to the position (way) of the block
+        self.set_tag_ways = {}
 
         if cache is not None:
             self.update(cache)
@@ -21,74 +41,329 @@ def __init__(self, cache=None, num_sets=None, num_index_bits=0):
                 )
                 self[index] = []
 
+    # The recently-used addresses, which are only retrieved from the kernel
+    # (if any) when needed; addresses are removed once their blocks are
+    # replaced, so only resident blocks are tracked
+    @property
+    def recently_used_addrs(self):
+        if self.kernel is not None and self._recently_used_addrs is None:
+            num_index_bits, num_tag_bits = self.kernel_params[2:4]
+            self._recently_used_addrs = [
+                self.get_block_addr_id(block_addr, num_index_bits, num_tag_bits)
+                for block_addr in self.kernel.get_recently_used_blocks()
+            ]
+        return self._recently_used_addrs
+
+    @recently_used_addrs.setter
+    def recently_used_addrs(self, recently_used_addrs):
+        self.kernel = None
+        self._recently_used_addrs = recently_used_addrs
+
+    # Releases the kernel (if any), so that the cache can be read without it
+    def release_kernel(self):
+        if self.kernel is not None:
+            self.recently_used_addrs = self.recently_used_addrs
+
     # Every time we see an address, place it at the top of the
     # list of recently-seen addresses
     def mark_ref_as_last_seen(self, ref):
+        self.release_kernel()
         # The index and tag (not the offset) uniquely identify each address
         addr_id = (ref.index, ref.tag)
         if addr_id in self.recently_used_addrs:
             self.recently_used_addrs.remove(addr_id)
         self.recently_used_addrs.append(addr_id)
 
+    # Removes the given address from the recently-used addresses once its
+    # block has been replaced
+    def mark_addr_id_as_replaced(self, addr_id):
+        if addr_id in self.recently_used_addrs:
+            self.recently_used_addrs.remove(addr_id)
+
+    # Retrieves the tag index (see set_tag_ways) of the given set of blocks at
+    # the given key, so that finding a tag takes constant time however many
+    # blocks are in the set; the tag index is kept up to date by set_block, and
+    # is rebuilt whenever the set has been replaced or resized by other means.
+    # Since the blocks of a set may also be replaced in place, every tag in
+    # the index is checked against its block if check is True
+    def get_tag_ways(self, set_key, blocks, check=False):
+        indexed_blocks, tag_ways = self.set_tag_ways.get(set_key, (None, None))
+        if (
+            indexed_blocks is not blocks
+            or len(tag_ways) != len(blocks)
+            or (
+                check
+                and not all(
+                    map(
+                        operator.eq,
+                        map(tag_ways.get, map(get_block_tag, blocks)),
+                        itertools.count(),
+                    )
+                )
+            )
+        ):
+            tag_ways = {}
+            # If a tag somehow appears more than once, its first way is used
+            for way in reversed(range(len(blocks))):
+                tag_ways[blocks[way]["tag"]] = way
+            self.set_tag_ways[set_key] = (blocks, tag_ways)
+        return tag_ways
+
     # Returns True if a block at the given index and tag exists in the cache,
     # indicating a hit; returns False otherwise, indicating a miss
     def is_hit(self, addr_index, addr_tag):
         # Ensure that indexless fully associative caches are accessed correctly
         if addr_index is None:
-            blocks = self["0"]
+            set_key = "0"
         elif addr_index in self:
-            blocks = self[addr_index]
+            set_key = addr_index
         else:
             return False
 
-        for block in blocks:
-            if block["tag"] == addr_tag:
-                return True
+        blocks = self[set_key]
+        # A hit need only be confirmed against the block at its way, but a
+        # miss is checked against the entire set (which costs no more than
+        # the replacement which follows it)
+        way = self.get_tag_ways(set_key, blocks).get(addr_tag)
+        if way is not None and blocks[way]["tag"] == addr_tag:
+            return True
+        return addr_tag in self.get_tag_ways(set_key, blocks, check=True)
 
-        return False
-
-    # Iterate through the recently-used entries in reverse order for MRU
+    # Iterate through the recently-used entries in reverse order for MRU; for
+    # OPT, replace the block which will be used again furthest in the future
     def replace_block(self, blocks, replacement_policy, addr_index, new_entry):
+        if replacement_policy == "opt":
+            tag_ways = self.get_tag_ways(
+                "0" if addr_index is None else addr_index, blocks, check=True
+            )
+            way = max(
+                range(len(blocks)),
+                key=lambda way: self.next_uses.get(
+                    (addr_index, blocks[way]["tag"]), NO_NEXT_USE
+                ),
+            )
+            tag_ways.pop(blocks[way]["tag"], None)
+            self.mark_addr_id_as_replaced((addr_index, blocks[way]["tag"]))
+            blocks[way] = new_entry
+            tag_ways.setdefault(new_entry["tag"], way)
+            return
         if replacement_policy == "mru":
             recently_used_addrs = reversed(self.recently_used_addrs)
         else:
             recently_used_addrs = self.recently_used_addrs
+        tag_ways = self.get_tag_ways(
+            "0" if addr_index is None else addr_index, blocks, check=True
+        )
         # Replace the first matching entry with the entry to add
         for recent_index, recent_tag in recently_used_addrs:
-            for i, block in enumerate(blocks):
-                if recent_index == addr_index and block["tag"] == recent_tag:
-                    blocks[i] = new_entry
-                    return
+            if recent_index == addr_index and recent_tag in tag_ways:
+                way = tag_ways.pop(recent_tag)
+                self.mark_addr_id_as_replaced((recent_index, recent_tag))
+                blocks[way] = new_entry
+                tag_ways.setdefault(new_entry["tag"], way)
+                return
 
     # Adds the given entry to the cache at the given index
     def set_block(self, replacement_policy, num_blocks_per_set, addr_index, new_entry):
+        self.release_kernel()
         # Place all cache entries in a single set if cache is fully associative
         if addr_index is None:
-            blocks = self["0"]
+            set_key = "0"
         else:
-            blocks = self[addr_index]
+            set_key = addr_index
+        blocks = self[set_key]
         # Replace MRU or LRU entry if number of blocks in set exceeds the limit
         if len(blocks) == num_blocks_per_set:
             self.replace_block(blocks, replacement_policy, addr_index, new_entry)
         else:
+            self.get_tag_ways(set_key, blocks).setdefault(new_entry["tag"], len(blocks))
             blocks.append(new_entry)
 
+    # Simulate the cache by reading a single address reference into it
+    def read_ref(
+        self, num_blocks_per_set, num_words_per_block, replacement_policy, ref
+    ):
+        self.mark_ref_as_last_seen(ref)
+
+        # Record if the reference is already in the cache or not
+        if self.is_hit(ref.index, ref.tag):
+            # Give emphasis to hits in contrast to misses
+            ref.cache_status = ReferenceCacheStatus.hit
+        else:
+            ref.cache_status = ReferenceCacheStatus.miss
+            self.set_block(
+                replacement_policy=replacement_policy,
+                num_blocks_per_set=num_blocks_per_set,
+                addr_index=ref.index,
+                new_entry=ref.get_cache_entry(num_words_per_block),
+            )
+
+    # Retrieves the index (as stored in recently-used addresses) and tag of
+    # the given block address for the given numbers of index and tag bits
+    def get_block_addr_id(self, block_addr, num_index_bits, num_tag_bits):
+        if num_index_bits:
+            index_mask = (1 << num_index_bits) - 1
+            addr_index = bin(block_addr & index_mask)[2:].zfill(num_index_bits)
+        else:
+            addr_index = None
+        if num_tag_bits:
+            tag = bin(block_addr >> num_index_bits)[2:].zfill(num_tag_bits)
+        else:
+            tag = None
+        return addr_index, tag
+
+    # Retrieves the block address identified by the given index and tag
+    def get_addr_id_block(self, addr_index, addr_tag):
+        return int((addr_tag or "") + (addr_index or "") or "0", 2)
+
+    # Creates a simulation kernel holding the current state of the cache for
+    # the given batch of references, or returns None if the state cannot be
+    # represented by a kernel (i.e. if any resident block has never been
+    # marked as recently used, and so could never be replaced)
+    def get_kernel(self, num_blocks_per_set, replacement_policy, refs):
+        if len(self) != 2**refs.num_index_bits:
+            return None
+        if replacement_policy == "opt":
+            kernel = OptimalCacheKernel(
+                refs.num_index_bits, refs.num_offset_bits, num_blocks_per_set
+            )
+        else:
+            kernel = CacheKernel(
+                refs.num_index_bits,
+                refs.num_offset_bits,
+                num_blocks_per_set,
+                evict_mru=replacement_policy == "mru",
+            )
+        resident_addr_ids = {}
+        for set_index in range(len(self)):
+            if refs.num_index_bits:
+                addr_index = bin(set_index)[2:].zfill(refs.num_index_bits)
+                blocks = self.get(addr_index)
+            else:
+                addr_index = None
+                blocks = self.get("0")
+            if blocks is None:
+                return None
+            for slot, block in enumerate(blocks):
+                addr_id = (addr_index, block["tag"])
+                # A set holding the same block twice cannot be represented
+                if addr_id in resident_addr_ids:
+                    return None
+                resident_addr_ids[addr_id] = (set_index, slot)
+                kernel.slots[set_index].append(self.get_addr_id_block(*addr_id))
+        # Only the recency of resident blocks matters to the kernel
+        for addr_id in self.recently_used_addrs:
+            if addr_id in resident_addr_ids:
+                set_index, slot = resident_addr_ids.pop(addr_id)
+                kernel.restore_resident_block(
+                    set_index, self.get_addr_id_block(*addr_id), slot
+                )
+        if resident_addr_ids:
+            return None
+        return kernel
+
+    # Retrieves the kernel kept from the last batch of references if it was
+    # created for the same parameters, and creates one (as in get_kernel)
+    # otherwise
+    def get_current_kernel(
+        self, num_blocks_per_set, num_words_per_block, replacement_policy, refs
+    ):
+        kernel_params = (
+            num_blocks_per_set,
+            replacement_policy,
+            refs.num_index_bits,
+            refs.num_tag_bits,
+            refs.num_offset_bits,
+            num_words_per_block,
+        )
+        if self.kernel is not None and self.kernel_params == kernel_params:
+            return self.kernel
+        self.release_kernel()
+        kernel = self.get_kernel(num_blocks_per_set, replacement_policy, refs)
+        if kernel is not None:
+            self.kernel = kernel
+            self.kernel_params = kernel_params
+        return kernel
+
+    # Updates every set of the cache which the kernel has changed since it
+    # was last loaded; the recently-used addresses are only retrieved from the
+    # kernel once they are needed
+    def load_kernel(self, kernel, num_words_per_block, refs):
+        for set_index, slots in kernel.pop_changed_sets().items():
+            if refs.num_index_bits:
+                addr_index = bin(set_index)[2:].zfill(refs.num_index_bits)
+            else:
+                addr_index = "0"
+            self[addr_index] = [
+                {
+                    "tag": self.get_block_addr_id(
+                        block_addr, refs.num_index_bits, refs.num_tag_bits
+                    )[1],
+                    "data": WordAddress(
+                        block_addr << refs.num_offset_bits
+                    ).get_consecutive_words(num_words_per_block),
+                }
+                for block_addr in slots
+            ]
+        self._recently_used_addrs = None
+
+    # Retrieves the position of the next use of each of the given references
+    # (or NO_NEXT_USE if there is none), and resets the next use of every
+    # address to its first use among them
+    def load_next_uses(self, refs):
+        ref_next_uses = [NO_NEXT_USE] * len(refs)
+        next_seen = {}
+        for position in reversed(range(len(refs))):
+            addr_id = (refs[position].index, refs[position].tag)
+            ref_next_uses[position] = next_seen.get(addr_id, NO_NEXT_USE)
+            next_seen[addr_id] = position
+        self.next_uses = next_seen
+        return ref_next_uses
+
     # Simulate the cache by reading the given address references into it
     def read_refs(
         self, num_blocks_per_set, num_words_per_block, replacement_policy, refs
     ):
-        for ref in refs:
-            self.mark_ref_as_last_seen(ref)
+        # Batches of references are read by the simulation kernel, which works
+        # on the raw addresses without decoding any reference
+        if isinstance(refs, ReferenceBatch):
+            kernel = self.get_current_kernel(
+                num_blocks_per_set, num_words_per_block, replacement_policy, refs
+            )
+            if kernel is not None:
+                kernel.read_addrs(
+                    refs.word_addrs, refs.num_byte_offset_bits, refs.cache_statuses
+                )
+                self.load_kernel(kernel, num_words_per_block, refs)
+                return
 
-            # Record if the reference is already in the cache or not
-            if self.is_hit(ref.index, ref.tag):
-                # Give emphasis to hits in contrast to misses
+        # Once a reference has been read, its block is resident and already
+        # the most recently used, so any immediately following references to
+        # the same block are hits which leave the cache unchanged; such runs
+        # are therefore marked as hits without being read individually
+        self.release_kernel()
+        ref_next_uses = None
+        if replacement_policy == "opt":
+            ref_next_uses = self.load_next_uses(refs)
+        resident_addr_id = None
+        for position, ref in enumerate(refs):
+            addr_id = (ref.index, ref.tag)
+            # The next use of the block only matters once it is resident, so
+            # it can be updated before the block is read
+            if ref_next_uses is not None:
+                self.next_uses[addr_id] = ref_next_uses[position]
+            if addr_id == resident_addr_id:
                 ref.cache_status = ReferenceCacheStatus.hit
+                continue
+
+            self.read_ref(
+                num_blocks_per_set, num_words_per_block, replacement_policy, ref
+            )
+            # A missed block is only absent after being read if no block could
+            # be chosen for replacement
+            if ref.cache_status == ReferenceCacheStatus.hit or self.is_hit(
+                ref.index, ref.tag
+            ):
+                resident_addr_id = addr_id
             else:
-                ref.cache_status = ReferenceCacheStatus.miss
-                self.set_block(
-                    replacement_policy=replacement_policy,
-                    num_blocks_per_set=num_blocks_per_set,
-                    addr_index=ref.index,
-                    new_entry=ref.get_cache_entry(num_words_per_block),
-                )
+                resident_addr_id = None
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+
+import argparse
+import collections
+import json
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.table import Table, format_count, get_table_width
+from cachesimulator.trace import parse_trace_addr
+
+# The states of a block in a private cache; a block which is not in a cache is
+# invalid there
+SHARED = 1
+EXCLUSIVE = 2
+MODIFIED = 3
+# The coherence protocols which can be simulated
+PROTOCOLS = ("msi", "mesi")
+# The names of all per-core statistics table columns
+CORE_STATS_COL_NAMES = (
+    "Core",
+    "Reads",
+    "Writes",
+    "Hits",
+    "Misses",
+    "Coh Misses",
+    "Invals",
+)
+# The names of all bus statistics table columns
+BUS_STATS_COL_NAMES = ("Transaction", "Count")
+
+
+# Parses a single access from a coherence trace file
+def parse_access(tokens):
+    if len(tokens) != 3:
+        raise ValueError("expected a core, an address, and R or W")
+    core, addr, access_type = tokens
+    access_type = access_type.upper()
+    if access_type not in ("R", "W"):
+        raise ValueError("unknown access type: {}".format(access_type))
+    if not core.isdigit():
+        raise ValueError("invalid core: {}".format(core))
+    return int(core), parse_trace_addr(addr), access_type == "W"
+
+
+# Lazily reads the accesses from the given coherence trace file; each line of
+# a coherence trace gives the ID of the accessing core, the address accessed,
+# and whether it was read (R) or written (W), separated by whitespace, and any
+# text following a # on a line is ignored; each access is yielded as a tuple
+# of its core, address, and whether it is a write
+def read_coherence_trace(trace_path):
+    with open(trace_path) as trace_file:
+        for line_num, line in enumerate(trace_file, 1):
+            tokens = line.partition("#")[0].split()
+            if not tokens:
+                continue
+            try:
+                yield parse_access(tokens)
+            except ValueError as error:
+                raise ValueError("line {}: {}".format(line_num, error)) from None
+
+
+# The statistics for the accesses of a single core
+class CoreStats(object):
+    def __init__(self):
+        self.num_reads = 0
+        self.num_writes = 0
+        self.num_misses = 0
+        # Misses to blocks which were last removed from the core's cache by
+        # another core's write (rather than by replacement)
+        self.num_coherence_misses = 0
+        # The number of blocks invalidated in the core's cache by other cores
+        self.num_invalidations = 0
+
+    def get_num_accesses(self):
+        return self.num_reads + self.num_writes
+
+    def get_num_hits(self):
+        return self.get_num_accesses() - self.num_misses
+
+    # Retrieves the statistics as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "num_reads": self.num_reads,
+            "num_writes": self.num_writes,
+            "num_hits": self.get_num_hits(),
+            "num_misses": self.num_misses,
+            "num_coherence_misses": self.num_coherence_misses,
+            "num_invalidations": self.num_invalidations,
+        }
+
+
+# The statistics for a simulation of several cores, including the number of
+# each kind of bus transaction: reads (on read misses), exclusive reads (on
+# write misses), upgrades (on writes to shared blocks), and write-backs of
+# modified blocks (on replacement or when another core needs the block)
+class CoherenceStats(object):
+    def __init__(self):
+        self.core_stats = []
+        self.num_bus_reads = 0
+        self.num_bus_read_exclusives = 0
+        self.num_bus_upgrades = 0
+        self.num_write_backs = 0
+
+    def get_num_bus_transactions(self):
+        return (
+            self.num_bus_reads
+            + self.num_bus_read_exclusives
+            + self.num_bus_upgrades
+            + self.num_write_backs
+        )
+
+    def get_num_invalidations(self):
+        return sum(core_stats.num_invalidations for core_stats in self.core_stats)
+
+    def get_num_coherence_misses(self):
+        return sum(core_stats.num_coherence_misses for core_stats in self.core_stats)
+
+    # Retrieves the statistics as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "cores": [core_stats.to_dict() for core_stats in self.core_stats],
+            "num_invalidations": self.get_num_invalidations(),
+            "num_coherence_misses": self.get_num_coherence_misses(),
+            "num_bus_reads": self.num_bus_reads,
+            "num_bus_read_exclusives": self.num_bus_read_exclusives,
+            "num_bus_upgrades": self.num_bus_upgrades,
+            "num_write_backs": self.num_write_backs,
+            "num_bus_transactions": self.get_num_bus_transactions(),
+        }
+
+
+# Simulates a private cache of the given geometry for each of several cores,
+# kept coherent by snooping a shared bus with the MSI or MESI protocol; to
+# avoid snooping every cache on every transaction, a directory records which
+# cores hold each block, so only those caches are visited
+class CoherenceSimulator(object):
+    def __init__(self, geometry, protocol="mesi", replacement_policy="lru"):
+        if protocol not in PROTOCOLS:
+            raise ValueError("unknown coherence protocol: {}".format(protocol))
+        self.geometry = geometry
+        self.protocol = protocol
+        self.replacement_policy = replacement_policy
+        # The sets of each core's cache, each mapping its blocks (ordered from
+        # least-recently used to most) to their states
+        self.caches = []
+        # Every cached block, mapped to a bit mask of the cores which hold it
+        self.sharers = {}
+        # The blocks which each core lost to another core's write, and has not
+        # read or written since
+        self.invalidated_blocks = []
+        self.stats = CoherenceStats()
+
+    # Adds caches for every core up to and including the given core
+    def add_cores(self, core):
+        if core < 0:
+            raise ValueError("invalid core: {}".format(core))
+        while len(self.caches) <= core:
+            self.caches.append(
+                [collections.OrderedDict() for _ in range(self.geometry.num_sets)]
+            )
+            self.invalidated_blocks.append(set())
+            self.stats.core_stats.append(CoreStats())
+
+    # Simulates the given accesses (which may be any iterable of tuples of the
+    # accessing core, address, and whether the access is a write, including a
+    # lazily read trace) in order, returning the statistics of every access
+    # simulated so far; counts are kept in local variables while simulating,
+    # and only added to the statistics at the end
+    def read_accesses(self, accesses):
+        geometry = self.geometry
+        shift = geometry.num_byte_offset_bits + geometry.num_offset_bits
+        index_mask = geometry.num_sets - 1
+        num_blocks_per_set = geometry.num_blocks_per_set
+        evict_mru = self.replacement_policy == "mru"
+        # Without an exclusive state, a block read by only one core is shared
+        read_state = EXCLUSIVE if self.protocol == "mesi" else SHARED
+        caches = self.caches
+        sharers = self.sharers
+        invalidated_blocks = self.invalidated_blocks
+        num_cores = len(caches)
+        num_reads = [0] * num_cores
+        num_writes = [0] * num_cores
+        num_misses = [0] * num_cores
+        num_coherence_misses = [0] * num_cores
+        num_invalidations = [0] * num_cores
+        num_bus_reads = 0
+        num_bus_read_exclusives = 0
+        num_bus_upgrades = 0
+        num_write_backs = 0
+
+        for core, addr, is_write in accesses:
+            if not 0 <= core < num_cores:
+                self.add_cores(core)
+                num_new_cores = len(caches) - num_cores
+                for counts in (
+                    num_reads,
+                    num_writes,
+                    num_misses,
+                    num_coherence_misses,
+                    num_invalidations,
+                ):
+                    counts.extend([0] * num_new_cores)
+                num_cores = len(caches)
+            block_addr = addr >> shift
+            set_index = block_addr & index_mask
+            blocks = caches[core][set_index]
+            if is_write:
+                num_writes[core] += 1
+            else:
+                num_reads[core] += 1
+
+            state = blocks.get(block_addr)
+            if state is not None:
+                blocks.move_to_end(block_addr)
+                if not is_write or state == MODIFIED:
+                    continue
+                # An exclusive block is written without a bus transaction, but
+                # every other copy of a shared block must first be invalidated
+                if state == SHARED:
+                    num_bus_upgrades += 1
+                    core_bit = 1 << core
+                    other_sharers = sharers[block_addr] & ~core_bit
+                    sharers[block_addr] = core_bit
+                    while other_sharers:
+                        other_bit = other_sharers & -other_sharers
+                        other_sharers ^= other_bit
+                        other = other_bit.bit_length() - 1
+                        # No other copy of a shared block can be modified
+                        del caches[other][set_index][block_addr]
+                        invalidated_blocks[other].add(block_addr)
+                        num_invalidations[other] += 1
+                blocks[block_addr] = MODIFIED
+                continue
+
+            num_misses[core] += 1
+            invalidated = invalidated_blocks[core]
+            if block_addr in invalidated:
+                invalidated.remove(block_addr)
+                num_coherence_misses[core] += 1
+            core_bit = 1 << core
+            if len(blocks) == num_blocks_per_set:
+                victim, victim_state = blocks.popitem(last=evict_mru)
+                if victim_state == MODIFIED:
+                    num_write_backs += 1
+                victim_sharers = sharers[victim] & ~core_bit
+                if victim_sharers:
+                    sharers[victim] = victim_sharers
+                else:
+                    del sharers[victim]
+
+            other_sharers = sharers.get(block_addr, 0)
+            if is_write:
+                num_bus_read_exclusives += 1
+                sharers[block_addr] = core_bit
+                # Every other copy is invalidated (and written back first if
+                # it was modified)
+                while other_sharers:
+                    other_bit = other_sharers & -other_sharers
+                    other_sharers ^= other_bit
+                    other = other_bit.bit_length() - 1
+                    if caches[other][set_index].pop(block_addr) == MODIFIED:
+                        num_write_backs += 1
+                    invalidated_blocks[other].add(block_addr)
+                    num_invalidations[other] += 1
+                blocks[block_addr] = MODIFIED
+            else:
+                num_bus_reads += 1
+                if other_sharers:
+                    sharers[block_addr] = other_sharers | core_bit
+                    # Every other copy becomes shared (and is written back
+                    # first if it was modified)
+                    while other_sharers:
+                        other_bit = other_sharers & -other_sharers
+                        other_sharers ^= other_bit
+                        other_blocks = caches[other_bit.bit_length() - 1][set_index]
+                        if other_blocks[block_addr] == MODIFIED:
+                            num_write_backs += 1
+                        other_blocks[block_addr] = SHARED
+                    blocks[block_addr] = SHARED
+                else:
+                    sharers[block_addr] = core_bit
+                    blocks[block_addr] = read_state
+
+        stats = self.stats
+        for core, core_stats in enumerate(stats.core_stats):
+            core_stats.num_reads += num_reads[core]
+            core_stats.num_writes += num_writes[core]
+            core_stats.num_misses += num_misses[core]
+            core_stats.num_coherence_misses += num_coherence_misses[core]
+            core_stats.num_invalidations += num_invalidations[core]
+        stats.num_bus_reads += num_bus_reads
+        stats.num_bus_read_exclusives += num_bus_read_exclusives
+        stats.num_bus_upgrades += num_bus_upgrades
+        stats.num_write_backs += num_write_backs
+        return stats
+
+
+# Displays the given coherence statistics as a table of per-core statistics
+# and a table of bus transactions
+def display_stats(stats, table_width):
+    core_table = Table.create_stats_table("Cores", CORE_STATS_COL_NAMES, table_width)
+    for core, core_stats in enumerate(stats.core_stats):
+        core_table.rows.append(
+            (
+                core,
+                format_count(core_stats.num_reads),
+                format_count(core_stats.num_writes),
+                format_count(core_stats.get_num_hits()),
+                format_count(core_stats.num_misses),
+                format_count(core_stats.num_coherence_misses),
+                format_count(core_stats.num_invalidations),
+            )
+        )
+    print(core_table)
+    print()
+
+    bus_table = Table.create_stats_table("Bus", BUS_STATS_COL_NAMES, table_width)
+    bus_table.rows.extend(
+        (name, format_count(count))
+        for name, count in (
+            ("Reads", stats.num_bus_reads),
+            ("Exclusive Reads", stats.num_bus_read_exclusives),
+            ("Upgrades", stats.num_bus_upgrades),
+            ("Write-Backs", stats.num_write_backs),
+            ("Total", stats.get_num_bus_transactions()),
+        )
+    )
+    print(bus_table)
+
+
+# Parse command-line arguments passed to the coherence subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator coherence",
+        description="simulate coherent private caches for several cores",
+    )
+
+    parser.add_argument(
+        "trace_file",
+        help="the path of a trace file listing the core, address, and R or W of "
+        "each access",
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        required=True,
+        help="the size of each core's cache in words",
+    )
+
+    parser.add_argument(
+        "--num-blocks-per-set", type=int, default=1, help="the number of blocks per set"
+    )
+
+    parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        default=1,
+        help="the number of words per block",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru"),
+        default="lru",
+        type=str.lower,
+        help="the cache replacement policy (LRU or MRU)",
+    )
+
+    parser.add_argument(
+        "--protocol",
+        choices=PROTOCOLS,
+        default="mesi",
+        type=str.lower,
+        help="the coherence protocol (MSI or MESI)",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON file to which the statistics will be written",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    geometry = CacheGeometry(
+        cli_args.cache_size,
+        cli_args.num_blocks_per_set,
+        cli_args.num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(
+            cli_args.word_size, cli_args.addr_unit
+        ),
+    )
+    simulator = CoherenceSimulator(
+        geometry,
+        protocol=cli_args.protocol,
+        replacement_policy=cli_args.replacement_policy,
+    )
+    stats = simulator.read_accesses(read_coherence_trace(cli_args.trace_file))
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as stats_file:
+            json.dump(stats.to_dict(), stats_file)
+            stats_file.write("\n")
+    table_width = get_table_width()
+    print()
+    display_stats(stats, table_width)
+    print()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+
+import itertools
+
+# The maximum number of addresses in the body of a loop detected by
+# compress_trace
+DEFAULT_MAX_LOOP_LENGTH = 64
+# The number of evenly spaced positions of a trace checked by is_compressible,
+# and the smallest fraction of them at which a loop must begin for the trace
+# to be worth compressing; only loops save any simulation, and a trace with
+# too few of them is simulated faster without compression
+NUM_COMPRESSIBILITY_SAMPLES = 256
+MIN_LOOP_FRACTION = 0.5
+
+
+# Yields the length of every loop body (of at most the given maximum length)
+# which could begin at the given position, i.e. every distance at which the
+# address at that position recurs; the trace is searched with tuple.index, so
+# positions where no address recurs cost very little
+def _iter_loop_lengths(word_addrs, start, max_loop_length):
+    max_loop_length = min(max_loop_length, (len(word_addrs) - start) // 2)
+    window = tuple(word_addrs[start + 1 : start + 1 + max_loop_length])
+    loop_length = 0
+    while True:
+        try:
+            loop_length = window.index(word_addrs[start], loop_length) + 1
+        except ValueError:
+            return
+        yield loop_length
+
+
+# Returns True if a loop (see compress_trace) begins at enough of a sample of
+# the given addresses (see NUM_COMPRESSIBILITY_SAMPLES) for the trace to be
+# worth compressing; this costs the same however long the trace is
+def is_compressible(word_addrs, max_loop_length=DEFAULT_MAX_LOOP_LENGTH):
+    if not word_addrs:
+        return False
+    step = max(1, len(word_addrs) // NUM_COMPRESSIBILITY_SAMPLES)
+    sampled_starts = range(0, len(word_addrs), step)
+    num_loops = sum(
+        any(
+            word_addrs[start : start + loop_length]
+            == word_addrs[start + loop_length : start + 2 * loop_length]
+            for loop_length in _iter_loop_lengths(word_addrs, start, max_loop_length)
+        )
+        for start in sampled_starts
+    )
+    return num_loops >= len(sampled_starts) * MIN_LOOP_FRACTION
+
+
+# Raises a ValueError if traces simulated with the given replacement policy
+# cannot be compressed; the iterations of a loop are only skipped once an
+# iteration of all hits leaves the cache unchanged, which does not hold for
+# the optimal policy, whose choices depend on the references which follow
+def check_compress_policy(replacement_policy):
+    if replacement_policy == "opt":
+        raise ValueError(
+            "compression cannot be combined with the opt replacement policy"
+        )
+
+
+# Retrieves the number of times the loop body of the given length beginning at
+# the given position is repeated consecutively in the given trace
+def _count_loop_repeats(word_addrs, start, loop_length):
+    body = word_addrs[start : start + loop_length]
+    num_repeats = 1
+    next_start = start + loop_length
+    while word_addrs[next_start : next_start + loop_length] == body:
+        num_repeats += 1
+        next_start += loop_length
+    return num_repeats
+
+
+# Retrieves the length and number of repeats of the loop beginning at the
+# given position which covers the most addresses, or None if no loop begins
+# at that position
+def _find_loop(word_addrs, start, max_loop_length):
+    best_loop = None
+    best_num_covered = 0
+    for loop_length in _iter_loop_lengths(word_addrs, start, max_loop_length):
+        num_repeats = _count_loop_repeats(word_addrs, start, loop_length)
+        if num_repeats > 1 and loop_length * num_repeats > best_num_covered:
+            best_loop = (loop_length, num_repeats)
+            best_num_covered = loop_length * num_repeats
+    return best_loop
+
+
+# Converts the given trace into a list of (body, num_repeats) segments, where
+# body is a tuple of word addresses which is repeated num_repeats times in a
+# row; addresses which are not part of any loop are grouped into segments
+# which are repeated only once
+def compress_trace(word_addrs, max_loop_length=DEFAULT_MAX_LOOP_LENGTH):
+    word_addrs = tuple(word_addrs)
+    segments = []
+    literal_addrs = []
+    start = 0
+    while start < len(word_addrs):
+        loop = _find_loop(word_addrs, start, max_loop_length)
+        if loop is None:
+            literal_addrs.append(word_addrs[start])
+            start += 1
+            continue
+        if literal_addrs:
+            segments.append((tuple(literal_addrs), 1))
+            literal_addrs = []
+        loop_length, num_repeats = loop
+        segments.append((word_addrs[start : start + loop_length], num_repeats))
+        start += loop_length * num_repeats
+    if literal_addrs:
+        segments.append((tuple(literal_addrs), 1))
+    return segments
+
+
+# Yields every word address in the given compressed trace
+def expand_trace(segments):
+    for body, num_repeats in segments:
+        yield from itertools.chain.from_iterable(itertools.repeat(body, num_repeats))
@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import random
+import sys
+from array import array
+
+from cachesimulator.cache import Cache
+from cachesimulator.compress import compress_trace
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import MAX_SCANNED_BLOCKS_PER_SET
+from cachesimulator.output import stream_results
+from cachesimulator.reference import ReferenceCacheStatus
+from cachesimulator.sampling import simulate_sampled
+from cachesimulator.session import CacheSession
+from cachesimulator.simulator import Simulator
+from cachesimulator.sweep import run_config, share_trace
+from cachesimulator.table import Table, format_count, get_table_width
+
+# The size of each word in bytes for cases with byte addresses
+WORD_SIZE = 4
+# The parameters from which the cache of each case is chosen; the largest
+# number of blocks per set exceeds the number of blocks for which the kernel
+# scans a list, so that both kinds of kernel sets are tested
+REPLACEMENT_POLICIES = ("lru", "mru", "opt")
+NUM_BLOCKS_PER_SET_CHOICES = (1, 2, 3, 4, 8, MAX_SCANNED_BLOCKS_PER_SET + 8)
+NUM_WORDS_PER_BLOCK_CHOICES = (1, 2, 4)
+MAX_NUM_INDEX_BITS = 3
+# The number of addresses read into a session at a time, which is kept small
+# (and odd) so that every case is read in several uneven chunks
+SESSION_CHUNK_SIZE = 7
+# The default number of cases generated, and the default maximum number of
+# references in each
+DEFAULT_NUM_CASES = 200
+DEFAULT_MAX_REFS = 200
+# The names of all fuzzing results table columns
+FUZZ_COL_NAMES = ("Engine", "Cases", "Divergences")
+
+
+# A single generated simulation: the parameters of a cache and the addresses
+# read into it
+class FuzzCase(object):
+    def __init__(
+        self,
+        cache_size,
+        num_blocks_per_set,
+        num_words_per_block,
+        replacement_policy,
+        addr_unit,
+        word_addrs,
+    ):
+        self.cache_size = cache_size
+        self.num_blocks_per_set = num_blocks_per_set
+        self.num_words_per_block = num_words_per_block
+        self.replacement_policy = replacement_policy
+        self.addr_unit = addr_unit
+        self.word_addrs = list(word_addrs)
+
+    # Generates a random case whose trace has at most the given number of
+    # references, mixing random addresses with loops and sequential runs so
+    # that blocks are both reused and replaced
+    @classmethod
+    def generate(cls, rng, max_refs):
+        num_blocks_per_set = rng.choice(NUM_BLOCKS_PER_SET_CHOICES)
+        num_words_per_block = rng.choice(NUM_WORDS_PER_BLOCK_CHOICES)
+        num_sets = 2 ** rng.randrange(MAX_NUM_INDEX_BITS + 1)
+        cache_size = num_sets * num_blocks_per_set * num_words_per_block
+        footprint = cache_size * rng.choice((1, 2, 4))
+        num_refs = rng.randint(1, max_refs)
+        word_addrs = []
+        while len(word_addrs) < num_refs:
+            kind = rng.random()
+            if kind < 0.5:
+                word_addrs.append(rng.randrange(footprint))
+            elif kind < 0.8:
+                loop = [rng.randrange(footprint) for _ in range(rng.randint(1, 8))]
+                word_addrs.extend(loop * rng.randint(2, 6))
+            else:
+                start = rng.randrange(footprint)
+                word_addrs.extend(range(start, start + rng.randint(1, 8)))
+        word_addrs = word_addrs[:num_refs]
+        addr_unit = rng.choice(("word", "byte"))
+        if addr_unit == "byte":
+            word_addrs = [
+                addr * WORD_SIZE + rng.randrange(WORD_SIZE) for addr in word_addrs
+            ]
+        return cls(
+            cache_size,
+            num_blocks_per_set,
+            num_words_per_block,
+            rng.choice(REPLACEMENT_POLICIES),
+            addr_unit,
+            word_addrs,
+        )
+
+    # Retrieves a copy of this case which reads the given addresses instead
+    def replace_addrs(self, word_addrs):
+        return FuzzCase(
+            self.cache_size,
+            self.num_blocks_per_set,
+            self.num_words_per_block,
+            self.replacement_policy,
+            self.addr_unit,
+            word_addrs,
+        )
+
+    # Retrieves the geometry of the cache, sized (as by Simulator.simulate) for
+    # the largest address of the case; addresses always have at least enough
+    # bits for an index and offset, which references need to be decoded
+    def get_geometry(self):
+        num_byte_offset_bits = get_num_byte_offset_bits(WORD_SIZE, self.addr_unit)
+        num_set_words = self.cache_size // self.num_blocks_per_set
+        return CacheGeometry(
+            self.cache_size,
+            self.num_blocks_per_set,
+            self.num_words_per_block,
+            num_addr_bits=num_set_words.bit_length() - 1,
+            max_word_addr=max(self.word_addrs) >> num_byte_offset_bits,
+            num_byte_offset_bits=num_byte_offset_bits,
+        )
+
+    # Retrieves the parameters of the simulation (named as in
+    # Simulator.simulate)
+    def get_sim_args(self):
+        return {
+            "cache_size": self.cache_size,
+            "num_blocks_per_set": self.num_blocks_per_set,
+            "num_words_per_block": self.num_words_per_block,
+            "replacement_policy": self.replacement_policy,
+            "word_size": WORD_SIZE,
+            "addr_unit": self.addr_unit,
+        }
+
+    # Retrieves the case as a dictionary suitable for serialization
+    def to_dict(self):
+        return dict(self.get_sim_args(), word_addrs=self.word_addrs)
+
+
+# Retrieves the cache status of every given reference, along with the final
+# contents of the given sets and the recency order of their resident blocks
+# (the recency of any other address can never affect replacement)
+def get_cache_result(refs, cache_sets, recently_used_addrs):
+    resident_addr_ids = {
+        ("0" if addr_index is None else addr_index, addr_tag)
+        for addr_index, addr_tag in recently_used_addrs
+    } & {
+        (set_key, block["tag"])
+        for set_key, blocks in cache_sets.items()
+        for block in blocks
+    }
+    return {
+        "statuses": bytes(ref.cache_status.value for ref in refs),
+        "cache": dict(cache_sets),
+        "recently_used_addrs": [
+            (addr_index, addr_tag)
+            for addr_index, addr_tag in recently_used_addrs
+            if ("0" if addr_index is None else addr_index, addr_tag)
+            in resident_addr_ids
+        ],
+    }
+
+
+# Retrieves the references of the given case, decoded for its geometry
+def get_case_refs(case):
+    geometry = case.get_geometry()
+    return Simulator().get_addr_refs(
+        case.word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+        geometry.num_byte_offset_bits,
+    )
+
+
+# Retrieves the position of the next reference (after the given position) to
+# the same block as the reference at the given position, or the number of
+# references if there is none
+def find_next_use(refs, position):
+    addr_id = (refs[position].index, refs[position].tag)
+    return next(
+        (
+            next_position
+            for next_position in range(position + 1, len(refs))
+            if (refs[next_position].index, refs[next_position].tag) == addr_id
+        ),
+        len(refs),
+    )
+
+
+# Simulates the given case with a frozen copy of the original simulator,
+# which finds every block and replacement victim by scanning lists, and finds
+# the next use of every block (for the optimal policy) by searching the rest
+# of the trace; it shares no simulation code with Cache, so that every engine
+# (including Cache.read_ref) is checked against the original semantics
+def run_oracle(case):
+    geometry = case.get_geometry()
+    refs = get_case_refs(case)
+    cache_sets = {
+        bin(set_index)[2:].zfill(geometry.num_index_bits)
+        if geometry.num_index_bits
+        else "0": []
+        for set_index in range(geometry.num_sets)
+    }
+    recently_used_addrs = []
+    # The position of the last reference to each resident block
+    last_positions = {}
+    for position, ref in enumerate(refs):
+        addr_id = (ref.index, ref.tag)
+        if addr_id in recently_used_addrs:
+            recently_used_addrs.remove(addr_id)
+        recently_used_addrs.append(addr_id)
+        blocks = cache_sets["0" if ref.index is None else ref.index]
+        last_positions[addr_id] = position
+        if any(block["tag"] == ref.tag for block in blocks):
+            ref.cache_status = ReferenceCacheStatus.hit
+            continue
+        ref.cache_status = ReferenceCacheStatus.miss
+        new_entry = ref.get_cache_entry(geometry.num_words_per_block)
+        if len(blocks) < geometry.num_blocks_per_set:
+            blocks.append(new_entry)
+            continue
+        if case.replacement_policy == "opt":
+            # Replace the first block which is used again furthest in the
+            # future
+            next_uses = [
+                find_next_use(refs, last_positions[(ref.index, block["tag"])])
+                for block in blocks
+            ]
+            blocks[next_uses.index(max(next_uses))] = new_entry
+            continue
+        if case.replacement_policy == "mru":
+            recent_addr_ids = reversed(recently_used_addrs)
+        else:
+            recent_addr_ids = recently_used_addrs
+        # Replace the first matching entry with the entry to add
+        victim_way = next(
+            (
+                i
+                for recent_index, recent_tag in recent_addr_ids
+                for i, block in enumerate(blocks)
+                if recent_index == ref.index and block["tag"] == recent_tag
+            ),
+            None,
+        )
+        if victim_way is not None:
+            blocks[victim_way] = new_entry
+    return get_cache_result(refs, cache_sets, recently_used_addrs)
+
+
+# Each of the following engines simulates the given case in its own way,
+# returning whichever of the results of run_oracle it can produce (or the
+# number of hits and misses, for engines which only count them)
+
+
+# Reads one reference at a time with Cache.read_ref
+def run_ref_engine(case):
+    geometry = case.get_geometry()
+    refs = get_case_refs(case)
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    ref_next_uses = None
+    if case.replacement_policy == "opt":
+        ref_next_uses = cache.load_next_uses(refs)
+    for position, ref in enumerate(refs):
+        if ref_next_uses is not None:
+            cache.next_uses[(ref.index, ref.tag)] = ref_next_uses[position]
+        cache.read_ref(
+            geometry.num_blocks_per_set,
+            geometry.num_words_per_block,
+            case.replacement_policy,
+            ref,
+        )
+    return get_cache_result(refs, cache, cache.recently_used_addrs)
+
+
+# Reads a list of references with Cache.read_refs, which skips runs of
+# references to the same block
+def run_refs_engine(case):
+    geometry = case.get_geometry()
+    refs = get_case_refs(case)
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    cache.read_refs(
+        geometry.num_blocks_per_set,
+        geometry.num_words_per_block,
+        case.replacement_policy,
+        refs,
+    )
+    return get_cache_result(refs, cache, cache.recently_used_addrs)
+
+
+# Reads a batch of references with the simulation kernel (compiled, if a
+# compiled kernel is installed)
+def run_batch_engine(case):
+    geometry = case.get_geometry()
+    refs, cache = Simulator().simulate(
+        num_addr_bits=geometry.num_addr_bits,
+        word_addrs=array("Q", case.word_addrs),
+        **case.get_sim_args(),
+    )
+    return get_cache_result(refs, cache, cache.recently_used_addrs)
+
+
+# Reads a compressed trace, skipping the iterations of loops which no longer
+# change the cache; the trace is always compressed, even if Simulator.simulate
+# would judge it not worth compressing
+def run_compressed_engine(case):
+    geometry = case.get_geometry()
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    refs = Simulator().read_compressed_trace(
+        cache,
+        compress_trace(case.word_addrs),
+        geometry,
+        case.replacement_policy,
+    )
+    return get_cache_result(refs, cache, cache.recently_used_addrs)
+
+
+# Reads the trace into a session in several chunks, keeping the cache warm
+# between them
+def run_session_engine(case):
+    geometry = case.get_geometry()
+    session = CacheSession(num_addr_bits=geometry.num_addr_bits, **case.get_sim_args())
+    statuses = bytearray()
+    for start in range(0, len(case.word_addrs), SESSION_CHUNK_SIZE):
+        refs, _ = session.read_chunk(
+            case.word_addrs[start : start + SESSION_CHUNK_SIZE]
+        )
+        statuses.extend(refs.cache_statuses)
+    return {
+        "statuses": bytes(statuses),
+        "cache": dict(session.cache),
+        "recently_used_addrs": list(session.cache.recently_used_addrs),
+    }
+
+
+# A results writer (as used by stream_results) which keeps the statuses of
+# every reference in memory
+class StatusCollector(object):
+    def __init__(self):
+        self.statuses = bytearray()
+
+    def write_chunk(self, word_addrs, statuses):
+        self.statuses.extend(statuses)
+
+    def close(self):
+        pass
+
+
+# Streams the results of the trace in chunks, as for machine-readable output
+def run_stream_engine(case):
+    collector = StatusCollector()
+    stream_results(
+        iter(case.word_addrs),
+        case.get_geometry(),
+        case.replacement_policy,
+        collector,
+    )
+    return {"statuses": bytes(collector.statuses)}
+
+
+# Simulates every set as a sample (i.e. with a sample interval of 1), which
+# should count exactly the hits and misses of the whole cache
+def run_sampled_engine(case):
+    stats = simulate_sampled(
+        case.word_addrs, case.get_geometry(), case.replacement_policy, 1
+    )
+    num_misses = stats.get_num_sampled_misses()
+    return {"num_hits": stats.num_refs - num_misses, "num_misses": num_misses}
+
+
+# Simulates the trace from shared memory, as each worker of a sweep does
+def run_sweep_engine(case):
+    shared_trace, num_addrs = share_trace(case.word_addrs)
+    try:
+        stats = run_config(shared_trace.name, num_addrs, case.get_sim_args())
+    finally:
+        shared_trace.close()
+        shared_trace.unlink()
+    return {"num_hits": stats["num_hits"], "num_misses": stats["num_misses"]}
+
+
+# Every engine compared against the oracle, by name, along with the
+# replacement policies it supports; neither compressed traces nor sessions
+# can use the optimal policy (and the compressed engine rejects it)
+ENGINES = {
+    "ref": (run_ref_engine, REPLACEMENT_POLICIES),
+    "refs": (run_refs_engine, REPLACEMENT_POLICIES),
+    "batch": (run_batch_engine, REPLACEMENT_POLICIES),
+    "compressed": (run_compressed_engine, ("lru", "mru")),
+    "session": (run_session_engine, ("lru", "mru")),
+    "stream": (run_stream_engine, REPLACEMENT_POLICIES),
+    "sampled": (run_sampled_engine, REPLACEMENT_POLICIES),
+    "sweep": (run_sweep_engine, REPLACEMENT_POLICIES),
+}
+
+
+# Returns True if the engine with the given name supports the given case
+def is_supported(case, engine_name):
+    _, replacement_policies = ENGINES[engine_name]
+    return case.replacement_policy in replacement_policies
+
+
+# Describes how the given result of an engine differs from the given result
+# of the oracle, or returns None if it does not
+def describe_divergence(result, oracle_result, word_addrs):
+    oracle_result = dict(
+        oracle_result,
+        num_hits=oracle_result["statuses"].count(ReferenceCacheStatus.hit.value),
+        num_misses=oracle_result["statuses"].count(ReferenceCacheStatus.miss.value),
+    )
+    if "statuses" in result and result["statuses"] != oracle_result["statuses"]:
+        statuses = result["statuses"]
+        if len(statuses) != len(word_addrs):
+            return "statuses were given for {} of {} references".format(
+                len(statuses), len(word_addrs)
+            )
+        position = next(
+            position
+            for position in range(len(statuses))
+            if statuses[position] != oracle_result["statuses"][position]
+        )
+        return "reference {} (address {}) was a {}, but the oracle's was a {}".format(
+            position,
+            word_addrs[position],
+            ReferenceCacheStatus(statuses[position]),
+            ReferenceCacheStatus(oracle_result["statuses"][position]),
+        )
+    for key in ("num_hits", "num_misses", "cache", "recently_used_addrs"):
+        if key in result and result[key] != oracle_result[key]:
+            return "{} differs: {!r} (oracle: {!r})".format(
+                key, result[key], oracle_result[key]
+            )
+    return None
+
+
+# Simulates the given case with the given engine, returning a description of
+# how its results differ from those of the oracle (which are simulated unless
+# given), or None if they do not
+def find_divergence(case, engine_name, oracle_result=None):
+    if oracle_result is None:
+        oracle_result = run_oracle(case)
+    run_engine, _ = ENGINES[engine_name]
+    try:
+        result = run_engine(case)
+    except Exception as error:
+        return "raised {}: {}".format(type(error).__name__, error)
+    return describe_divergence(result, oracle_result, case.word_addrs)
+
+
+# Minimizes the trace of the given case while the given engine still diverges
+# from the oracle, by repeatedly removing runs of references (starting with
+# halves of the trace, then quarters, and so on until single references);
+# returns the minimized case and its divergence
+def minimize_case(case, engine_name, divergence):
+    word_addrs = case.word_addrs
+    run_length = len(word_addrs) // 2
+    while run_length >= 1:
+        removed_any = False
+        start = 0
+        while start < len(word_addrs):
+            candidate = case.replace_addrs(
+                word_addrs[:start] + word_addrs[start + run_length :]
+            )
+            # A case must read at least one reference
+            candidate_divergence = (
+                find_divergence(candidate, engine_name)
+                if candidate.word_addrs
+                else None
+            )
+            if candidate_divergence is not None:
+                word_addrs = candidate.word_addrs
+                divergence = candidate_divergence
+                removed_any = True
+            else:
+                start += run_length
+        if not removed_any:
+            run_length //= 2
+    return case.replace_addrs(word_addrs), divergence
+
+
+# Generates the given number of random cases and simulates each with every
+# given engine which supports it, yielding the name of the engine along with
+# the minimized case and its divergence if the engine diverged from the
+# oracle (or None otherwise)
+def run_fuzz(
+    engine_names, num_cases=DEFAULT_NUM_CASES, max_refs=DEFAULT_MAX_REFS, seed=0
+):
+    rng = random.Random(seed)
+    for _ in range(num_cases):
+        case = FuzzCase.generate(rng, max_refs)
+        oracle_result = run_oracle(case)
+        for engine_name in engine_names:
+            if not is_supported(case, engine_name):
+                continue
+            divergence = find_divergence(case, engine_name, oracle_result)
+            if divergence is None:
+                yield engine_name, None
+            else:
+                yield engine_name, minimize_case(case, engine_name, divergence)
+
+
+# Displays the number of cases simulated by each engine, and the number of
+# those which diverged, as a table
+def display_results(engine_names, engine_num_cases, divergences, table_width):
+    table = Table.create_stats_table(
+        "Differential Fuzzing", FUZZ_COL_NAMES, table_width
+    )
+    for engine_name in engine_names:
+        table.rows.append(
+            (
+                engine_name,
+                format_count(engine_num_cases[engine_name]),
+                format_count(
+                    sum(
+                        divergence["engine"] == engine_name
+                        for divergence in divergences
+                    )
+                ),
+            )
+        )
+    print(table)
+
+
+# Parse command-line arguments passed to the fuzz subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator fuzz",
+        description="compare every simulation engine against the reference "
+        "simulator on random caches and traces",
+    )
+
+    parser.add_argument(
+        "--engine",
+        choices=tuple(ENGINES),
+        action="append",
+        help="an engine to compare against the reference simulator, given once "
+        "per engine (defaults to every engine)",
+    )
+
+    parser.add_argument(
+        "--num-cases",
+        type=int,
+        default=DEFAULT_NUM_CASES,
+        help="the number of random cases to generate",
+    )
+
+    parser.add_argument(
+        "--max-refs",
+        type=int,
+        default=DEFAULT_MAX_REFS,
+        help="the maximum number of references in each case",
+    )
+
+    parser.add_argument(
+        "--seed", type=int, default=0, help="the seed of the random cases"
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON file to which the minimized case of every "
+        "divergence will be written",
+    )
+
+    cli_args = parser.parse_args(args)
+    if cli_args.engine is None:
+        cli_args.engine = list(ENGINES)
+    if cli_args.num_cases < 1 or cli_args.max_refs < 1:
+        parser.error("--num-cases and --max-refs must be positive")
+    return cli_args
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    divergences = []
+    engine_num_cases = dict.fromkeys(cli_args.engine, 0)
+    for engine_name, minimized in run_fuzz(
+        cli_args.engine,
+        num_cases=cli_args.num_cases,
+        max_refs=cli_args.max_refs,
+        seed=cli_args.seed,
+    ):
+        engine_num_cases[engine_name] += 1
+        if minimized is None:
+            continue
+        case, divergence = minimized
+        divergences.append(
+            {"engine": engine_name, "divergence": divergence, "case": case.to_dict()}
+        )
+        print(
+            "{} diverged: {}\n  {}".format(
+                engine_name, divergence, json.dumps(case.to_dict())
+            ),
+            file=sys.stderr,
+        )
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as divergences_file:
+            json.dump(divergences, divergences_file)
+            divergences_file.write("\n")
+    table_width = get_table_width()
+    print()
+    display_results(cli_args.engine, engine_num_cases, divergences, table_width)
+    print()
+    if divergences:
+        sys.exit("{} divergences found".format(len(divergences)))
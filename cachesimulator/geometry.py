@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import math
+
+
+# The dimensions of a cache, along with how each address referencing it is
+# divided into a tag, index, and offset; if the addresses referencing the cache
+# are byte addresses, num_byte_offset_bits is the number of low-order bits
+# which select a byte within a word (and which are dropped to produce the word
+# address)
+class CacheGeometry(object):
+    def __init__(
+        self,
+        cache_size,
+        num_blocks_per_set,
+        num_words_per_block,
+        num_addr_bits=1,
+        max_word_addr=0,
+        num_byte_offset_bits=0,
+    ):
+        self.cache_size = cache_size
+        self.num_blocks_per_set = num_blocks_per_set
+        self.num_words_per_block = num_words_per_block
+        self.num_blocks = cache_size // num_words_per_block
+        self.num_sets = self.num_blocks // num_blocks_per_set
+
+        self.num_byte_offset_bits = num_byte_offset_bits
+
+        # Ensure that the number of bits used to represent each address is
+        # always large enough to represent the largest address (bit_length is
+        # used rather than log2, which is inexact for addresses near 2^64)
+        self.num_addr_bits = max(num_addr_bits, max_word_addr.bit_length())
+
+        self.num_offset_bits = int(math.log2(num_words_per_block))
+        self.num_index_bits = int(math.log2(self.num_sets))
+        self.num_tag_bits = (
+            self.num_addr_bits - self.num_index_bits - self.num_offset_bits
+        )
+
+
+# Retrieves the number of low-order bits which select a byte within a word
+# for addresses of the given unit ("word" or "byte")
+def get_num_byte_offset_bits(word_size, addr_unit):
+    if addr_unit == "byte":
+        return int(math.log2(word_size))
+    else:
+        return 0
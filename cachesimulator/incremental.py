@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from array import array
+from pathlib import Path
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import CacheKernel
+from cachesimulator.stats import SimulationStats
+from cachesimulator.table import Table, format_count, format_rate, get_table_width
+from cachesimulator.trace import parse_trace_addr
+
+# The version of the format of saved simulation states; states saved under a
+# different version are never resumed
+STATE_VERSION = 1
+# The suffix appended to the path of a trace file to find its saved state
+STATE_FILE_SUFFIX = ".state.json"
+# The number of bytes preceding the saved offset of a trace whose digest is
+# saved with the state, so that a trace which has been rewritten (rather than
+# appended to) is detected without reading the whole trace again
+TAIL_DIGEST_SIZE = 4096
+# The maximum number of addresses read into the cache at a time
+READ_CHUNK_SIZE = 65536
+# The names of all statistics table columns
+STATS_COL_NAMES = ("Refs", "New Refs", "Hits", "Misses", "Hit Rate")
+
+
+# Retrieves the path of the file in which the simulation state of the given
+# trace file is saved by default, alongside the trace itself
+def get_default_state_path(trace_path):
+    return Path(str(trace_path) + STATE_FILE_SUFFIX)
+
+
+# Computes a digest of the bytes of the given (binary) trace file which
+# immediately precede the given offset
+def get_tail_digest(trace_file, offset):
+    tail_start = max(0, offset - TAIL_DIGEST_SIZE)
+    trace_file.seek(tail_start)
+    return hashlib.sha256(trace_file.read(offset - tail_start)).hexdigest()
+
+
+# A simulation of a trace file which is periodically appended to; the state of
+# the cache, the statistics so far, and the offset of the first unread byte of
+# the trace are saved after each update, so that the next update only reads
+# what has since been appended to the trace
+class IncrementalSimulation(object):
+    def __init__(self, trace_path, sim_args, state_path=None):
+        self.trace_path = Path(trace_path)
+        if state_path is None:
+            state_path = get_default_state_path(trace_path)
+        self.state_path = Path(state_path)
+        # The parameters of the simulation (cache_size, num_blocks_per_set,
+        # num_words_per_block, word_size, addr_unit, and replacement_policy),
+        # which must match those of a saved state for it to be resumed
+        self.sim_args = sim_args
+        self.geometry = CacheGeometry(
+            sim_args["cache_size"],
+            sim_args["num_blocks_per_set"],
+            sim_args["num_words_per_block"],
+            num_byte_offset_bits=get_num_byte_offset_bits(
+                sim_args["word_size"], sim_args["addr_unit"]
+            ),
+        )
+        self.reset()
+
+    # Discards all progress, so that the trace is next read from the start
+    def reset(self):
+        self.kernel = CacheKernel(
+            self.geometry.num_index_bits,
+            self.geometry.num_offset_bits,
+            self.geometry.num_blocks_per_set,
+            evict_mru=self.sim_args["replacement_policy"] == "mru",
+        )
+        self.stats = SimulationStats()
+        self.offset = 0
+
+    # Retrieves the state of the simulation as a dictionary suitable for
+    # serialization; each set is saved with its blocks in slot order and in
+    # order of recency, so that the cache can be restored exactly
+    def get_state(self, tail_digest):
+        return {
+            "version": STATE_VERSION,
+            "sim_args": self.sim_args,
+            "offset": self.offset,
+            "tail_digest": tail_digest,
+            "num_hits": self.stats.num_hits,
+            "num_misses": self.stats.num_misses,
+            "sets": {
+                str(set_index): {
+                    "slots": blocks,
+                    "recency": self.kernel.get_set_recency(set_index),
+                }
+                for set_index, blocks in enumerate(self.kernel.slots)
+                if blocks
+            },
+        }
+
+    # Restores the saved state of the simulation, if any; returns True if the
+    # state was restored, or False if there is no usable state (because it
+    # was saved for different parameters, or because the trace has since been
+    # truncated or rewritten)
+    def load_state(self):
+        try:
+            with open(self.state_path) as state_file:
+                state = json.load(state_file)
+        except (OSError, ValueError):
+            return False
+        if state.get("version") != STATE_VERSION:
+            return False
+        if state["sim_args"] != self.sim_args:
+            return False
+        with open(self.trace_path, "rb") as trace_file:
+            trace_size = trace_file.seek(0, os.SEEK_END)
+            if trace_size < state["offset"]:
+                return False
+            if get_tail_digest(trace_file, state["offset"]) != state["tail_digest"]:
+                return False
+        self.reset()
+        for set_index, set_state in state["sets"].items():
+            set_index = int(set_index)
+            slots = set_state["slots"]
+            self.kernel.slots[set_index] = slots
+            for block_addr in set_state["recency"]:
+                self.kernel.restore_resident_block(
+                    set_index, block_addr, slots.index(block_addr)
+                )
+        self.stats = SimulationStats(state["num_hits"], state["num_misses"])
+        self.offset = state["offset"]
+        return True
+
+    # Saves the state of the simulation, replacing any previously saved state
+    def save_state(self, tail_digest):
+        # The state is written to a temporary file which then replaces the
+        # state file, so that an interrupted update never leaves a partial
+        # state behind
+        temp_fd, temp_path = tempfile.mkstemp(dir=self.state_path.parent, suffix=".tmp")
+        with os.fdopen(temp_fd, "w") as temp_file:
+            json.dump(self.get_state(tail_digest), temp_file)
+        os.replace(temp_path, self.state_path)
+
+    # Reads the given addresses into the cache, adding their hits and misses
+    # to the statistics
+    def read_chunk(self, chunk):
+        statuses = bytearray(len(chunk))
+        num_hits = self.kernel.read_addrs(
+            chunk, self.geometry.num_byte_offset_bits, statuses
+        )
+        self.stats.num_hits += num_hits
+        self.stats.num_misses += len(chunk) - num_hits
+
+    # Reads every address appended to the trace since it was last read, then
+    # saves the state of the simulation; only complete lines are read, since
+    # a final line without a newline may still be being written; returns the
+    # number of addresses read
+    def update(self):
+        num_new_refs = 0
+        chunk = array("Q")
+        with open(self.trace_path, "rb") as trace_file:
+            trace_file.seek(self.offset)
+            for line in trace_file:
+                if not line.endswith(b"\n"):
+                    break
+                self.offset += len(line)
+                line = line.decode().partition("#")[0]
+                chunk.extend(map(parse_trace_addr, line.split()))
+                if len(chunk) >= READ_CHUNK_SIZE:
+                    self.read_chunk(chunk)
+                    num_new_refs += len(chunk)
+                    chunk = array("Q")
+            self.read_chunk(chunk)
+            num_new_refs += len(chunk)
+            tail_digest = get_tail_digest(trace_file, self.offset)
+        self.save_state(tail_digest)
+        return num_new_refs
+
+
+# Displays the statistics of the given simulation as a table
+def display_stats(stats, num_new_refs, table_width):
+    table = Table.create_stats_table("Statistics", STATS_COL_NAMES, table_width)
+    table.rows.append(
+        (
+            format_count(stats.get_num_refs()),
+            format_count(num_new_refs),
+            format_count(stats.num_hits),
+            format_count(stats.num_misses),
+            format_rate(stats.get_hit_rate()),
+        )
+    )
+    print(table)
+
+
+# Parse command-line arguments passed to the update subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator update",
+        description="update the statistics of a trace which has been appended to",
+    )
+
+    parser.add_argument("trace_file", help="the path of the trace file to simulate")
+
+    parser.add_argument(
+        "--cache-size", type=int, required=True, help="the size of the cache in words"
+    )
+
+    parser.add_argument(
+        "--num-blocks-per-set", type=int, default=1, help="the number of blocks per set"
+    )
+
+    parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        default=1,
+        help="the number of words per block",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru"),
+        default="lru",
+        type=str.lower,
+        help="the cache replacement policy (LRU or MRU)",
+    )
+
+    parser.add_argument(
+        "--state-file",
+        help="the path of the file in which the simulation state is saved "
+        "(defaults to the trace path followed by {})".format(STATE_FILE_SUFFIX),
+    )
+
+    parser.add_argument(
+        "--restart",
+        action="store_true",
+        help="ignore any saved state and simulate the trace from the start",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON file to which the statistics will be written",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    simulation = IncrementalSimulation(
+        cli_args.trace_file,
+        {
+            "cache_size": cli_args.cache_size,
+            "num_blocks_per_set": cli_args.num_blocks_per_set,
+            "num_words_per_block": cli_args.num_words_per_block,
+            "word_size": cli_args.word_size,
+            "addr_unit": cli_args.addr_unit,
+            "replacement_policy": cli_args.replacement_policy,
+        },
+        state_path=cli_args.state_file,
+    )
+    if not cli_args.restart:
+        simulation.load_state()
+    num_new_refs = simulation.update()
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as stats_file:
+            json.dump(
+                dict(simulation.stats.to_dict(), num_new_refs=num_new_refs),
+                stats_file,
+            )
+            stats_file.write("\n")
+    table_width = get_table_width()
+    print()
+    display_stats(simulation.stats, num_new_refs, table_width)
+    print()
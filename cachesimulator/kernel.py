@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+# The core simulation loop, kept in a self-contained and fully typed module so
+# that it can be compiled with mypyc (e.g. `mypyc cachesimulator/kernel.py`)
+# or Cython; a compiled extension module placed alongside this file is
+# imported in its place, and this file is used as-is otherwise
+
+import collections
+import heapq
+from array import array
+from typing import Dict, List, Optional, OrderedDict, Sequence, Set, Tuple
+
+# The cache statuses written for each address (matching the values of
+# ReferenceCacheStatus)
+STATUS_MISS = 0
+STATUS_HIT = 1
+# The largest number of blocks per set for which the blocks of a set are found
+# by scanning a list, which is faster for small sets than hashing; the blocks
+# of larger sets are found by hashing, which takes constant time however many
+# blocks are in a set
+MAX_SCANNED_BLOCKS_PER_SET = 32
+# The next use recorded for a block which is never used again
+NO_NEXT_USE = (1 << 64) - 1
+
+
+# Computes the next use of the block of each of the given addresses, i.e. the
+# time at which the same block is next read, where the first address is read
+# at the given start time; the given dictionary maps each block to its first
+# use after the last address (if any), and is updated to map each block to its
+# first use among the given addresses, so that a trace can be processed in
+# chunks from its last chunk to its first
+def get_next_uses(
+    addrs: Sequence[int], shift: int, start_time: int, next_seen: Dict[int, int]
+) -> "array[int]":
+    next_uses = array("Q", bytes(8 * len(addrs)))
+    for position in range(len(addrs) - 1, -1, -1):
+        block_addr = addrs[position] >> shift
+        next_uses[position] = next_seen.get(block_addr, NO_NEXT_USE)
+        next_seen[block_addr] = start_time + position
+    return next_uses
+
+
+# A cache which tracks only the block address of every resident block; the
+# block address (the word address without its offset bits) identifies the
+# index and tag of a block at once, so decoding an address takes a single shift
+class CacheKernel(object):
+    def __init__(
+        self,
+        num_index_bits: int,
+        num_offset_bits: int,
+        num_blocks_per_set: int,
+        evict_mru: bool,
+    ) -> None:
+        self.num_offset_bits = num_offset_bits
+        self.index_mask = (1 << num_index_bits) - 1
+        self.num_blocks_per_set = num_blocks_per_set
+        self.evict_mru = evict_mru
+        # The block address in each slot of each set, in slot order
+        self.slots: List[List[int]] = [[] for _ in range(1 << num_index_bits)]
+        # The resident blocks of each set, ordered from least-recently used to
+        # most; for large sets, each block is also mapped to its slot (and the
+        # lists are left empty)
+        self.recency: List[List[int]] = []
+        self.hashed_recency: List[OrderedDict[int, int]] = []
+        if num_blocks_per_set <= MAX_SCANNED_BLOCKS_PER_SET:
+            self.recency = [[] for _ in range(1 << num_index_bits)]
+        else:
+            self.hashed_recency = [
+                collections.OrderedDict() for _ in range(1 << num_index_bits)
+            ]
+        # Every resident block, mapped to the time it was last read (blocks
+        # are removed once replaced, so the cache never holds more entries
+        # than it has blocks)
+        self.last_used: Dict[int, int] = {}
+        self.time = 0
+        # The sets whose contents have changed since they were last retrieved
+        # with pop_changed_sets
+        self.changed_sets: Set[int] = set()
+
+    # Marks the given block as the most recently read of all blocks without
+    # reading it; used to restore the state of an existing cache
+    def touch_block(self, block_addr: int) -> None:
+        self.last_used[block_addr] = self.time
+        self.time += 1
+
+    # Restores the given resident block in the given slot of the given set as
+    # the most recently used block of that set (and of all blocks)
+    def restore_resident_block(
+        self, set_index: int, block_addr: int, slot: int
+    ) -> None:
+        self.touch_block(block_addr)
+        if self.hashed_recency:
+            self.hashed_recency[set_index][block_addr] = slot
+        else:
+            self.recency[set_index].append(block_addr)
+
+    # Reads the given addresses into the cache, writing the cache status of
+    # each into the given statuses (starting at the given position), and
+    # returning the number of hits; the next use of each address is only
+    # needed by OptimalCacheKernel, and is ignored otherwise
+    def read_addrs(
+        self,
+        addrs: Sequence[int],
+        num_byte_offset_bits: int,
+        statuses: bytearray,
+        start: int = 0,
+        next_uses: Optional[Sequence[int]] = None,
+    ) -> int:
+        if self.hashed_recency:
+            return self.read_addrs_hashed(addrs, num_byte_offset_bits, statuses, start)
+        return self.read_addrs_scanned(addrs, num_byte_offset_bits, statuses, start)
+
+    # Reads the given addresses (as in read_addrs) into a cache whose sets are
+    # small enough to be scanned
+    def read_addrs_scanned(
+        self,
+        addrs: Sequence[int],
+        num_byte_offset_bits: int,
+        statuses: bytearray,
+        start: int = 0,
+    ) -> int:
+        shift = num_byte_offset_bits + self.num_offset_bits
+        index_mask = self.index_mask
+        num_blocks_per_set = self.num_blocks_per_set
+        evict_mru = self.evict_mru
+        all_slots = self.slots
+        all_recency = self.recency
+        last_used = self.last_used
+        changed_sets = self.changed_sets
+        time = self.time
+        num_hits = 0
+        for position in range(len(addrs)):
+            block_addr = addrs[position] >> shift
+            last_used[block_addr] = time
+            time += 1
+            set_index = block_addr & index_mask
+            recency = all_recency[set_index]
+            if recency and recency[-1] == block_addr:
+                # The block is already the most recently used
+                statuses[start + position] = STATUS_HIT
+                num_hits += 1
+            elif block_addr in recency:
+                recency.remove(block_addr)
+                recency.append(block_addr)
+                statuses[start + position] = STATUS_HIT
+                num_hits += 1
+            else:
+                slots = all_slots[set_index]
+                if len(slots) < num_blocks_per_set:
+                    slots.append(block_addr)
+                else:
+                    if evict_mru:
+                        victim = recency.pop()
+                    else:
+                        victim = recency.pop(0)
+                    del last_used[victim]
+                    slots[slots.index(victim)] = block_addr
+                recency.append(block_addr)
+                changed_sets.add(set_index)
+                statuses[start + position] = STATUS_MISS
+        self.time = time
+        return num_hits
+
+    # Reads the given addresses (as in read_addrs) into a cache whose sets are
+    # too large to be scanned
+    def read_addrs_hashed(
+        self,
+        addrs: Sequence[int],
+        num_byte_offset_bits: int,
+        statuses: bytearray,
+        start: int = 0,
+    ) -> int:
+        shift = num_byte_offset_bits + self.num_offset_bits
+        index_mask = self.index_mask
+        num_blocks_per_set = self.num_blocks_per_set
+        evict_mru = self.evict_mru
+        all_slots = self.slots
+        all_recency = self.hashed_recency
+        last_used = self.last_used
+        changed_sets = self.changed_sets
+        time = self.time
+        num_hits = 0
+        for position in range(len(addrs)):
+            block_addr = addrs[position] >> shift
+            last_used[block_addr] = time
+            time += 1
+            set_index = block_addr & index_mask
+            recency = all_recency[set_index]
+            if block_addr in recency:
+                recency.move_to_end(block_addr)
+                statuses[start + position] = STATUS_HIT
+                num_hits += 1
+            else:
+                slots = all_slots[set_index]
+                if len(slots) < num_blocks_per_set:
+                    slot = len(slots)
+                    slots.append(block_addr)
+                else:
+                    # The last block is the most recently used, and the first
+                    # the least
+                    victim, slot = recency.popitem(last=evict_mru)
+                    del last_used[victim]
+                    slots[slot] = block_addr
+                recency[block_addr] = slot
+                changed_sets.add(set_index)
+                statuses[start + position] = STATUS_MISS
+        self.time = time
+        return num_hits
+
+    # Retrieves every resident block, ordered from least-recently read to most
+    def get_recently_used_blocks(self) -> List[int]:
+        last_used = self.last_used
+        return sorted(last_used, key=last_used.__getitem__)
+
+    # Retrieves the resident blocks of the given set, ordered from
+    # least-recently used to most
+    def get_set_recency(self, set_index: int) -> List[int]:
+        if self.hashed_recency:
+            return list(self.hashed_recency[set_index])
+        return list(self.recency[set_index])
+
+    # Retrieves the blocks (in slot order) of every set whose contents have
+    # changed since this method was last called
+    def pop_changed_sets(self) -> Dict[int, Tuple[int, ...]]:
+        changed_sets = {
+            set_index: tuple(self.slots[set_index])
+            for set_index in sorted(self.changed_sets)
+        }
+        self.changed_sets = set()
+        return changed_sets
+
+
+# A cache which replaces the block whose next use is furthest in the future
+# (Belady's optimal policy); each set keeps a heap of its blocks ordered by
+# next use (furthest first), so a victim is chosen in logarithmic time. Heap
+# entries are not removed when a block is read again, but are skipped once
+# they no longer match the block's next use
+class OptimalCacheKernel(CacheKernel):
+    def __init__(
+        self, num_index_bits: int, num_offset_bits: int, num_blocks_per_set: int
+    ) -> None:
+        super().__init__(
+            num_index_bits, num_offset_bits, num_blocks_per_set, evict_mru=False
+        )
+        # The resident blocks of each set, each mapped to its slot
+        self.resident: List[Dict[int, int]] = [{} for _ in range(1 << num_index_bits)]
+        # The heap of (negated next use, slot, block address) entries of each set
+        self.heaps: List[List[Tuple[int, int, int]]] = [
+            [] for _ in range(1 << num_index_bits)
+        ]
+        # Every resident block, mapped to its next use
+        self.next_use: Dict[int, int] = {}
+
+    def restore_resident_block(
+        self, set_index: int, block_addr: int, slot: int
+    ) -> None:
+        self.touch_block(block_addr)
+        self.resident[set_index][block_addr] = slot
+        self.next_use[block_addr] = NO_NEXT_USE
+        heapq.heappush(self.heaps[set_index], (-NO_NEXT_USE, slot, block_addr))
+
+    # Rebuilds the heap of every non-empty set from the next uses of its blocks
+    def rebuild_heaps(self) -> None:
+        next_use = self.next_use
+        for set_index, resident in enumerate(self.resident):
+            if resident:
+                heap = [
+                    (-next_use[block_addr], slot, block_addr)
+                    for block_addr, slot in resident.items()
+                ]
+                heapq.heapify(heap)
+                self.heaps[set_index] = heap
+
+    # Reads the given addresses into the cache as in CacheKernel.read_addrs;
+    # the next use of each address (as computed by get_next_uses from the
+    # current time) may be given, and is otherwise computed from the given
+    # addresses alone, as though the trace ended after the last of them
+    def read_addrs(
+        self,
+        addrs: Sequence[int],
+        num_byte_offset_bits: int,
+        statuses: bytearray,
+        start: int = 0,
+        next_uses: Optional[Sequence[int]] = None,
+    ) -> int:
+        shift = num_byte_offset_bits + self.num_offset_bits
+        next_use = self.next_use
+        if next_uses is None:
+            next_seen: Dict[int, int] = {}
+            next_uses = get_next_uses(addrs, shift, self.time, next_seen)
+            # The next use of every resident block is now known as well
+            for block_addr in next_use:
+                next_use[block_addr] = next_seen.get(block_addr, NO_NEXT_USE)
+            self.rebuild_heaps()
+        index_mask = self.index_mask
+        num_blocks_per_set = self.num_blocks_per_set
+        max_heap_size = 2 * num_blocks_per_set
+        all_slots = self.slots
+        all_resident = self.resident
+        all_heaps = self.heaps
+        last_used = self.last_used
+        changed_sets = self.changed_sets
+        time = self.time
+        num_hits = 0
+        for position in range(len(addrs)):
+            block_addr = addrs[position] >> shift
+            last_used[block_addr] = time
+            time += 1
+            set_index = block_addr & index_mask
+            resident = all_resident[set_index]
+            heap = all_heaps[set_index]
+            if block_addr in resident:
+                slot = resident[block_addr]
+                statuses[start + position] = STATUS_HIT
+                num_hits += 1
+            else:
+                slots = all_slots[set_index]
+                if len(slots) < num_blocks_per_set:
+                    slot = len(slots)
+                    slots.append(block_addr)
+                else:
+                    while True:
+                        neg_victim_next_use, slot, victim = heapq.heappop(heap)
+                        if (
+                            slots[slot] == victim
+                            and next_use[victim] == -neg_victim_next_use
+                        ):
+                            break
+                    del resident[victim]
+                    del next_use[victim]
+                    del last_used[victim]
+                    slots[slot] = block_addr
+                resident[block_addr] = slot
+                changed_sets.add(set_index)
+                statuses[start + position] = STATUS_MISS
+            block_next_use = next_uses[position]
+            next_use[block_addr] = block_next_use
+            heapq.heappush(heap, (-block_next_use, slot, block_addr))
+            # Skipped entries are discarded once they outnumber the blocks
+            if len(heap) > max_heap_size:
+                heap[:] = [
+                    (-next_use[resident_addr], resident_slot, resident_addr)
+                    for resident_addr, resident_slot in resident.items()
+                ]
+                heapq.heapify(heap)
+        self.time = time
+        return num_hits
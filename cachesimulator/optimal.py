@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+import contextlib
+import itertools
+import tempfile
+from array import array
+from collections.abc import Sequence
+
+from cachesimulator.kernel import get_next_uses
+
+# The number of addresses whose next uses are computed (and read) at a time
+NEXT_USE_CHUNK_SIZE = 65536
+# The number of bytes in each stored address and next use
+ITEM_SIZE = 8
+
+
+# Reads the given chunk of addresses from the given sequence or spooled trace
+# file; chunks of a sequence are copied, so that no view of the sequence (such
+# as a slice of a memoryview) outlives the chunk
+def read_addr_chunk(word_addrs, start, end):
+    if isinstance(word_addrs, Sequence):
+        return array("Q", word_addrs[start:end])
+    chunk = array("Q")
+    word_addrs.seek(start * ITEM_SIZE)
+    chunk.fromfile(word_addrs, end - start)
+    return chunk
+
+
+# Lazily yields chunks of the given addresses (which may be any iterable,
+# including a lazily read trace), each along with the next use (as computed by
+# get_next_uses, starting at the given time) of every address in the chunk;
+# the next uses are computed in a single backward pass over the trace, one
+# chunk at a time, so that memory use is bounded by the size of a chunk and
+# the number of distinct blocks rather than the length of the trace. Traces
+# which are not sequences are first spooled to a temporary file, since they
+# cannot be read backward, and the next uses are always stored in one
+def iter_next_use_chunks(
+    word_addrs, shift, start_time=0, chunk_size=NEXT_USE_CHUNK_SIZE
+):
+    with contextlib.ExitStack() as stack:
+        next_uses_file = stack.enter_context(tempfile.TemporaryFile())
+        addrs_file = stack.enter_context(tempfile.TemporaryFile())
+        if isinstance(word_addrs, Sequence):
+            num_addrs = len(word_addrs)
+        else:
+            num_addrs = 0
+            word_addrs = iter(word_addrs)
+            while True:
+                chunk = array("Q", itertools.islice(word_addrs, chunk_size))
+                if not chunk:
+                    break
+                chunk.tofile(addrs_file)
+                num_addrs += len(chunk)
+            word_addrs = addrs_file
+
+        chunk_starts = range(0, num_addrs, chunk_size)
+        next_seen = {}
+        for start in reversed(chunk_starts):
+            end = min(start + chunk_size, num_addrs)
+            next_uses = get_next_uses(
+                read_addr_chunk(word_addrs, start, end),
+                shift,
+                start_time + start,
+                next_seen,
+            )
+            next_uses_file.seek(start * ITEM_SIZE)
+            next_uses.tofile(next_uses_file)
+        # The first use of each block is no longer needed
+        del next_seen
+
+        for start in chunk_starts:
+            end = min(start + chunk_size, num_addrs)
+            next_uses = array("Q")
+            next_uses_file.seek(start * ITEM_SIZE)
+            next_uses.fromfile(next_uses_file, end - start)
+            yield read_addr_chunk(word_addrs, start, end), next_uses
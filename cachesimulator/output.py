@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+import ast
+import contextlib
+import csv
+import itertools
+import json
+import struct
+import sys
+from array import array
+from collections.abc import Sequence
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import STATUS_HIT, CacheKernel, OptimalCacheKernel
+from cachesimulator.optimal import iter_next_use_chunks
+from cachesimulator.stats import SimulationStats
+
+# The names of the fields written for each reference
+REF_FIELD_NAMES = ("word_addr", "tag", "index", "offset", "status")
+# The maximum number of addresses simulated (and written) at a time
+WRITE_CHUNK_SIZE = 65536
+# The magic string and version which begin every .npy file
+NPY_MAGIC = b"\x93NUMPY\x01\x00"
+# The length of every .npy header written, including the magic string; the
+# header is padded to a fixed length so that it can be rewritten in place once
+# the number of references is known
+NPY_HEADER_SIZE = 128
+
+
+# Decodes the given word addresses into the fields written for each reference
+# (with None for any component which has no bits)
+def get_ref_fields(word_addrs, statuses, geometry):
+    num_offset_bits = geometry.num_offset_bits
+    num_index_bits = geometry.num_index_bits
+    offset_mask = (1 << num_offset_bits) - 1
+    index_mask = (1 << num_index_bits) - 1
+    for word_addr, status in zip(word_addrs, statuses):
+        yield (
+            word_addr,
+            word_addr >> (num_offset_bits + num_index_bits),
+            (word_addr >> num_offset_bits) & index_mask if num_index_bits else None,
+            word_addr & offset_mask if num_offset_bits else None,
+            "hit" if status == STATUS_HIT else "miss",
+        )
+
+
+# Writes each reference as a JSON object on its own line
+class JsonLinesWriter(object):
+    def __init__(self, results_file, geometry, num_refs=None):
+        self.results_file = results_file
+        self.geometry = geometry
+
+    def write_chunk(self, word_addrs, statuses):
+        self.results_file.writelines(
+            json.dumps(dict(zip(REF_FIELD_NAMES, fields))) + "\n"
+            for fields in get_ref_fields(word_addrs, statuses, self.geometry)
+        )
+
+    def close(self):
+        pass
+
+
+# Writes each reference as a row of a CSV file (with a header row)
+class CsvWriter(object):
+    def __init__(self, results_file, geometry, num_refs=None):
+        self.writer = csv.writer(results_file, lineterminator="\n")
+        self.geometry = geometry
+        self.writer.writerow(REF_FIELD_NAMES)
+
+    def write_chunk(self, word_addrs, statuses):
+        self.writer.writerows(get_ref_fields(word_addrs, statuses, self.geometry))
+
+    def close(self):
+        pass
+
+
+# Writes the cache status of each reference (1 for a hit and 0 for a miss) as
+# a one-dimensional array of unsigned bytes in NumPy's .npy format; if the
+# number of references is not known in advance, the file must be seekable so
+# that its header can be rewritten once every reference has been written
+class NpyWriter(object):
+    def __init__(self, results_file, geometry, num_refs=None):
+        self.results_file = results_file
+        self.num_refs = num_refs
+        self.num_written = 0
+        self.results_file.write(self.get_header(num_refs or 0))
+
+    # Retrieves the header of a .npy file holding the given number of statuses
+    def get_header(self, num_refs):
+        header_dict = "{{'descr': '|u1', 'fortran_order': False, 'shape': ({},), }}"
+        header_dict = header_dict.format(num_refs)
+        header_len = NPY_HEADER_SIZE - len(NPY_MAGIC) - 2
+        return (
+            NPY_MAGIC
+            + struct.pack("<H", header_len)
+            + header_dict.ljust(header_len - 1).encode("latin1")
+            + b"\n"
+        )
+
+    def write_chunk(self, word_addrs, statuses):
+        self.results_file.write(statuses)
+        self.num_written += len(statuses)
+
+    def close(self):
+        if self.num_written != self.num_refs:
+            self.results_file.seek(0)
+            self.results_file.write(self.get_header(self.num_written))
+            self.results_file.seek(0, 2)
+
+
+# The writer for each machine-readable output format, and whether it writes
+# binary (rather than text) data
+RESULTS_WRITERS = {
+    "jsonl": (JsonLinesWriter, False),
+    "csv": (CsvWriter, False),
+    "binary": (NpyWriter, True),
+}
+
+
+# Reads the cache statuses from the given .npy file written by NpyWriter
+def read_npy_statuses(npy_file):
+    magic = npy_file.read(len(NPY_MAGIC))
+    if magic != NPY_MAGIC:
+        raise ValueError("not a .npy file")
+    (header_len,) = struct.unpack("<H", npy_file.read(2))
+    header = ast.literal_eval(npy_file.read(header_len).decode("latin1"))
+    (num_refs,) = header["shape"]
+    return bytearray(npy_file.read(num_refs))
+
+
+# Writes the given statistics to the given file in the given output format
+def write_stats(stats, stats_file, output_format):
+    stats_dict = stats.to_dict()
+    if output_format == "csv":
+        writer = csv.writer(stats_file, lineterminator="\n")
+        writer.writerow(stats_dict.keys())
+        writer.writerow(stats_dict.values())
+    else:
+        stats_file.write(json.dumps(stats_dict) + "\n")
+
+
+# Lazily yields chunks of the given addresses, each along with the next uses
+# of its addresses (which are not needed, and so are always None)
+def iter_addr_chunks(word_addrs):
+    word_addrs = iter(word_addrs)
+    while True:
+        chunk = array("Q", itertools.islice(word_addrs, WRITE_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield chunk, None
+
+
+# Simulates the given addresses (which may be any iterable, including a
+# lazily read trace) in chunks, writing the results of each chunk with the
+# given writer as soon as it has been simulated; returns the statistics of
+# the simulation
+def stream_results(word_addrs, geometry, replacement_policy, results_writer):
+    if replacement_policy == "opt":
+        kernel = OptimalCacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+        )
+        # The optimal policy needs the next use of every address, which is
+        # found by a backward pass over the trace before any is simulated
+        chunks = iter_next_use_chunks(
+            word_addrs,
+            geometry.num_byte_offset_bits + geometry.num_offset_bits,
+            chunk_size=WRITE_CHUNK_SIZE,
+        )
+    else:
+        kernel = CacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+            evict_mru=replacement_policy == "mru",
+        )
+        chunks = iter_addr_chunks(word_addrs)
+    stats = SimulationStats()
+    for chunk, next_uses in chunks:
+        statuses = bytearray(len(chunk))
+        num_hits = kernel.read_addrs(
+            chunk, geometry.num_byte_offset_bits, statuses, next_uses=next_uses
+        )
+        stats.num_hits += num_hits
+        stats.num_misses += len(chunk) - num_hits
+        if geometry.num_byte_offset_bits:
+            chunk = array(
+                "Q", (addr >> geometry.num_byte_offset_bits for addr in chunk)
+            )
+        results_writer.write_chunk(chunk, statuses)
+    results_writer.close()
+    return stats
+
+
+# Runs a simulation with the given parameters (named as in Simulator.simulate),
+# writing the results of every reference to the given file in the given
+# machine-readable output format, and the statistics of the simulation to the
+# given stats file (if any); the results file must be opened in binary mode
+# for the binary format, and in text mode otherwise
+def write_simulation_results(
+    num_blocks_per_set,
+    num_words_per_block,
+    cache_size,
+    replacement_policy,
+    word_addrs,
+    output_format,
+    results_file,
+    stats_file=None,
+    word_size=4,
+    addr_unit="word",
+):
+    geometry = CacheGeometry(
+        cache_size,
+        num_blocks_per_set,
+        num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(word_size, addr_unit),
+    )
+    writer_class, _ = RESULTS_WRITERS[output_format]
+    try:
+        num_refs = len(word_addrs)
+    except TypeError:
+        num_refs = None
+    results_writer = writer_class(results_file, geometry, num_refs=num_refs)
+    stats = stream_results(word_addrs, geometry, replacement_policy, results_writer)
+    if stats_file is not None:
+        write_stats(stats, stats_file, output_format)
+    return stats
+
+
+# Runs a simulation with the given parameters, writing its results in the
+# given output format to the file at the given path (or to stdout), and its
+# statistics to the file at the given stats path (if any)
+def run_output_simulation(
+    num_blocks_per_set,
+    num_words_per_block,
+    cache_size,
+    replacement_policy,
+    word_addrs,
+    output_format,
+    output=None,
+    stats_output=None,
+    word_size=4,
+    addr_unit="word",
+):
+    _, is_binary = RESULTS_WRITERS[output_format]
+    with contextlib.ExitStack() as stack:
+        if output is not None:
+            results_file = stack.enter_context(open(output, "wb" if is_binary else "w"))
+        elif is_binary:
+            results_file = sys.stdout.buffer
+            # The header of a .npy file cannot be rewritten on stdout, so the
+            # number of references must be known before any are written
+            if not isinstance(word_addrs, Sequence):
+                word_addrs = array("Q", word_addrs)
+        else:
+            results_file = sys.stdout
+        if stats_output is not None:
+            stats_file = stack.enter_context(open(stats_output, "w"))
+        else:
+            stats_file = None
+        write_simulation_results(
+            num_blocks_per_set,
+            num_words_per_block,
+            cache_size,
+            replacement_policy,
+            word_addrs,
+            output_format,
+            results_file,
+            stats_file=stats_file,
+            word_size=word_size,
+            addr_unit=addr_unit,
+        )
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import contextlib
+import time
+
+
+# The timing and memory measurements recorded for a single pipeline stage
+class ProfileStage(object):
+    def __init__(self, name, elapsed_time, peak_mem, num_refs):
+        self.name = name
+        self.elapsed_time = elapsed_time
+        self.peak_mem = peak_mem
+        self.num_refs = num_refs
+
+    # Retrieves the number of references processed per second during this
+    # stage, or None if the stage did not process any references
+    def get_refs_per_sec(self):
+        if self.num_refs and self.elapsed_time > 0:
+            return self.num_refs / self.elapsed_time
+        else:
+            return None
+
+
+# A class for measuring the wall time and peak memory of each stage of the
+# simulation pipeline, optionally recording a cProfile dump of the entire run;
+# cProfile and tracemalloc are only imported once profiling starts, since the
+# simulator imports this module even when profiling is disabled
+class Profiler(object):
+    def __init__(self, stats_path=None):
+        self.stats_path = stats_path
+        self.stages = []
+        self.cprofile = None
+
+    # Begins tracing memory allocations (and function calls, if a stats path
+    # was given) for all subsequent stages
+    def start(self):
+        import cProfile
+        import tracemalloc
+
+        tracemalloc.start()
+        if self.stats_path is not None:
+            self.cprofile = cProfile.Profile()
+            self.cprofile.enable()
+
+    # Stops all tracing and writes the cProfile stats to disk (if requested)
+    def stop(self):
+        import tracemalloc
+
+        if self.cprofile is not None:
+            self.cprofile.disable()
+            self.cprofile.dump_stats(self.stats_path)
+            self.cprofile = None
+        tracemalloc.stop()
+
+    # Measures the stage of the pipeline run within the body of the with
+    # statement; num_refs may be set on the yielded stage if the number of
+    # references is not known until the stage has run
+    @contextlib.contextmanager
+    def stage(self, name, num_refs=0):
+        import tracemalloc
+
+        stage = ProfileStage(name, elapsed_time=0, peak_mem=0, num_refs=num_refs)
+        tracemalloc.reset_peak()
+        start_mem = tracemalloc.get_traced_memory()[0]
+        start_time = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.elapsed_time = time.perf_counter() - start_time
+            stage.peak_mem = max(0, tracemalloc.get_traced_memory()[1] - start_mem)
+            self.stages.append(stage)
+
+
+# A stand-in for Profiler which measures nothing, so that the simulation
+# pipeline does not need to check whether profiling is enabled
+class NullProfiler(object):
+    stages = ()
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    @contextlib.contextmanager
+    def stage(self, name, num_refs=0):
+        yield ProfileStage(name, elapsed_time=0, peak_mem=0, num_refs=num_refs)
+
+
+# Formats the given number of bytes using the largest appropriate binary unit
+def format_mem_size(num_bytes):
+    if num_bytes < 1024:
+        return "{} B".format(num_bytes)
+    for unit in ("KiB", "MiB", "GiB"):
+        num_bytes /= 1024
+        if num_bytes < 1024 or unit == "GiB":
+            return "{:.1f} {}".format(num_bytes, unit)
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+from array import array
 from collections import OrderedDict
 from enum import Enum
 
@@ -7,10 +8,32 @@
 from cachesimulator.word_addr import WordAddress
 
 
+# Stores the given addresses in a compact array of unsigned 64-bit integers,
+# raising a ValueError if any address is negative or does not fit in 64 bits
+def get_addr_array(word_addrs):
+    try:
+        return array("Q", word_addrs)
+    except OverflowError:
+        raise ValueError(
+            "word addresses must be from 0 to 2**64 - 1 (wider addresses are "
+            "not supported)"
+        ) from None
+
+
 # An address reference consisting of the address and all of its components
 class Reference(object):
+    # Slots avoid allocating a __dict__ for every one of the (potentially
+    # millions of) references in a trace
+    __slots__ = ("word_addr", "bin_addr", "offset", "index", "tag", "cache_status")
+
     def __init__(
-        self, word_addr, num_addr_bits, num_offset_bits, num_index_bits, num_tag_bits
+        self,
+        word_addr,
+        num_addr_bits,
+        num_offset_bits,
+        num_index_bits,
+        num_tag_bits,
+        cache_status=None,
     ):
         self.word_addr = WordAddress(word_addr)
         self.bin_addr = BinaryAddress(
@@ -19,10 +42,14 @@ def __init__(
         self.offset = self.bin_addr.get_offset(num_offset_bits)
         self.index = self.bin_addr.get_index(num_offset_bits, num_index_bits)
         self.tag = self.bin_addr.get_tag(num_tag_bits)
-        self.cache_status = None
+        self.cache_status = cache_status
 
     def __str__(self):
-        return str(OrderedDict(sorted(self.__dict__.items())))
+        return str(
+            OrderedDict(
+                sorted((name, getattr(self, name)) for name in Reference.__slots__)
+            )
+        )
 
     __repr__ = __str__
 
@@ -47,3 +74,85 @@ def __str__(self):
             return "miss"
 
     __repr__ = __str__
+
+
+# A compact, columnar sequence of references which stores only the address and
+# cache status of each reference; the remaining components of a reference are
+# decoded whenever the reference is retrieved from the batch
+class ReferenceBatch(object):
+    # The value stored for references whose cache status has not been set
+    NO_CACHE_STATUS = 0xFF
+
+    def __init__(
+        self,
+        word_addrs,
+        num_addr_bits,
+        num_offset_bits,
+        num_index_bits,
+        num_tag_bits,
+        num_byte_offset_bits=0,
+    ):
+        if isinstance(word_addrs, array) and word_addrs.typecode == "Q":
+            self.word_addrs = word_addrs
+        else:
+            self.word_addrs = get_addr_array(word_addrs)
+        self.cache_statuses = bytearray([self.NO_CACHE_STATUS]) * len(self.word_addrs)
+        self.num_addr_bits = num_addr_bits
+        self.num_offset_bits = num_offset_bits
+        self.num_index_bits = num_index_bits
+        self.num_tag_bits = num_tag_bits
+        # If non-zero, the stored addresses are byte addresses which are
+        # converted to word addresses as each reference is decoded
+        self.num_byte_offset_bits = num_byte_offset_bits
+
+    def __len__(self):
+        return len(self.word_addrs)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("reference batch index out of range")
+        return BatchReference(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield BatchReference(self, position)
+
+    def get_cache_status(self, position):
+        cache_status = self.cache_statuses[position]
+        if cache_status == self.NO_CACHE_STATUS:
+            return None
+        return ReferenceCacheStatus(cache_status)
+
+    def set_cache_status(self, position, cache_status):
+        if cache_status is None:
+            self.cache_statuses[position] = self.NO_CACHE_STATUS
+        else:
+            self.cache_statuses[position] = cache_status.value
+
+
+# A reference decoded from a ReferenceBatch, whose cache status is stored in
+# (and read from) the batch itself
+class BatchReference(Reference):
+    __slots__ = ("batch", "position")
+
+    def __init__(self, batch, position):
+        self.batch = batch
+        self.position = position
+        super().__init__(
+            batch.word_addrs[position] >> batch.num_byte_offset_bits,
+            batch.num_addr_bits,
+            batch.num_offset_bits,
+            batch.num_index_bits,
+            batch.num_tag_bits,
+            cache_status=batch.get_cache_status(position),
+        )
+
+    @property
+    def cache_status(self):
+        return self.batch.get_cache_status(self.position)
+
+    @cache_status.setter
+    def cache_status(self, cache_status):
+        self.batch.set_cache_status(self.position, cache_status)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+# The version of the format of cached results (and of the simulation which
+# produced them); results stored under a different version are never used
+RESULT_CACHE_VERSION = 1
+# The default maximum total size in bytes of all cached results
+DEFAULT_MAX_CACHE_SIZE = 64 * 1024 * 1024
+# The number of bytes of a trace file read at a time while hashing it
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+# Retrieves the default directory in which simulation results are cached
+def get_default_cache_dir():
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "cache-simulator"
+
+
+# Computes a digest of the contents of the given trace file
+def get_trace_digest(trace_path):
+    digest = hashlib.sha256()
+    with open(trace_path, "rb") as trace_file:
+        for chunk in iter(lambda: trace_file.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# An on-disk cache of simulation statistics, keyed by the digest of the
+# simulated trace and the parameters of the simulation; each result is stored
+# in its own file, whose modification time records when it was last used, so
+# that the least-recently used results can be evicted once the total size of
+# the cache exceeds its maximum; the cache may be shared by several processes
+class ResultCache(object):
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_CACHE_SIZE):
+        if cache_dir is None:
+            cache_dir = get_default_cache_dir()
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+
+    # Retrieves the key of the result of simulating the given trace file with
+    # the given simulation parameters
+    def get_key(self, trace_path, sim_args):
+        key_data = json.dumps(
+            {
+                "version": RESULT_CACHE_VERSION,
+                "trace_digest": get_trace_digest(trace_path),
+                "sim_args": sim_args,
+            },
+            sort_keys=True,
+        )
+        return hashlib.sha256(key_data.encode()).hexdigest()
+
+    def get_result_path(self, key):
+        return self.cache_dir / "{}.json".format(key)
+
+    # Retrieves the result stored under the given key, or None if there is
+    # no such result
+    def get(self, key):
+        result_path = self.get_result_path(key)
+        try:
+            with open(result_path) as result_file:
+                result = json.load(result_file)
+            # Mark the result as the most recently used
+            os.utime(result_path)
+        except (OSError, ValueError):
+            return None
+        return result
+
+    # Stores the given result under the given key, evicting the
+    # least-recently used results if the cache has grown too large
+    def put(self, key, result):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # The result is written to a temporary file which then replaces the
+        # result file, so that other processes never read a partial result
+        temp_fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        with os.fdopen(temp_fd, "w") as temp_file:
+            json.dump(result, temp_file)
+        os.replace(temp_path, self.get_result_path(key))
+        self.evict()
+
+    # Removes the least-recently used results until the total size of the
+    # cache no longer exceeds its maximum
+    def evict(self):
+        entries = []
+        for result_path in self.cache_dir.glob("*.json"):
+            try:
+                stat = result_path.stat()
+            except FileNotFoundError:
+                # The result was evicted by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, result_path))
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, result_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                result_path.unlink()
+            except FileNotFoundError:
+                pass
+            total_size -= size
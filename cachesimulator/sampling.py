@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import math
+from array import array
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import STATUS_MISS, CacheKernel, OptimalCacheKernel
+from cachesimulator.table import (
+    STAT_VALUE_COL_NAMES,
+    Table,
+    format_count,
+    format_rate,
+    get_table_width,
+)
+
+# The z-score of the confidence level of the reported error bounds (95%)
+CONFIDENCE_Z_SCORE = 1.96
+
+
+# Statistics extrapolated to an entire cache from the references to a sample
+# of its sets; the miss rate is estimated as the ratio of sampled misses to
+# sampled references, with the sampled sets treated as clusters drawn at random
+# from all sets when computing its error bound
+class SampledStats(object):
+    def __init__(self, num_refs, num_sets, set_num_refs, set_num_misses):
+        # The total number of references in the trace, sampled or not
+        self.num_refs = num_refs
+        self.num_sets = num_sets
+        # The number of references to (and misses in) each sampled set
+        self.set_num_refs = set_num_refs
+        self.set_num_misses = set_num_misses
+
+    def get_num_sampled_sets(self):
+        return len(self.set_num_refs)
+
+    def get_num_sampled_refs(self):
+        return sum(self.set_num_refs)
+
+    def get_num_sampled_misses(self):
+        return sum(self.set_num_misses)
+
+    def get_miss_rate(self):
+        if self.get_num_sampled_refs() == 0:
+            return 0.0
+        return self.get_num_sampled_misses() / self.get_num_sampled_refs()
+
+    def get_hit_rate(self):
+        return 1.0 - self.get_miss_rate()
+
+    # Retrieves the half-width of the confidence interval of the estimated
+    # miss rate, or None if too few sets were sampled to estimate it
+    def get_miss_rate_error(self):
+        num_sampled_sets = self.get_num_sampled_sets()
+        if num_sampled_sets == self.num_sets:
+            # Every set was simulated, so the miss rate is exact
+            return 0.0
+        if num_sampled_sets < 2 or self.get_num_sampled_refs() == 0:
+            return None
+        miss_rate = self.get_miss_rate()
+        mean_set_num_refs = self.get_num_sampled_refs() / num_sampled_sets
+        residual_variance = sum(
+            (num_misses - miss_rate * num_refs) ** 2
+            for num_refs, num_misses in zip(self.set_num_refs, self.set_num_misses)
+        ) / (num_sampled_sets - 1)
+        sampled_fraction = num_sampled_sets / self.num_sets
+        miss_rate_variance = (
+            (1 - sampled_fraction)
+            * residual_variance
+            / (num_sampled_sets * mean_set_num_refs**2)
+        )
+        return CONFIDENCE_Z_SCORE * math.sqrt(miss_rate_variance)
+
+    # Retrieves the estimated number of misses across the entire trace
+    def get_est_num_misses(self):
+        return round(self.get_miss_rate() * self.num_refs)
+
+    # Retrieves the statistics as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "num_refs": self.num_refs,
+            "num_sampled_refs": self.get_num_sampled_refs(),
+            "num_sampled_sets": self.get_num_sampled_sets(),
+            "num_sets": self.num_sets,
+            "est_num_misses": self.get_est_num_misses(),
+            "hit_rate": self.get_hit_rate(),
+            "miss_rate": self.get_miss_rate(),
+            "miss_rate_error": self.get_miss_rate_error(),
+        }
+
+
+# Simulates only every sample_interval-th set of a cache of the given geometry
+# (starting with the set at sample_offset), returning the extrapolated
+# statistics; references to unsampled sets are discarded as soon as their set
+# index is decoded, and the given addresses may be any iterable (including a
+# lazily read trace)
+def simulate_sampled(
+    word_addrs, geometry, replacement_policy, sample_interval, sample_offset=0
+):
+    if sample_interval < 1:
+        raise ValueError("sample interval must be positive")
+    if not 0 <= sample_offset < min(sample_interval, geometry.num_sets):
+        raise ValueError("sample offset must be less than the sample interval")
+    shift = geometry.num_byte_offset_bits + geometry.num_offset_bits
+    index_mask = geometry.num_sets - 1
+    num_refs = 0
+    sampled_addrs = array("Q")
+    for addr in word_addrs:
+        num_refs += 1
+        if ((addr >> shift) & index_mask) % sample_interval == sample_offset:
+            sampled_addrs.append(addr)
+
+    # The sampled references are read all at once, so the optimal policy
+    # knows the next use of every one of them
+    if replacement_policy == "opt":
+        kernel = OptimalCacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+        )
+    else:
+        kernel = CacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+            evict_mru=replacement_policy == "mru",
+        )
+    statuses = bytearray(len(sampled_addrs))
+    kernel.read_addrs(sampled_addrs, geometry.num_byte_offset_bits, statuses)
+
+    sampled_sets = range(sample_offset, geometry.num_sets, sample_interval)
+    set_num_refs = [0] * geometry.num_sets
+    set_num_misses = [0] * geometry.num_sets
+    for addr, status in zip(sampled_addrs, statuses):
+        set_index = (addr >> shift) & index_mask
+        set_num_refs[set_index] += 1
+        if status == STATUS_MISS:
+            set_num_misses[set_index] += 1
+    return SampledStats(
+        num_refs,
+        geometry.num_sets,
+        [set_num_refs[set_index] for set_index in sampled_sets],
+        [set_num_misses[set_index] for set_index in sampled_sets],
+    )
+
+
+# Simulates a sample of the sets of a cache with the given parameters (named
+# as in Simulator.simulate), returning the extrapolated statistics
+def simulate_sampled_cache(
+    num_blocks_per_set,
+    num_words_per_block,
+    cache_size,
+    replacement_policy,
+    word_addrs,
+    sample_interval,
+    word_size=4,
+    addr_unit="word",
+):
+    geometry = CacheGeometry(
+        cache_size,
+        num_blocks_per_set,
+        num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(word_size, addr_unit),
+    )
+    return simulate_sampled(word_addrs, geometry, replacement_policy, sample_interval)
+
+
+# Displays the given sampled statistics as a table
+def display_sampled_stats(stats, table_width):
+    table = Table.create_stats_table(
+        "Sampled Statistics", STAT_VALUE_COL_NAMES, table_width
+    )
+
+    miss_rate_error = stats.get_miss_rate_error()
+    table.rows.extend(
+        (
+            ("Refs", format_count(stats.num_refs)),
+            ("Sampled Refs", format_count(stats.get_num_sampled_refs())),
+            (
+                "Sampled Sets",
+                "{:,} of {:,}".format(stats.get_num_sampled_sets(), stats.num_sets),
+            ),
+            ("Est. Misses", format_count(stats.get_est_num_misses())),
+            (
+                "Est. Miss Rate",
+                "{:.2%} +/- {}".format(
+                    stats.get_miss_rate(),
+                    format_rate(miss_rate_error)
+                    if miss_rate_error is not None
+                    else "n/a",
+                ),
+            ),
+        )
+    )
+
+    print(table)
+
+
+# Runs a simulation of a sample of the sets of a cache with the given
+# parameters, displaying the extrapolated statistics
+def run_sampled_simulation(
+    num_blocks_per_set,
+    num_words_per_block,
+    cache_size,
+    replacement_policy,
+    word_addrs,
+    sample_interval,
+    word_size=4,
+    addr_unit="word",
+):
+    stats = simulate_sampled_cache(
+        num_blocks_per_set,
+        num_words_per_block,
+        cache_size,
+        replacement_policy,
+        word_addrs,
+        sample_interval,
+        word_size=word_size,
+        addr_unit=addr_unit,
+    )
+    table_width = get_table_width()
+    print()
+    display_sampled_stats(stats, table_width)
+    print()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from cachesimulator.batch import JOB_PARAMS, get_replacement_policy, simulate_job
+from cachesimulator.session import CacheSession
+from cachesimulator.trace import read_trace
+
+# The default maximum number of jobs which may be queued or running at once
+# across all connections; further requests wait (and are not read from their
+# connections) until a job completes
+DEFAULT_MAX_PENDING_JOBS = 64
+# The maximum length in bytes of a single request (such as a trace chunk)
+MAX_REQUEST_SIZE = 64 * 1024 * 1024
+
+# The sessions whose caches are kept warm within a worker process, mapped by
+# name; every session lives in exactly one worker
+_worker_sessions = {}
+
+
+# Creates a session within the current worker process
+def open_worker_session(session_name, session_args):
+    if session_name in _worker_sessions:
+        raise ValueError("session already exists: {}".format(session_name))
+    _worker_sessions[session_name] = CacheSession(**session_args)
+
+
+# Reads a chunk of addresses into a session within the current worker
+# process, returning the statistics for the chunk and for the whole session
+def read_worker_session(session_name, word_addrs):
+    session = _worker_sessions[session_name]
+    _, chunk_stats = session.read_chunk(word_addrs)
+    return chunk_stats.to_dict(), session.stats.to_dict()
+
+
+# Removes a session from the current worker process, returning the
+# statistics for the whole session
+def close_worker_session(session_name):
+    return _worker_sessions.pop(session_name).stats.to_dict()
+
+
+# Simulates an entire trace (given either as a list of addresses or as the
+# path of a trace file) within the current worker process, returning the
+# statistics of the simulation
+def simulate_worker_job(sim_args, word_addrs=None, trace_file=None):
+    if trace_file is not None:
+        word_addrs = read_trace(trace_file)
+    return simulate_job(word_addrs, sim_args)
+
+
+# An error caused by a malformed or invalid request
+class RequestError(Exception):
+    pass
+
+
+# A long-lived simulation service which accepts requests as JSON Lines over a
+# local socket; simulations run on a fixed set of single-process workers, so
+# that each session's cache stays warm in the worker it was opened in
+class SimulationService(object):
+    def __init__(self, num_workers=None, max_pending_jobs=DEFAULT_MAX_PENDING_JOBS):
+        self.workers = [
+            ProcessPoolExecutor(max_workers=1)
+            for _ in range(num_workers or os.cpu_count())
+        ]
+        self.max_pending_jobs = max_pending_jobs
+        self.pending_jobs = None
+        # The index of the worker which holds each open session
+        self.session_workers = {}
+        # Workers are assigned to sessions and one-off jobs in turn
+        self.next_worker_indices = itertools.cycle(range(len(self.workers)))
+
+    # Runs the given function on the given worker, waiting first if the
+    # maximum number of jobs are already pending
+    async def run_job(self, worker_index, func, *args):
+        if self.pending_jobs is None:
+            self.pending_jobs = asyncio.Semaphore(self.max_pending_jobs)
+        async with self.pending_jobs:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.workers[worker_index], func, *args)
+
+    # Retrieves the keyword arguments for a simulation from the given request
+    def get_sim_args(self, request, defaults):
+        if "cache_size" not in request:
+            raise RequestError("request has no cache_size")
+        sim_args = {
+            param: request.get(param, default) for param, default in defaults.items()
+        }
+        sim_args["replacement_policy"] = get_replacement_policy(
+            sim_args["replacement_policy"]
+        )
+        return sim_args
+
+    def get_session_worker(self, request):
+        session_name = request.get("session")
+        if session_name not in self.session_workers:
+            raise RequestError("no such session: {}".format(session_name))
+        return session_name, self.session_workers[session_name]
+
+    async def open_session(self, request):
+        session_name = request.get("session")
+        if session_name is None:
+            raise RequestError("request has no session")
+        if session_name in self.session_workers:
+            raise RequestError("session already exists: {}".format(session_name))
+        session_defaults = dict(JOB_PARAMS, num_addr_bits=64)
+        del session_defaults["compress"], session_defaults["sample_interval"]
+        session_args = self.get_sim_args(request, session_defaults)
+        worker_index = next(self.next_worker_indices)
+        self.session_workers[session_name] = worker_index
+        try:
+            await self.run_job(
+                worker_index, open_worker_session, session_name, session_args
+            )
+        except BaseException:
+            del self.session_workers[session_name]
+            raise
+        return {}
+
+    async def read_session(self, request):
+        session_name, worker_index = self.get_session_worker(request)
+        chunk_stats, session_stats = await self.run_job(
+            worker_index,
+            read_worker_session,
+            session_name,
+            request.get("word_addrs", []),
+        )
+        return {"chunk_stats": chunk_stats, "stats": session_stats}
+
+    async def close_session(self, request):
+        session_name, worker_index = self.get_session_worker(request)
+        del self.session_workers[session_name]
+        stats = await self.run_job(worker_index, close_worker_session, session_name)
+        return {"stats": stats}
+
+    async def simulate(self, request):
+        sim_args = self.get_sim_args(request, JOB_PARAMS)
+        word_addrs = request.get("word_addrs")
+        trace_file = request.get("trace_file")
+        if not word_addrs and trace_file is None:
+            raise RequestError("request has no word_addrs or trace_file")
+        stats = await self.run_job(
+            next(self.next_worker_indices),
+            simulate_worker_job,
+            sim_args,
+            word_addrs,
+            trace_file,
+        )
+        return {"stats": stats}
+
+    async def ping(self, request):
+        return {}
+
+    # Handles a single request, returning the response to send
+    async def handle_request(self, request):
+        handlers = {
+            "open": self.open_session,
+            "read": self.read_session,
+            "close": self.close_session,
+            "simulate": self.simulate,
+            "ping": self.ping,
+        }
+        try:
+            if not isinstance(request, dict):
+                raise RequestError("request must be a JSON object")
+            if request.get("op") not in handlers:
+                raise RequestError("unknown op: {}".format(request.get("op")))
+            response = {"ok": True, **await handlers[request["op"]](request)}
+        except Exception as error:
+            error_message = "{}: {}".format(type(error).__name__, error)
+            response = {"ok": False, "error": error_message}
+        if isinstance(request, dict) and "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    # Handles each request from a client connection in turn; the next request
+    # is not read until the response to the current one has been sent, so
+    # clients which send requests faster than they can be simulated are held
+    # back by the socket itself. Every session opened on the connection (and
+    # not yet closed) is closed once the connection ends
+    async def handle_connection(self, reader, writer):
+        connection_sessions = set()
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (ValueError, asyncio.LimitOverrunError):
+                    # The rest of the request cannot be told apart from any
+                    # which follow it, so the connection is closed
+                    response = {
+                        "ok": False,
+                        "error": "request exceeds {} bytes".format(MAX_REQUEST_SIZE),
+                    }
+                    writer.write(json.dumps(response).encode() + b"\n")
+                    await writer.drain()
+                    break
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as error:
+                    response = {"ok": False, "error": "invalid JSON: {}".format(error)}
+                else:
+                    response = await self.handle_request(request)
+                    if response["ok"] and request["op"] == "open":
+                        connection_sessions.add(request["session"])
+                    elif response["ok"] and request["op"] == "close":
+                        connection_sessions.discard(request["session"])
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+            for session_name in connection_sessions:
+                # The session may have been closed by another connection
+                if session_name in self.session_workers:
+                    await self.handle_request({"op": "close", "session": session_name})
+
+    # Starts listening on the given Unix socket path or localhost port,
+    # returning the asyncio server; every worker process is started first, so
+    # that no worker inherits (and so holds open) the socket of a connection
+    async def start(self, socket_path=None, host="127.0.0.1", port=None):
+        await asyncio.gather(
+            *(
+                self.run_job(worker_index, os.getpid)
+                for worker_index in range(len(self.workers))
+            )
+        )
+        if socket_path is not None:
+            return await asyncio.start_unix_server(
+                self.handle_connection, path=socket_path, limit=MAX_REQUEST_SIZE
+            )
+        else:
+            return await asyncio.start_server(
+                self.handle_connection, host=host, port=port, limit=MAX_REQUEST_SIZE
+            )
+
+    # Shuts down all worker processes
+    def shutdown(self):
+        for worker in self.workers:
+            worker.shutdown()
+
+    async def serve_forever(self, socket_path=None, host="127.0.0.1", port=None):
+        server = await self.start(socket_path=socket_path, host=host, port=port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.shutdown()
+
+
+# Parse command-line arguments passed to the serve subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator serve",
+        description="run a simulation service which accepts JSON Lines requests",
+    )
+
+    address_group = parser.add_mutually_exclusive_group(required=True)
+
+    address_group.add_argument(
+        "--socket", help="the path of the Unix socket to listen on"
+    )
+
+    address_group.add_argument(
+        "--port", type=int, help="the localhost TCP port to listen on"
+    )
+
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="the number of worker processes (defaults to the number of CPUs)",
+    )
+
+    parser.add_argument(
+        "--max-pending-jobs",
+        type=int,
+        default=DEFAULT_MAX_PENDING_JOBS,
+        help="the maximum number of jobs which may be queued or running at once",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    service = SimulationService(
+        num_workers=cli_args.num_workers, max_pending_jobs=cli_args.max_pending_jobs
+    )
+    try:
+        asyncio.run(
+            service.serve_forever(socket_path=cli_args.socket, port=cli_args.port)
+        )
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+
+from cachesimulator.cache import Cache
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.reference import ReferenceBatch
+from cachesimulator.stats import SimulationStats
+
+
+# A cache which is kept warm as successive chunks of a trace are read into it;
+# because the trace is not known in advance, the number of address bits must
+# be large enough for every address which will be read (it defaults to 64)
+class CacheSession(object):
+    def __init__(
+        self,
+        cache_size,
+        num_blocks_per_set=1,
+        num_words_per_block=1,
+        replacement_policy="lru",
+        num_addr_bits=64,
+        word_size=4,
+        addr_unit="word",
+    ):
+        # The optimal policy needs every future reference, which a session
+        # does not know until it is read
+        if replacement_policy == "opt":
+            raise ValueError("a session cannot use the optimal (OPT) policy")
+        self.geometry = CacheGeometry(
+            cache_size,
+            num_blocks_per_set,
+            num_words_per_block,
+            num_addr_bits=num_addr_bits,
+            num_byte_offset_bits=get_num_byte_offset_bits(word_size, addr_unit),
+        )
+        self.replacement_policy = replacement_policy
+        self.cache = Cache(
+            num_sets=self.geometry.num_sets,
+            num_index_bits=self.geometry.num_index_bits,
+        )
+        # The statistics for every reference read during the session
+        self.stats = SimulationStats()
+
+    # Reads the given chunk of addresses into the cache, returning the
+    # references (with their cache statuses) and the statistics of the chunk
+    def read_chunk(self, word_addrs):
+        geometry = self.geometry
+        refs = ReferenceBatch(
+            word_addrs,
+            geometry.num_addr_bits,
+            geometry.num_offset_bits,
+            geometry.num_index_bits,
+            geometry.num_tag_bits,
+            geometry.num_byte_offset_bits,
+        )
+        if len(refs) and (
+            max(refs.word_addrs) >> geometry.num_byte_offset_bits
+            >= 2**geometry.num_addr_bits
+        ):
+            raise ValueError(
+                "address does not fit in {} bits".format(geometry.num_addr_bits)
+            )
+        self.cache.read_refs(
+            geometry.num_blocks_per_set,
+            geometry.num_words_per_block,
+            self.replacement_policy,
+            refs,
+        )
+        chunk_stats = SimulationStats.from_refs(refs)
+        self.stats.num_hits += chunk_stats.num_hits
+        self.stats.num_misses += chunk_stats.num_misses
+        return refs, chunk_stats
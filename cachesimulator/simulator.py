@@ -1,26 +1,49 @@
 #!/usr/bin/env python3
 
-import math
-import shutil
+from array import array
+from collections.abc import Sequence
 
 from cachesimulator.bin_addr import BinaryAddress
 from cachesimulator.cache import Cache
-from cachesimulator.reference import Reference
-from cachesimulator.table import Table
+from cachesimulator.compress import (
+    check_compress_policy,
+    compress_trace,
+    expand_trace,
+    is_compressible,
+)
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.profiler import NullProfiler, format_mem_size
+from cachesimulator.reference import (
+    Reference,
+    ReferenceBatch,
+    ReferenceCacheStatus,
+    get_addr_array,
+)
+from cachesimulator.table import Table, get_table_width
 
 # The names of all reference table columns
 REF_COL_NAMES = ("WordAddr", "BinAddr", "Tag", "Index", "Offset", "Hit/Miss")
+# The names of all profile table columns
+PROFILE_COL_NAMES = ("Stage", "Time (s)", "Refs/s", "Peak Mem")
 # The minimum number of bits required per group in a prettified binary string
 MIN_BITS_PER_GROUP = 3
-# The default column width of the displayed results table
-DEFAULT_TABLE_WIDTH = 80
 
 
 class Simulator(object):
-    # Retrieves a list of address references for use by simulator
+    # Retrieves a list of address references for use by simulator; if
+    # num_byte_offset_bits is given, the given addresses are byte addresses,
+    # which are converted to word addresses as each reference is created
     def get_addr_refs(
-        self, word_addrs, num_addr_bits, num_offset_bits, num_index_bits, num_tag_bits
+        self,
+        word_addrs,
+        num_addr_bits,
+        num_offset_bits,
+        num_index_bits,
+        num_tag_bits,
+        num_byte_offset_bits=0,
     ):
+        if num_byte_offset_bits:
+            word_addrs = (addr >> num_byte_offset_bits for addr in word_addrs)
         return [
             Reference(
                 word_addr, num_addr_bits, num_offset_bits, num_index_bits, num_tag_bits
@@ -28,6 +51,55 @@ def get_addr_refs(
             for word_addr in word_addrs
         ]
 
+    # Simulates the given compressed trace (as returned by compress_trace),
+    # retrieving a batch of references for every address in the expanded
+    # trace; once every reference in an iteration of a loop is a hit, the loop
+    # has no further effect on the cache, so its remaining iterations are not
+    # simulated (and instead share the cache statuses of that iteration)
+    def read_compressed_trace(self, cache, segments, geometry, replacement_policy):
+        check_compress_policy(replacement_policy)
+        refs = ReferenceBatch(
+            array("Q", expand_trace(segments)),
+            geometry.num_addr_bits,
+            geometry.num_offset_bits,
+            geometry.num_index_bits,
+            geometry.num_tag_bits,
+            geometry.num_byte_offset_bits,
+        )
+        kernel = cache.get_current_kernel(
+            geometry.num_blocks_per_set,
+            geometry.num_words_per_block,
+            replacement_policy,
+            refs,
+        )
+        # A cache which the kernel cannot represent is read in full instead
+        if kernel is None:
+            cache.read_refs(
+                geometry.num_blocks_per_set,
+                geometry.num_words_per_block,
+                replacement_policy,
+                refs,
+            )
+            return refs
+        statuses = refs.cache_statuses
+        position = 0
+        for body, num_repeats in segments:
+            body_length = len(body)
+            for i in range(num_repeats):
+                num_hits = kernel.read_addrs(
+                    body, geometry.num_byte_offset_bits, statuses, start=position
+                )
+                position += body_length
+                if num_hits == body_length:
+                    num_skipped = body_length * (num_repeats - i - 1)
+                    statuses[position : position + num_skipped] = (
+                        bytes([ReferenceCacheStatus.hit.value]) * num_skipped
+                    )
+                    position += num_skipped
+                    break
+        cache.load_kernel(kernel, geometry.num_words_per_block, refs)
+        return refs
+
     # Displays details for each address reference, including its hit/miss
     # status
     def display_addr_refs(self, refs, table_width):
@@ -87,8 +159,32 @@ def display_cache(self, cache, table_width):
 
         print(table)
 
-    # Run the entire cache simulation
-    def run_simulation(
+    # Displays the time, throughput, and peak memory of each profiled stage
+    # of the simulation
+    def display_profile(self, profiler, table_width):
+        # Every stage is timed while tracemalloc (and cProfile, if enabled)
+        # is tracing, so the times are slower than those of unprofiled runs
+        table = Table.create_stats_table(
+            "Profile (times include tracing overhead)", PROFILE_COL_NAMES, table_width
+        )
+
+        for stage in profiler.stages:
+            refs_per_sec = stage.get_refs_per_sec()
+            table.rows.append(
+                (
+                    stage.name,
+                    "{:.6f}".format(stage.elapsed_time),
+                    "{:,.0f}".format(refs_per_sec) if refs_per_sec else "n/a",
+                    format_mem_size(stage.peak_mem),
+                )
+            )
+
+        print(table)
+
+    # Simulates the cache for the given word addresses without displaying
+    # anything, returning the references (with their cache statuses) and the
+    # final state of the cache
+    def simulate(
         self,
         num_blocks_per_set,
         num_words_per_block,
@@ -96,34 +192,122 @@ def run_simulation(
         replacement_policy,
         num_addr_bits,
         word_addrs,
+        word_size=4,
+        addr_unit="word",
+        compress=False,
+        profiler=None,
     ):
-        num_blocks = cache_size // num_words_per_block
-        num_sets = num_blocks // num_blocks_per_set
+        if compress:
+            check_compress_policy(replacement_policy)
+        if profiler is None:
+            profiler = NullProfiler()
 
-        # Ensure that the number of bits used to represent each address is
-        # always large enough to represent the largest address
-        num_addr_bits = max(num_addr_bits, int(math.log2(max(word_addrs))) + 1)
+        with profiler.stage("parse") as stage:
+            # Word addresses may be given as any iterable (such as a lazily
+            # read trace or a trace generator), but every address must be
+            # known in order to determine the number of address bits; a trace
+            # file is therefore both read and decoded within this stage
+            if not isinstance(word_addrs, Sequence):
+                word_addrs = get_addr_array(word_addrs)
 
-        num_offset_bits = int(math.log2(num_words_per_block))
-        num_index_bits = int(math.log2(num_sets))
-        num_tag_bits = num_addr_bits - num_index_bits - num_offset_bits
+            # Byte addresses are converted to word addresses only as each
+            # reference is created, rather than in a separate pass
+            num_byte_offset_bits = get_num_byte_offset_bits(word_size, addr_unit)
 
-        refs = self.get_addr_refs(
-            word_addrs, num_addr_bits, num_offset_bits, num_index_bits, num_tag_bits
-        )
+            geometry = CacheGeometry(
+                cache_size,
+                num_blocks_per_set,
+                num_words_per_block,
+                num_addr_bits=num_addr_bits,
+                max_word_addr=max(word_addrs) >> num_byte_offset_bits,
+                num_byte_offset_bits=num_byte_offset_bits,
+            )
+            stage.num_refs = len(word_addrs)
 
-        cache = Cache(num_sets=num_sets, num_index_bits=num_index_bits)
+        segments = None
+        if compress:
+            # Traces with too few recurring addresses are simulated faster
+            # without compression, with identical results
+            with profiler.stage("compress", num_refs=len(word_addrs)):
+                if is_compressible(word_addrs):
+                    segments = compress_trace(word_addrs)
 
-        cache.read_refs(
-            num_blocks_per_set, num_words_per_block, replacement_policy, refs
-        )
+        if segments is not None:
+            with profiler.stage("simulate", num_refs=len(word_addrs)):
+                cache = Cache(
+                    num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+                )
+                refs = self.read_compressed_trace(
+                    cache, segments, geometry, replacement_policy
+                )
+        else:
+            # References are stored in a compact batch and decoded only as
+            # they are simulated and displayed
+            with profiler.stage("refs", num_refs=len(word_addrs)):
+                refs = ReferenceBatch(
+                    word_addrs,
+                    geometry.num_addr_bits,
+                    geometry.num_offset_bits,
+                    geometry.num_index_bits,
+                    geometry.num_tag_bits,
+                    geometry.num_byte_offset_bits,
+                )
+
+            with profiler.stage("simulate", num_refs=len(refs)):
+                cache = Cache(
+                    num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+                )
+
+                cache.read_refs(
+                    num_blocks_per_set, num_words_per_block, replacement_policy, refs
+                )
+
+        return refs, cache
+
+    # Run the entire cache simulation
+    def run_simulation(
+        self,
+        num_blocks_per_set,
+        num_words_per_block,
+        cache_size,
+        replacement_policy,
+        num_addr_bits,
+        word_addrs,
+        word_size=4,
+        addr_unit="word",
+        compress=False,
+        profiler=None,
+    ):
+        if profiler is None:
+            profiler = NullProfiler()
+        profiler.start()
+        # Tracing must stop even if a stage fails, or it would slow down
+        # (and, for tracemalloc, leak memory into) the rest of the process
+        try:
+            refs, cache = self.simulate(
+                num_blocks_per_set,
+                num_words_per_block,
+                cache_size,
+                replacement_policy,
+                num_addr_bits,
+                word_addrs,
+                word_size=word_size,
+                addr_unit=addr_unit,
+                compress=compress,
+                profiler=profiler,
+            )
+
+            table_width = get_table_width()
 
-        # The character-width of all displayed tables
-        # Attempt to fit table to terminal width, otherwise use default of 80
-        table_width = shutil.get_terminal_size((DEFAULT_TABLE_WIDTH, None)).columns
+            with profiler.stage("display", num_refs=len(refs)):
+                print()
+                self.display_addr_refs(refs, table_width)
+                print()
+                self.display_cache(cache, table_width)
+                print()
+        finally:
+            profiler.stop()
 
-        print()
-        self.display_addr_refs(refs, table_width)
-        print()
-        self.display_cache(cache, table_width)
-        print()
+        if profiler.stages:
+            self.display_profile(profiler, table_width)
+            print()
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import sys
+from array import array
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import CacheKernel
+from cachesimulator.trace import read_trace
+
+# The maximum number of addresses read from a trace at a time
+READ_CHUNK_SIZE = 65536
+
+
+# A record of the contents of a cache after a number of references have been
+# read into it; only the sets which changed since the previous snapshot are
+# stored, each mapped to the word address of the first word of each of its
+# blocks (in slot order)
+class CacheSnapshot(object):
+    def __init__(self, num_refs, num_hits, changed_sets):
+        self.num_refs = num_refs
+        self.num_hits = num_hits
+        self.changed_sets = changed_sets
+
+    # Retrieves the snapshot as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "num_refs": self.num_refs,
+            "num_hits": self.num_hits,
+            "changed_sets": {
+                str(set_index): list(blocks)
+                for set_index, blocks in self.changed_sets.items()
+            },
+        }
+
+    @classmethod
+    def from_dict(cls, snapshot_dict):
+        return cls(
+            num_refs=snapshot_dict["num_refs"],
+            num_hits=snapshot_dict["num_hits"],
+            changed_sets={
+                int(set_index): tuple(blocks)
+                for set_index, blocks in snapshot_dict["changed_sets"].items()
+            },
+        )
+
+
+# Reads the given addresses (which may be any iterable, including a lazily
+# read trace) into a cache of the given geometry, yielding a snapshot once
+# each of the given (ascending) numbers of references has been read, and once
+# more after the last reference; the trace is never held in memory all at once
+def take_snapshots(word_addrs, geometry, replacement_policy, snapshot_points):
+    kernel = CacheKernel(
+        geometry.num_index_bits,
+        geometry.num_offset_bits,
+        geometry.num_blocks_per_set,
+        evict_mru=replacement_policy == "mru",
+    )
+    word_addrs = iter(word_addrs)
+    snapshot_points = iter(snapshot_points)
+    statuses = bytearray(READ_CHUNK_SIZE)
+    num_refs = 0
+    num_hits = 0
+    next_point = next(snapshot_points, None)
+    # The number of references after which the last snapshot was taken
+    last_point = None
+
+    # Retrieves the snapshot of the cache as it is now
+    def get_snapshot():
+        changed_sets = {
+            set_index: tuple(
+                block_addr << geometry.num_offset_bits for block_addr in blocks
+            )
+            for set_index, blocks in kernel.pop_changed_sets().items()
+        }
+        return CacheSnapshot(num_refs, num_hits, changed_sets)
+
+    while True:
+        while next_point is not None and next_point <= num_refs:
+            next_point = next(snapshot_points, None)
+        if next_point is None:
+            chunk_size = READ_CHUNK_SIZE
+        else:
+            chunk_size = min(READ_CHUNK_SIZE, next_point - num_refs)
+        chunk = array("Q", itertools.islice(word_addrs, chunk_size))
+        num_hits += kernel.read_addrs(chunk, geometry.num_byte_offset_bits, statuses)
+        num_refs += len(chunk)
+        if len(chunk) < chunk_size:
+            break
+        if num_refs == next_point:
+            last_point = num_refs
+            yield get_snapshot()
+    if num_refs != last_point:
+        yield get_snapshot()
+
+
+# Yields each of the given snapshots along with the full contents of the cache
+# at that snapshot (a dictionary mapping the index of every non-empty set to
+# its blocks); the same dictionary is updated in place from one snapshot to
+# the next, and a shallow copy of it shares every set's blocks with the
+# original, so each snapshot costs only the sets which changed
+def replay_snapshots(snapshots):
+    cache_sets = {}
+    for snapshot in snapshots:
+        cache_sets.update(snapshot.changed_sets)
+        yield snapshot, cache_sets
+
+
+# Retrieves the full contents of the cache at the snapshot taken after the
+# given number of references
+def get_snapshot_sets(snapshots, num_refs):
+    for snapshot, cache_sets in replay_snapshots(snapshots):
+        if snapshot.num_refs == num_refs:
+            return dict(cache_sets)
+    raise ValueError("no snapshot after {} references".format(num_refs))
+
+
+# Compares the full contents of two snapshots, returning a dictionary which
+# maps the index of every set which differs to the blocks which were removed
+# from it and the blocks which were added to it
+def diff_snapshots(old_sets, new_sets):
+    set_diffs = {}
+    for set_index in sorted(old_sets.keys() | new_sets.keys()):
+        old_blocks = old_sets.get(set_index, ())
+        new_blocks = new_sets.get(set_index, ())
+        # Unchanged sets share the same blocks, so most are skipped at once
+        if old_blocks is new_blocks or old_blocks == new_blocks:
+            continue
+        set_diffs[set_index] = (
+            tuple(block for block in old_blocks if block not in new_blocks),
+            tuple(block for block in new_blocks if block not in old_blocks),
+        )
+    return set_diffs
+
+
+# Lazily reads the snapshots from the given JSON Lines file
+def read_snapshots(snapshots_path):
+    with open(snapshots_path) as snapshots_file:
+        for line in snapshots_file:
+            if line.strip():
+                yield CacheSnapshot.from_dict(json.loads(line))
+
+
+# Parse command-line arguments passed to the snapshot subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator snapshot",
+        description="record or compare snapshots of the contents of a cache",
+    )
+    subparsers = parser.add_subparsers(dest="action", required=True)
+
+    record_parser = subparsers.add_parser(
+        "record", help="record snapshots while simulating a trace file"
+    )
+
+    record_parser.add_argument(
+        "trace_file", help="the path of the trace file to simulate"
+    )
+
+    record_parser.add_argument(
+        "--cache-size", type=int, required=True, help="the size of the cache in words"
+    )
+
+    record_parser.add_argument(
+        "--num-blocks-per-set", type=int, default=1, help="the number of blocks per set"
+    )
+
+    record_parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        default=1,
+        help="the number of words per block",
+    )
+
+    record_parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    record_parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    record_parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru"),
+        default="lru",
+        type=str.lower,
+        help="the cache replacement policy (LRU or MRU)",
+    )
+
+    points_group = record_parser.add_mutually_exclusive_group(required=True)
+
+    points_group.add_argument(
+        "--every",
+        type=int,
+        help="take a snapshot every time this many references have been read",
+    )
+
+    points_group.add_argument(
+        "--at",
+        nargs="+",
+        type=int,
+        help="the numbers of references after which to take snapshots",
+    )
+
+    record_parser.add_argument(
+        "--output",
+        help="the path of the JSON Lines snapshots file (defaults to stdout)",
+    )
+
+    diff_parser = subparsers.add_parser(
+        "diff", help="compare two snapshots from a snapshots file"
+    )
+
+    diff_parser.add_argument("snapshots_file", help="the path of a snapshots file")
+
+    diff_parser.add_argument(
+        "old_num_refs",
+        type=int,
+        help="the number of references after which the old snapshot was taken",
+    )
+
+    diff_parser.add_argument(
+        "new_num_refs",
+        type=int,
+        help="the number of references after which the new snapshot was taken",
+    )
+
+    cli_args = parser.parse_args(args)
+    if cli_args.action == "record" and cli_args.every is not None:
+        if cli_args.every <= 0:
+            parser.error("--every must be positive")
+    return cli_args
+
+
+def record(cli_args):
+    geometry = CacheGeometry(
+        cli_args.cache_size,
+        cli_args.num_blocks_per_set,
+        cli_args.num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(
+            cli_args.word_size, cli_args.addr_unit
+        ),
+    )
+    if cli_args.every is not None:
+        snapshot_points = itertools.count(cli_args.every, cli_args.every)
+    else:
+        snapshot_points = sorted(cli_args.at)
+    snapshots = take_snapshots(
+        read_trace(cli_args.trace_file),
+        geometry,
+        cli_args.replacement_policy,
+        snapshot_points,
+    )
+    if cli_args.output is None:
+        snapshots_file = sys.stdout
+    else:
+        snapshots_file = open(cli_args.output, "w")
+    try:
+        for snapshot in snapshots:
+            snapshots_file.write(json.dumps(snapshot.to_dict()) + "\n")
+    finally:
+        if snapshots_file is not sys.stdout:
+            snapshots_file.close()
+
+
+def diff(cli_args):
+    old_sets = get_snapshot_sets(
+        read_snapshots(cli_args.snapshots_file), cli_args.old_num_refs
+    )
+    new_sets = get_snapshot_sets(
+        read_snapshots(cli_args.snapshots_file), cli_args.new_num_refs
+    )
+    for set_index, (removed, added) in diff_snapshots(old_sets, new_sets).items():
+        print(
+            "set {}: -{} +{}".format(
+                set_index,
+                ",".join(map(str, removed)) or "none",
+                ",".join(map(str, added)) or "none",
+            )
+        )
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    if cli_args.action == "record":
+        record(cli_args)
+    else:
+        diff(cli_args)
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+from cachesimulator.reference import ReferenceBatch, ReferenceCacheStatus
+
+
+# Summary statistics for the references read into a cache
+class SimulationStats(object):
+    def __init__(self, num_hits=0, num_misses=0):
+        self.num_hits = num_hits
+        self.num_misses = num_misses
+
+    # Tallies the hits and misses among the given (already simulated)
+    # references
+    @classmethod
+    def from_refs(cls, refs):
+        if isinstance(refs, ReferenceBatch):
+            # Count statuses directly rather than decoding every reference
+            num_hits = refs.cache_statuses.count(ReferenceCacheStatus.hit.value)
+            num_misses = refs.cache_statuses.count(ReferenceCacheStatus.miss.value)
+        else:
+            num_hits = 0
+            num_misses = 0
+            for ref in refs:
+                if ref.cache_status == ReferenceCacheStatus.hit:
+                    num_hits += 1
+                elif ref.cache_status == ReferenceCacheStatus.miss:
+                    num_misses += 1
+        return cls(num_hits=num_hits, num_misses=num_misses)
+
+    def get_num_refs(self):
+        return self.num_hits + self.num_misses
+
+    def get_hit_rate(self):
+        if self.get_num_refs() == 0:
+            return 0.0
+        return self.num_hits / self.get_num_refs()
+
+    def get_miss_rate(self):
+        if self.get_num_refs() == 0:
+            return 0.0
+        return self.num_misses / self.get_num_refs()
+
+    # Retrieves the statistics as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "num_refs": self.get_num_refs(),
+            "num_hits": self.num_hits,
+            "num_misses": self.num_misses,
+            "hit_rate": self.get_hit_rate(),
+            "miss_rate": self.get_miss_rate(),
+        }
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.shared_memory import SharedMemory
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import CacheKernel, OptimalCacheKernel
+from cachesimulator.optimal import iter_next_use_chunks
+from cachesimulator.stats import SimulationStats
+from cachesimulator.table import Table, format_rate, get_table_width
+from cachesimulator.trace import read_trace
+
+# The maximum number of addresses read into a cache at a time by each worker
+READ_CHUNK_SIZE = 65536
+# The names of all sweep results table columns
+SWEEP_COL_NAMES = ("Size", "Blocks/Set", "Words/Block", "Policy", "Hit Rate")
+
+
+# Copies the given addresses into a new block of shared memory, returning the
+# shared memory and the number of addresses in it; the caller is responsible
+# for closing and unlinking the shared memory
+def share_trace(word_addrs):
+    if not isinstance(word_addrs, array) or word_addrs.typecode != "Q":
+        word_addrs = array("Q", word_addrs)
+    # Shared memory cannot be empty, even for an empty trace
+    shared_trace = SharedMemory(create=True, size=max(1, len(word_addrs)) * 8)
+    with shared_trace.buf.cast("Q") as shared_addrs:
+        shared_addrs[: len(word_addrs)] = word_addrs
+    return shared_trace, len(word_addrs)
+
+
+# Simulates a single cache configuration (within a worker process) for the
+# trace in the shared memory with the given name, which is read in place
+# rather than copied; returns the statistics of the simulation
+def run_config(shared_trace_name, num_addrs, config):
+    geometry = CacheGeometry(
+        config["cache_size"],
+        config["num_blocks_per_set"],
+        config["num_words_per_block"],
+        num_byte_offset_bits=get_num_byte_offset_bits(
+            config["word_size"], config["addr_unit"]
+        ),
+    )
+    if config["replacement_policy"] == "opt":
+        kernel = OptimalCacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+        )
+    else:
+        kernel = CacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+            evict_mru=config["replacement_policy"] == "mru",
+        )
+    statuses = bytearray(READ_CHUNK_SIZE)
+    num_hits = 0
+    shared_trace = SharedMemory(name=shared_trace_name)
+    try:
+        with shared_trace.buf.cast("Q") as shared_addrs:
+            if config["replacement_policy"] == "opt":
+                # The next uses of the trace depend on the block size, so each
+                # worker finds them with its own backward pass over the trace
+                with shared_addrs[:num_addrs] as trace_addrs:
+                    for chunk, next_uses in iter_next_use_chunks(
+                        trace_addrs,
+                        geometry.num_byte_offset_bits + geometry.num_offset_bits,
+                        chunk_size=READ_CHUNK_SIZE,
+                    ):
+                        num_hits += kernel.read_addrs(
+                            chunk,
+                            geometry.num_byte_offset_bits,
+                            statuses,
+                            next_uses=next_uses,
+                        )
+            else:
+                for start in range(0, num_addrs, READ_CHUNK_SIZE):
+                    end = min(start + READ_CHUNK_SIZE, num_addrs)
+                    with shared_addrs[start:end] as chunk:
+                        num_hits += kernel.read_addrs(
+                            chunk, geometry.num_byte_offset_bits, statuses
+                        )
+    finally:
+        shared_trace.close()
+    return SimulationStats(num_hits=num_hits, num_misses=num_addrs - num_hits).to_dict()
+
+
+# Simulates every given cache configuration for the given addresses on a pool
+# of worker processes, yielding the result of each configuration as it
+# completes; the trace is copied once into shared memory, which every worker
+# reads from, so memory use does not grow with the number of workers
+def run_configs(word_addrs, configs, num_workers=None):
+    shared_trace, num_addrs = share_trace(word_addrs)
+    try:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            futures = {}
+            for config_num, config in enumerate(configs):
+                future = executor.submit(
+                    run_config, shared_trace.name, num_addrs, config
+                )
+                futures[future] = (config_num, config)
+            for future in as_completed(futures):
+                config_num, config = futures[future]
+                result = {"config": config_num, **config}
+                try:
+                    result["stats"] = future.result()
+                except Exception as error:
+                    result["error"] = "{}: {}".format(type(error).__name__, error)
+                yield result
+    finally:
+        shared_trace.close()
+        shared_trace.unlink()
+
+
+# Retrieves every combination of the given cache parameters
+def get_configs(
+    cache_sizes,
+    nums_blocks_per_set,
+    nums_words_per_block,
+    replacement_policies,
+    word_size=4,
+    addr_unit="word",
+):
+    return [
+        {
+            "cache_size": cache_size,
+            "num_blocks_per_set": num_blocks_per_set,
+            "num_words_per_block": num_words_per_block,
+            "replacement_policy": replacement_policy,
+            "word_size": word_size,
+            "addr_unit": addr_unit,
+        }
+        for cache_size in cache_sizes
+        for num_blocks_per_set in nums_blocks_per_set
+        for num_words_per_block in nums_words_per_block
+        for replacement_policy in replacement_policies
+    ]
+
+
+# Displays the result of each configuration as a row in a table
+def display_results(results, table_width):
+    table = Table.create_stats_table("Sweep", SWEEP_COL_NAMES, table_width)
+
+    for result in results:
+        if "stats" in result:
+            hit_rate = format_rate(result["stats"]["hit_rate"])
+        else:
+            hit_rate = "error"
+        table.rows.append(
+            (
+                result["cache_size"],
+                result["num_blocks_per_set"],
+                result["num_words_per_block"],
+                result["replacement_policy"].upper(),
+                hit_rate,
+            )
+        )
+
+    print(table)
+
+
+# Parse command-line arguments passed to the sweep subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator sweep",
+        description="simulate one trace for many cache configurations in parallel",
+    )
+
+    parser.add_argument("trace_file", help="the path of the trace file to simulate")
+
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        nargs="+",
+        required=True,
+        help="one or more sizes of the cache in words",
+    )
+
+    parser.add_argument(
+        "--num-blocks-per-set",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="one or more numbers of blocks per set",
+    )
+
+    parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="one or more numbers of words per block",
+    )
+
+    parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru", "opt"),
+        nargs="+",
+        default=["lru"],
+        type=str.lower,
+        help="one or more cache replacement policies (LRU, MRU, or OPT)",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    parser.add_argument(
+        "--num-workers",
+        type=int,
+        default=os.cpu_count(),
+        help="the number of worker processes (defaults to the number of CPUs)",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON Lines file to which results will be written",
+    )
+
+    return parser.parse_args(args)
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    configs = get_configs(
+        cli_args.cache_size,
+        cli_args.num_blocks_per_set,
+        cli_args.num_words_per_block,
+        cli_args.replacement_policy,
+        word_size=cli_args.word_size,
+        addr_unit=cli_args.addr_unit,
+    )
+    results = sorted(
+        run_configs(
+            read_trace(cli_args.trace_file), configs, num_workers=cli_args.num_workers
+        ),
+        key=lambda result: result["config"],
+    )
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as results_file:
+            for result in results:
+                results_file.write(json.dumps(result) + "\n")
+    table_width = get_table_width()
+    print()
+    display_results(results, table_width)
+    print()
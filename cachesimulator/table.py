@@ -1,5 +1,30 @@
 #!/usr/bin/env python3
 
+# The default column width of all displayed tables
+DEFAULT_TABLE_WIDTH = 80
+# The column names of tables which list a single value for each statistic
+STAT_VALUE_COL_NAMES = ("Statistic", "Value")
+
+
+# Retrieves the character-width of all displayed tables, fitting them to the
+# terminal width if possible and otherwise using the default (shutil is only
+# imported here since it is slow to import, and is not needed when the
+# simulator is used as a library)
+def get_table_width():
+    import shutil
+
+    return shutil.get_terminal_size((DEFAULT_TABLE_WIDTH, None)).columns
+
+
+# Formats the given count with thousands separators, for use in table rows
+def format_count(count):
+    return "{:,}".format(count)
+
+
+# Formats the given rate (from 0 to 1) as a percentage, for use in table rows
+def format_rate(rate):
+    return "{:.2%}".format(rate)
+
 
 # A class for displaying ASCII tables
 class Table(object):
@@ -14,6 +39,15 @@ def __init__(self, num_cols, width, alignment="left", title=None):
         self.header = []
         self.rows = []
 
+    # Creates a right-aligned table of statistics with the given title and
+    # column names, as displayed after a simulation
+    @classmethod
+    def create_stats_table(cls, title, col_names, width):
+        table = cls(num_cols=len(col_names), width=width, alignment="right")
+        table.title = title
+        table.header[:] = col_names
+        return table
+
     # Retrieves a separator used to separate rows
     def get_separator(self):
         return "-" * self.width
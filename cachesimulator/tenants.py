@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.table import Table, format_count, format_rate, get_table_width
+from cachesimulator.trace import parse_trace_addr, read_trace
+
+# The ways in which the references of several tenants may be interleaved
+INTERLEAVINGS = ("round-robin", "proportional", "timestamped")
+# The names of all tenant statistics table columns
+TENANT_STATS_COL_NAMES = (
+    "Tenant",
+    "Refs",
+    "Hits",
+    "Misses",
+    "Hit Rate",
+    "Blocks",
+    "Avg Blks",
+    "Evicted",
+)
+
+
+# Parses a single reference from a timestamped trace file
+def parse_timestamped_ref(tokens):
+    if len(tokens) != 2:
+        raise ValueError("expected a timestamp and an address")
+    timestamp, addr = tokens
+    return parse_trace_addr(timestamp), parse_trace_addr(addr)
+
+
+# Lazily reads the references from the given timestamped trace file; each
+# line of a timestamped trace gives the time of a reference followed by its
+# address, separated by whitespace, and the times must never decrease; any
+# text following a # on a line is ignored, and each reference is yielded as a
+# tuple of its time and address
+def read_timestamped_trace(trace_path):
+    prev_timestamp = None
+    with open(trace_path) as trace_file:
+        for line_num, line in enumerate(trace_file, 1):
+            tokens = line.partition("#")[0].split()
+            if not tokens:
+                continue
+            try:
+                timestamp, addr = parse_timestamped_ref(tokens)
+                if prev_timestamp is not None and timestamp < prev_timestamp:
+                    raise ValueError("timestamp {} is out of order".format(timestamp))
+            except ValueError as error:
+                raise ValueError("line {}: {}".format(line_num, error)) from None
+            prev_timestamp = timestamp
+            yield timestamp, addr
+
+
+# Lazily interleaves the given traces by taking one reference from each in
+# turn, yielding each reference as a tuple of its tenant (the position of its
+# trace) and its address; a trace is skipped once it runs out
+def interleave_round_robin(traces):
+    active = [(tenant, iter(trace)) for tenant, trace in enumerate(traces)]
+    while active:
+        still_active = []
+        for tenant, addrs in active:
+            for addr in itertools.islice(addrs, 1):
+                yield tenant, addr
+                still_active.append((tenant, addrs))
+        active = still_active
+
+
+# Lazily interleaves the given traces (as in interleave_round_robin) so that
+# each issues references in proportion to its given weight; each trace has a
+# pass which advances by the inverse of its weight with every reference, and
+# the trace with the lowest pass (kept at the top of a heap) issues next
+def interleave_proportional(traces, weights):
+    heap = [(0.0, tenant, iter(trace)) for tenant, trace in enumerate(traces)]
+    heapq.heapify(heap)
+    while heap:
+        pass_value, tenant, addrs = heap[0]
+        addr = next(addrs, None)
+        if addr is None:
+            heapq.heappop(heap)
+            continue
+        yield tenant, addr
+        heapq.heapreplace(heap, (pass_value + 1 / weights[tenant], tenant, addrs))
+
+
+# Yields the given timestamped references, each along with the given tenant
+def tag_timestamped_refs(timestamped_refs, tenant):
+    for timestamp, addr in timestamped_refs:
+        yield timestamp, tenant, addr
+
+
+# Lazily interleaves the given timestamped traces (each of which yields
+# tuples of a time and an address) in order of time, as in
+# interleave_round_robin; references with the same time are taken from the
+# earliest trace first
+def interleave_timestamped(traces):
+    for _, tenant, addr in heapq.merge(
+        *(tag_timestamped_refs(trace, tenant) for tenant, trace in enumerate(traces))
+    ):
+        yield tenant, addr
+
+
+# The statistics for the references of a single tenant
+class TenantStats(object):
+    def __init__(self):
+        self.num_hits = 0
+        self.num_misses = 0
+        # The number of blocks the tenant currently holds in the cache, and
+        # the most it has held at once
+        self.num_blocks = 0
+        self.peak_num_blocks = 0
+        # The sum over every reference (of any tenant) of the number of blocks
+        # the tenant held, and the reference at which that number last changed
+        self.block_time = 0
+        self.last_change_time = 0
+        # The number of the tenant's blocks which were replaced by another
+        # tenant's
+        self.num_evicted_by_others = 0
+
+    def get_num_refs(self):
+        return self.num_hits + self.num_misses
+
+    def get_hit_rate(self):
+        if self.get_num_refs() == 0:
+            return 0.0
+        return self.num_hits / self.get_num_refs()
+
+    # Adds the given number of blocks (which may be negative) to the blocks
+    # held by the tenant as of the given reference
+    def add_blocks(self, num_blocks, time):
+        self.block_time += self.num_blocks * (time - self.last_change_time)
+        self.last_change_time = time
+        self.num_blocks += num_blocks
+        if self.num_blocks > self.peak_num_blocks:
+            self.peak_num_blocks = self.num_blocks
+
+    # Retrieves the average number of blocks held by the tenant over the
+    # given number of references
+    def get_avg_num_blocks(self, time):
+        if time == 0:
+            return 0.0
+        block_time = self.block_time + self.num_blocks * (time - self.last_change_time)
+        return block_time / time
+
+    # Retrieves the statistics (as of the given number of references) as a
+    # dictionary suitable for serialization
+    def to_dict(self, time):
+        return {
+            "num_refs": self.get_num_refs(),
+            "num_hits": self.num_hits,
+            "num_misses": self.num_misses,
+            "hit_rate": self.get_hit_rate(),
+            "num_blocks": self.num_blocks,
+            "peak_num_blocks": self.peak_num_blocks,
+            "avg_num_blocks": self.get_avg_num_blocks(time),
+            "num_evicted_by_others": self.num_evicted_by_others,
+        }
+
+
+# A cache shared by several tenants, each of which may only place blocks in
+# the ways of each set allowed by its way mask (as with Intel's Cache
+# Allocation Technology); a tenant may hit on its blocks in any way, but on a
+# miss, only the blocks in its own ways are candidates for replacement.
+# Tenants never share blocks, even for the same address, since each is
+# assumed to have its own address space
+class PartitionedCache(object):
+    def __init__(self, geometry, way_masks, replacement_policy="lru"):
+        self.geometry = geometry
+        num_ways = geometry.num_blocks_per_set
+        for way_mask in way_masks:
+            if not 0 < way_mask < 1 << num_ways:
+                raise ValueError(
+                    "way mask {:#x} must select some of the {} ways of a set".format(
+                        way_mask, num_ways
+                    )
+                )
+        # The ways allowed by each tenant's mask
+        self.tenant_ways = [
+            [way for way in range(num_ways) if way_mask >> way & 1]
+            for way_mask in way_masks
+        ]
+        self.shift = geometry.num_byte_offset_bits + geometry.num_offset_bits
+        self.index_mask = geometry.num_sets - 1
+        self.evict_mru = replacement_policy == "mru"
+        # The (tenant, block address) pair in each way of each set (or None
+        # for empty ways), and the time at which each way was last used
+        self.slots = [[None] * num_ways for _ in range(geometry.num_sets)]
+        self.last_used = [[0] * num_ways for _ in range(geometry.num_sets)]
+        # Every resident (tenant, block address) pair, mapped to its way
+        self.resident = {}
+        self.time = 0
+        self.tenant_stats = [TenantStats() for _ in way_masks]
+
+    # Reads the given address of the given tenant into the cache, returning
+    # True if it was a hit
+    def read_addr(self, tenant, addr):
+        time = self.time
+        self.time += 1
+        block_addr = addr >> self.shift
+        set_index = block_addr & self.index_mask
+        block_key = (tenant, block_addr)
+        stats = self.tenant_stats[tenant]
+        set_last_used = self.last_used[set_index]
+        way = self.resident.get(block_key)
+        if way is not None:
+            stats.num_hits += 1
+            set_last_used[way] = time
+            return True
+
+        stats.num_misses += 1
+        slots = self.slots[set_index]
+        tenant_ways = self.tenant_ways[tenant]
+        # Fill the first empty way the tenant is allowed, if any; otherwise,
+        # replace the least (or most) recently used block in those ways
+        for way in tenant_ways:
+            if slots[way] is None:
+                break
+        else:
+            if self.evict_mru:
+                way = max(tenant_ways, key=set_last_used.__getitem__)
+            else:
+                way = min(tenant_ways, key=set_last_used.__getitem__)
+            victim_key = slots[way]
+            del self.resident[victim_key]
+            victim_stats = self.tenant_stats[victim_key[0]]
+            victim_stats.add_blocks(-1, time)
+            if victim_key[0] != tenant:
+                victim_stats.num_evicted_by_others += 1
+        slots[way] = block_key
+        set_last_used[way] = time
+        self.resident[block_key] = way
+        stats.add_blocks(1, time)
+        return False
+
+    # Reads the given interleaved references (each a tuple of a tenant and an
+    # address, which may be lazily generated) into the cache, returning the
+    # statistics of every tenant
+    def read_refs(self, tenant_refs):
+        read_addr = self.read_addr
+        for tenant, addr in tenant_refs:
+            read_addr(tenant, addr)
+        return self.tenant_stats
+
+
+# Displays the statistics of every tenant of the given cache as a table
+def display_stats(cache, tenant_names, table_width):
+    table = Table.create_stats_table("Tenants", TENANT_STATS_COL_NAMES, table_width)
+    for tenant_name, stats in zip(tenant_names, cache.tenant_stats):
+        table.rows.append(
+            (
+                tenant_name,
+                format_count(stats.get_num_refs()),
+                format_count(stats.num_hits),
+                format_count(stats.num_misses),
+                format_rate(stats.get_hit_rate()),
+                format_count(stats.num_blocks),
+                "{:,.1f}".format(stats.get_avg_num_blocks(cache.time)),
+                format_count(stats.num_evicted_by_others),
+            )
+        )
+    print(table)
+
+
+# Parses a way mask for argparse, which may be given in base-10 or (if
+# prefixed with 0x) in hexadecimal
+def parse_way_mask(mask_str):
+    try:
+        return parse_trace_addr(mask_str)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "invalid way mask {!r}".format(mask_str)
+        ) from None
+
+
+# Parse command-line arguments passed to the tenants subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator tenants",
+        description="simulate several interleaved traces sharing one cache",
+    )
+
+    parser.add_argument(
+        "trace_files",
+        nargs="+",
+        help="the path of the trace file of each tenant",
+    )
+
+    parser.add_argument(
+        "--cache-size", type=int, required=True, help="the size of the cache in words"
+    )
+
+    parser.add_argument(
+        "--num-blocks-per-set", type=int, default=1, help="the number of blocks per set"
+    )
+
+    parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        default=1,
+        help="the number of words per block",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru"),
+        default="lru",
+        type=str.lower,
+        help="the cache replacement policy (LRU or MRU)",
+    )
+
+    parser.add_argument(
+        "--interleave",
+        choices=INTERLEAVINGS,
+        default="round-robin",
+        help="how the references of the tenants are interleaved; timestamped "
+        "traces give the time of each reference before its address",
+    )
+
+    parser.add_argument(
+        "--weight",
+        type=float,
+        action="append",
+        help="the relative number of references issued by a tenant when "
+        "interleaving proportionally, given once per tenant",
+    )
+
+    parser.add_argument(
+        "--way-mask",
+        type=parse_way_mask,
+        action="append",
+        help="the ways in which a tenant may place blocks (e.g. 0xf0), given "
+        "once per tenant (defaults to every way)",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON file to which the statistics will be written",
+    )
+
+    cli_args = parser.parse_args(args)
+    num_tenants = len(cli_args.trace_files)
+    if cli_args.interleave == "proportional":
+        if cli_args.weight is None or len(cli_args.weight) != num_tenants:
+            parser.error("--weight must be given once per tenant")
+        if min(cli_args.weight) <= 0:
+            parser.error("--weight must be positive")
+    elif cli_args.weight is not None:
+        parser.error("--weight requires --interleave proportional")
+    if cli_args.way_mask is None:
+        cli_args.way_mask = [(1 << cli_args.num_blocks_per_set) - 1] * num_tenants
+    elif len(cli_args.way_mask) != num_tenants:
+        parser.error("--way-mask must be given once per tenant")
+    elif not all(
+        0 < way_mask < 1 << cli_args.num_blocks_per_set
+        for way_mask in cli_args.way_mask
+    ):
+        parser.error("each --way-mask must select some of the blocks of a set")
+    return cli_args
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    geometry = CacheGeometry(
+        cli_args.cache_size,
+        cli_args.num_blocks_per_set,
+        cli_args.num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(
+            cli_args.word_size, cli_args.addr_unit
+        ),
+    )
+    cache = PartitionedCache(
+        geometry, cli_args.way_mask, replacement_policy=cli_args.replacement_policy
+    )
+    if cli_args.interleave == "timestamped":
+        tenant_refs = interleave_timestamped(
+            [read_timestamped_trace(trace_file) for trace_file in cli_args.trace_files]
+        )
+    else:
+        traces = [read_trace(trace_file) for trace_file in cli_args.trace_files]
+        if cli_args.interleave == "proportional":
+            tenant_refs = interleave_proportional(traces, cli_args.weight)
+        else:
+            tenant_refs = interleave_round_robin(traces)
+    cache.read_refs(tenant_refs)
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as stats_file:
+            json.dump(
+                [
+                    dict(stats.to_dict(cache.time), trace_file=trace_file)
+                    for trace_file, stats in zip(
+                        cli_args.trace_files, cache.tenant_stats
+                    )
+                ],
+                stats_file,
+            )
+            stats_file.write("\n")
+    table_width = get_table_width()
+    print()
+    display_stats(
+        cache,
+        [os.path.basename(trace_file) for trace_file in cli_args.trace_files],
+        table_width,
+    )
+    print()
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import itertools
+import json
+import math
+from array import array
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import STATUS_HIT, CacheKernel
+from cachesimulator.stats import SimulationStats
+from cachesimulator.table import (
+    STAT_VALUE_COL_NAMES,
+    Table,
+    format_count,
+    format_rate,
+    get_table_width,
+)
+from cachesimulator.trace import read_trace
+
+# The maximum number of addresses read into the cache at a time
+READ_CHUNK_SIZE = 65536
+# The default number of cycles taken by a hit
+DEFAULT_HIT_LATENCY = 1
+# The default number of cycles taken to fetch a block from memory on a miss
+DEFAULT_MISS_PENALTY = 100
+# The default number of MSHRs (miss status holding registers), which bounds
+# the number of misses to distinct blocks that may be outstanding at once
+DEFAULT_NUM_MSHRS = 8
+
+
+# Summary statistics for the timing of the references read into a cache
+class TimingStats(object):
+    def __init__(self):
+        self.num_refs = 0
+        self.num_cycles = 0
+        # The total number of cycles from when each reference was ready to
+        # issue to when its data was available
+        self.total_latency = 0
+        # The number of misses (and hits to blocks still being fetched) which
+        # were merged into the MSHR of an outstanding miss to the same block
+        self.num_merged_misses = 0
+        self.num_memory_requests = 0
+        # The number of cycles the issue of references was stalled because
+        # every MSHR was in use
+        self.num_mshr_stall_cycles = 0
+        # The total number of cycles for which each MSHR was in use
+        self.mshr_busy_cycles = 0
+        self.peak_mshr_occupancy = 0
+
+    # Retrieves the average memory access time (AMAT) in cycles
+    def get_amat(self):
+        if self.num_refs == 0:
+            return 0.0
+        return self.total_latency / self.num_refs
+
+    # Retrieves the average number of MSHRs in use at any one cycle
+    def get_avg_mshr_occupancy(self):
+        if self.num_cycles == 0:
+            return 0.0
+        return self.mshr_busy_cycles / self.num_cycles
+
+    # Retrieves the statistics as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "num_refs": self.num_refs,
+            "num_cycles": self.num_cycles,
+            "amat": self.get_amat(),
+            "num_merged_misses": self.num_merged_misses,
+            "num_memory_requests": self.num_memory_requests,
+            "num_mshr_stall_cycles": self.num_mshr_stall_cycles,
+            "avg_mshr_occupancy": self.get_avg_mshr_occupancy(),
+            "peak_mshr_occupancy": self.peak_mshr_occupancy,
+        }
+
+
+# A cycle-approximate model of the time taken to read references into a
+# non-blocking cache, given the cache status of each; one reference is issued
+# per cycle, and a miss allocates an MSHR which is held until its block has
+# been fetched, while later references continue to issue. A miss to a block
+# which is already being fetched is merged into that block's MSHR, and issue
+# stalls whenever a miss needs an MSHR but all are in use. The fills of
+# outstanding misses are kept in a heap ordered by fill time, so that each
+# reference is timed in logarithmic time
+class TimingModel(object):
+    def __init__(
+        self,
+        hit_latency=DEFAULT_HIT_LATENCY,
+        miss_penalty=DEFAULT_MISS_PENALTY,
+        num_mshrs=DEFAULT_NUM_MSHRS,
+        transfer_cycles=0,
+    ):
+        if num_mshrs < 1:
+            raise ValueError("at least one MSHR is required")
+        self.hit_latency = hit_latency
+        self.miss_penalty = miss_penalty
+        self.num_mshrs = num_mshrs
+        # The number of cycles for which each fetch occupies the memory bus,
+        # which limits the bandwidth of memory
+        self.transfer_cycles = transfer_cycles
+        # The cycle at which the next reference is ready to issue
+        self.time = 0
+        # The block of each outstanding miss, mapped to the cycle at which it
+        # will have been fetched, and a heap of the same (fill time, block)
+        # pairs
+        self.outstanding = {}
+        self.fills = []
+        # The first cycle at which the memory bus is free
+        self.memory_free_time = 0
+        self.stats = TimingStats()
+
+    # Frees the MSHR of every miss whose block has been fetched by the given
+    # cycle
+    def retire_fills(self, time):
+        fills = self.fills
+        while fills and fills[0][0] <= time:
+            _, block_addr = heapq.heappop(fills)
+            del self.outstanding[block_addr]
+
+    # Times the given addresses, whose cache statuses are given in the same
+    # order, shifting each address right by the given number of bits to
+    # produce its block address; returns the statistics of every reference
+    # timed so far
+    def read_addrs(self, addrs, shift, statuses):
+        stats = self.stats
+        hit_latency = self.hit_latency
+        miss_penalty = self.miss_penalty
+        num_mshrs = self.num_mshrs
+        transfer_cycles = self.transfer_cycles
+        outstanding = self.outstanding
+        fills = self.fills
+        time = self.time
+        for addr, status in zip(addrs, statuses):
+            block_addr = addr >> shift
+            issue_time = time
+            if fills and fills[0][0] <= issue_time:
+                self.retire_fills(issue_time)
+            fill_time = outstanding.get(block_addr)
+            if fill_time is not None:
+                # The block is still being fetched, so the reference waits
+                # for the outstanding miss (even if the cache already holds
+                # the block's tag)
+                done_time = max(fill_time, issue_time + hit_latency)
+                stats.num_merged_misses += 1
+            elif status == STATUS_HIT:
+                done_time = issue_time + hit_latency
+            else:
+                if len(outstanding) >= num_mshrs:
+                    # Stall until the earliest outstanding miss frees its MSHR
+                    issue_time = fills[0][0]
+                    stats.num_mshr_stall_cycles += issue_time - time
+                    self.retire_fills(issue_time)
+                request_time = max(issue_time + hit_latency, self.memory_free_time)
+                self.memory_free_time = request_time + transfer_cycles
+                done_time = request_time + miss_penalty
+                outstanding[block_addr] = done_time
+                heapq.heappush(fills, (done_time, block_addr))
+                stats.num_memory_requests += 1
+                stats.mshr_busy_cycles += done_time - issue_time
+                if len(outstanding) > stats.peak_mshr_occupancy:
+                    stats.peak_mshr_occupancy = len(outstanding)
+            stats.total_latency += done_time - time
+            if done_time > stats.num_cycles:
+                stats.num_cycles = done_time
+            time = issue_time + 1
+            stats.num_refs += 1
+        self.time = time
+        return stats
+
+    # Times the given references, which have already been read into a cache
+    # (e.g. with Cache.read_refs) with the given number of offset bits
+    def read_refs(self, refs, num_offset_bits):
+        refs = list(refs)
+        return self.read_addrs(
+            [ref.word_addr for ref in refs],
+            num_offset_bits,
+            [ref.cache_status.value for ref in refs],
+        )
+
+
+# Reads the given addresses (which may be any iterable, including a lazily
+# read trace) into the given cache kernel in chunks, timing them with the
+# given model; returns the hit and miss statistics of the cache
+def read_timed_addrs(kernel, model, word_addrs, geometry):
+    cache_stats = SimulationStats()
+    shift = geometry.num_byte_offset_bits + geometry.num_offset_bits
+    word_addrs = iter(word_addrs)
+    while True:
+        chunk = array("Q", itertools.islice(word_addrs, READ_CHUNK_SIZE))
+        if not chunk:
+            break
+        statuses = bytearray(len(chunk))
+        num_hits = kernel.read_addrs(chunk, geometry.num_byte_offset_bits, statuses)
+        cache_stats.num_hits += num_hits
+        cache_stats.num_misses += len(chunk) - num_hits
+        model.read_addrs(chunk, shift, statuses)
+    return cache_stats
+
+
+# Displays the given cache and timing statistics as a table
+def display_stats(cache_stats, timing_stats, table_width):
+    table = Table.create_stats_table("Timing", STAT_VALUE_COL_NAMES, table_width)
+    table.rows.extend(
+        (
+            ("Refs", format_count(cache_stats.get_num_refs())),
+            ("Hit Rate", format_rate(cache_stats.get_hit_rate())),
+            ("Cycles", format_count(timing_stats.num_cycles)),
+            ("AMAT", "{:.2f}".format(timing_stats.get_amat())),
+            ("Memory Requests", format_count(timing_stats.num_memory_requests)),
+            ("Merged Misses", format_count(timing_stats.num_merged_misses)),
+            ("MSHR Stall Cycles", format_count(timing_stats.num_mshr_stall_cycles)),
+            (
+                "Avg MSHR Occupancy",
+                "{:.2f}".format(timing_stats.get_avg_mshr_occupancy()),
+            ),
+            ("Peak MSHR Occupancy", format_count(timing_stats.peak_mshr_occupancy)),
+        )
+    )
+    print(table)
+
+
+# Parse command-line arguments passed to the timing subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator timing",
+        description="estimate the time taken to read a trace into a non-blocking cache",
+    )
+
+    parser.add_argument("trace_file", help="the path of the trace file to simulate")
+
+    parser.add_argument(
+        "--cache-size", type=int, required=True, help="the size of the cache in words"
+    )
+
+    parser.add_argument(
+        "--num-blocks-per-set", type=int, default=1, help="the number of blocks per set"
+    )
+
+    parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        default=1,
+        help="the number of words per block",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru"),
+        default="lru",
+        type=str.lower,
+        help="the cache replacement policy (LRU or MRU)",
+    )
+
+    parser.add_argument(
+        "--hit-latency",
+        type=int,
+        default=DEFAULT_HIT_LATENCY,
+        help="the number of cycles taken by a hit",
+    )
+
+    parser.add_argument(
+        "--miss-penalty",
+        type=int,
+        default=DEFAULT_MISS_PENALTY,
+        help="the number of cycles taken to fetch a block from memory",
+    )
+
+    parser.add_argument(
+        "--num-mshrs",
+        type=int,
+        default=DEFAULT_NUM_MSHRS,
+        help="the number of misses to distinct blocks which may be outstanding at once",
+    )
+
+    parser.add_argument(
+        "--memory-bandwidth",
+        type=float,
+        help="the number of bytes which memory can transfer per cycle "
+        "(unlimited by default)",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON file to which the statistics will be written",
+    )
+
+    cli_args = parser.parse_args(args)
+    if cli_args.hit_latency < 0 or cli_args.miss_penalty < 0:
+        parser.error("--hit-latency and --miss-penalty must not be negative")
+    if cli_args.num_mshrs < 1:
+        parser.error("--num-mshrs must be positive")
+    if cli_args.memory_bandwidth is not None and cli_args.memory_bandwidth <= 0:
+        parser.error("--memory-bandwidth must be positive")
+    return cli_args
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    geometry = CacheGeometry(
+        cli_args.cache_size,
+        cli_args.num_blocks_per_set,
+        cli_args.num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(
+            cli_args.word_size, cli_args.addr_unit
+        ),
+    )
+    kernel = CacheKernel(
+        geometry.num_index_bits,
+        geometry.num_offset_bits,
+        geometry.num_blocks_per_set,
+        evict_mru=cli_args.replacement_policy == "mru",
+    )
+    transfer_cycles = 0
+    if cli_args.memory_bandwidth is not None:
+        block_size = cli_args.num_words_per_block * cli_args.word_size
+        transfer_cycles = math.ceil(block_size / cli_args.memory_bandwidth)
+    model = TimingModel(
+        hit_latency=cli_args.hit_latency,
+        miss_penalty=cli_args.miss_penalty,
+        num_mshrs=cli_args.num_mshrs,
+        transfer_cycles=transfer_cycles,
+    )
+    cache_stats = read_timed_addrs(
+        kernel, model, read_trace(cli_args.trace_file), geometry
+    )
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as stats_file:
+            json.dump(
+                {"cache": cache_stats.to_dict(), "timing": model.stats.to_dict()},
+                stats_file,
+            )
+            stats_file.write("\n")
+    table_width = get_table_width()
+    print()
+    display_stats(cache_stats, model.stats, table_width)
+    print()
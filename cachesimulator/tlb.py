@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import math
+from array import array
+
+from cachesimulator.geometry import CacheGeometry, get_num_byte_offset_bits
+from cachesimulator.kernel import STATUS_MISS, CacheKernel
+from cachesimulator.table import Table, format_count, format_rate, get_table_width
+from cachesimulator.trace import read_trace
+
+# The maximum number of addresses translated (and read into the cache) at a
+# time
+READ_CHUNK_SIZE = 65536
+# The default size of each page in bytes
+DEFAULT_PAGE_SIZE = 4096
+# The default number of levels of the page table
+DEFAULT_NUM_PAGE_WALK_LEVELS = 4
+# The number of bits of the page number which index each level of the page
+# table, and the size in bytes of each page table entry
+NUM_PAGE_TABLE_INDEX_BITS = 9
+PAGE_TABLE_ENTRY_SIZE = 8
+# The byte address of the first page table, and the distance between the
+# tables of successive levels; page tables are placed far above any address
+# likely to appear in a trace, so they never overlap the data
+PAGE_TABLE_BASE = 1 << 60
+PAGE_TABLE_LEVEL_SPAN = 1 << 56
+# The names of all translation statistics table columns
+TLB_STATS_COL_NAMES = ("Structure", "Accesses", "Hits", "Misses", "Hit Rate")
+# Maps each cache status to its opposite, so that misses can be selected
+INVERTED_STATUSES = bytes.maketrans(b"\x00\x01", b"\x01\x00")
+
+
+# The dimensions of a single level of a TLB, which caches the translations of
+# whole pages; like a cache, a TLB is divided into sets of entries
+class TlbLevel(object):
+    def __init__(self, num_entries, num_entries_per_set):
+        if num_entries_per_set < 1 or num_entries % num_entries_per_set:
+            raise ValueError(
+                "number of entries must be a multiple of the number per set"
+            )
+        num_sets = num_entries // num_entries_per_set
+        if num_sets & (num_sets - 1):
+            raise ValueError("number of sets must be a power of two")
+        self.num_entries = num_entries
+        self.num_entries_per_set = num_entries_per_set
+        self.num_index_bits = int(math.log2(num_sets))
+
+    # Parses a TLB level of the form ENTRIES:ENTRIES_PER_SET (or just ENTRIES
+    # for a fully associative TLB)
+    @classmethod
+    def parse(cls, level_str):
+        num_entries, _, num_entries_per_set = level_str.partition(":")
+        num_entries = int(num_entries)
+        return cls(num_entries, int(num_entries_per_set or num_entries))
+
+    def __str__(self):
+        return "{}:{}".format(self.num_entries, self.num_entries_per_set)
+
+
+# The number of hits and misses of a single structure (a TLB level or the
+# cache)
+class AccessStats(object):
+    def __init__(self, num_hits=0, num_misses=0):
+        self.num_hits = num_hits
+        self.num_misses = num_misses
+
+    def get_num_accesses(self):
+        return self.num_hits + self.num_misses
+
+    def get_hit_rate(self):
+        if self.get_num_accesses() == 0:
+            return 0.0
+        return self.num_hits / self.get_num_accesses()
+
+    def to_dict(self):
+        return {
+            "num_accesses": self.get_num_accesses(),
+            "num_hits": self.num_hits,
+            "num_misses": self.num_misses,
+            "hit_rate": self.get_hit_rate(),
+        }
+
+
+# The statistics of a translated simulation: those of each TLB level (which
+# is only accessed on a miss in the level before it), the number of page walks
+# (on a miss in every level), and those of the cache for the references of the
+# trace and (if page walks are simulated) for the references of page walks
+class TranslationStats(object):
+    def __init__(self, num_tlb_levels):
+        self.tlb_stats = [AccessStats() for _ in range(num_tlb_levels)]
+        self.num_page_walks = 0
+        self.cache_stats = AccessStats()
+        self.page_walk_cache_stats = AccessStats()
+
+    # Retrieves the statistics as a dictionary suitable for serialization
+    def to_dict(self):
+        return {
+            "tlb": [level_stats.to_dict() for level_stats in self.tlb_stats],
+            "num_page_walks": self.num_page_walks,
+            "cache": self.cache_stats.to_dict(),
+            "page_walk_cache": self.page_walk_cache_stats.to_dict(),
+        }
+
+
+# Simulates a cache of the given geometry behind a TLB of the given levels;
+# every address is translated (by each TLB level in turn until one hits, and
+# by a page walk if none does) before it reaches the cache, and the references
+# made by each page walk to the page table may be read into the cache ahead of
+# the reference which needed them; virtual addresses are mapped to identical
+# physical addresses, so only the cost of translation is simulated. Each TLB
+# level, like the cache, is simulated by the cache kernel (reading page
+# numbers rather than block addresses)
+class TlbSimulator(object):
+    def __init__(
+        self,
+        geometry,
+        tlb_levels,
+        page_size=DEFAULT_PAGE_SIZE,
+        word_size=4,
+        replacement_policy="lru",
+        num_page_walk_levels=0,
+    ):
+        self.geometry = geometry
+        self.tlb_levels = tlb_levels
+        num_word_offset_bits = int(math.log2(word_size))
+        if page_size & (page_size - 1) or page_size < word_size:
+            raise ValueError("page size must be a power of two no smaller than a word")
+        # The number of low-order bits of each address of the trace which are
+        # dropped to produce its page number
+        self.num_page_offset_bits = (
+            int(math.log2(page_size))
+            - num_word_offset_bits
+            + geometry.num_byte_offset_bits
+        )
+        # The number of low-order bits of the byte address of each page table
+        # entry which are dropped to produce an address of the trace
+        self.num_page_table_shift_bits = (
+            num_word_offset_bits - geometry.num_byte_offset_bits
+        )
+        self.num_page_walk_levels = num_page_walk_levels
+        evict_mru = replacement_policy == "mru"
+        self.tlb_kernels = [
+            CacheKernel(
+                tlb_level.num_index_bits,
+                0,
+                tlb_level.num_entries_per_set,
+                evict_mru=evict_mru,
+            )
+            for tlb_level in tlb_levels
+        ]
+        self.cache_kernel = CacheKernel(
+            geometry.num_index_bits,
+            geometry.num_offset_bits,
+            geometry.num_blocks_per_set,
+            evict_mru=evict_mru,
+        )
+        self.stats = TranslationStats(len(tlb_levels))
+
+    # Retrieves the addresses (as addresses of the trace) of the page table
+    # entries read by a walk of the page table for the page of the given
+    # address, from the root of the page table to its last level
+    def get_page_walk_addrs(self, addr):
+        page_num = addr >> self.num_page_offset_bits
+        return [
+            (
+                PAGE_TABLE_BASE
+                + level * PAGE_TABLE_LEVEL_SPAN
+                + (
+                    page_num
+                    >> (
+                        NUM_PAGE_TABLE_INDEX_BITS
+                        * (self.num_page_walk_levels - level - 1)
+                    )
+                )
+                * PAGE_TABLE_ENTRY_SIZE
+            )
+            >> self.num_page_table_shift_bits
+            for level in range(self.num_page_walk_levels)
+        ]
+
+    # Translates the given chunk of addresses through every TLB level,
+    # returning the positions (within the chunk) of the addresses which
+    # missed in every level and so needed a page walk
+    def translate_chunk(self, chunk):
+        positions = range(len(chunk))
+        level_addrs = chunk
+        for kernel, level_stats in zip(self.tlb_kernels, self.stats.tlb_stats):
+            if not level_addrs:
+                break
+            statuses = bytearray(len(level_addrs))
+            num_hits = kernel.read_addrs(
+                level_addrs, self.num_page_offset_bits, statuses
+            )
+            level_stats.num_hits += num_hits
+            level_stats.num_misses += len(level_addrs) - num_hits
+            # Only the addresses which missed reach the next level
+            missed = statuses.translate(INVERTED_STATUSES)
+            positions = list(itertools.compress(positions, missed))
+            level_addrs = array("Q", itertools.compress(level_addrs, missed))
+        return positions
+
+    # Simulates the given chunk of addresses, returning the statistics of
+    # every chunk simulated so far
+    def read_chunk(self, chunk):
+        stats = self.stats
+        num_byte_offset_bits = self.geometry.num_byte_offset_bits
+        walk_positions = self.translate_chunk(chunk)
+        stats.num_page_walks += len(walk_positions)
+        if not self.num_page_walk_levels or not walk_positions:
+            statuses = bytearray(len(chunk))
+            num_hits = self.cache_kernel.read_addrs(
+                chunk, num_byte_offset_bits, statuses
+            )
+            stats.cache_stats.num_hits += num_hits
+            stats.cache_stats.num_misses += len(chunk) - num_hits
+            return stats
+
+        # The references of each page walk are placed immediately before the
+        # reference which needed it
+        cache_addrs = array("Q")
+        is_page_walk = bytearray()
+        prev_position = 0
+        for position in walk_positions:
+            cache_addrs.extend(chunk[prev_position:position])
+            walk_addrs = self.get_page_walk_addrs(chunk[position])
+            cache_addrs.extend(walk_addrs)
+            is_page_walk.extend(bytes(position - prev_position))
+            is_page_walk.extend(b"\x01" * len(walk_addrs))
+            prev_position = position
+        cache_addrs.extend(chunk[prev_position:])
+        is_page_walk.extend(bytes(len(chunk) - prev_position))
+
+        statuses = bytearray(len(cache_addrs))
+        num_hits = self.cache_kernel.read_addrs(
+            cache_addrs, num_byte_offset_bits, statuses
+        )
+        num_walk_refs = len(walk_positions) * self.num_page_walk_levels
+        num_walk_misses = sum(
+            itertools.compress(statuses.translate(INVERTED_STATUSES), is_page_walk)
+        )
+        num_misses = statuses.count(STATUS_MISS)
+        stats.page_walk_cache_stats.num_hits += num_walk_refs - num_walk_misses
+        stats.page_walk_cache_stats.num_misses += num_walk_misses
+        stats.cache_stats.num_hits += num_hits - (num_walk_refs - num_walk_misses)
+        stats.cache_stats.num_misses += num_misses - num_walk_misses
+        return stats
+
+    # Simulates the given addresses (which may be any iterable, including a
+    # lazily read trace) in chunks, returning the statistics of every address
+    # simulated so far
+    def read_addrs(self, word_addrs):
+        word_addrs = iter(word_addrs)
+        while True:
+            chunk = array("Q", itertools.islice(word_addrs, READ_CHUNK_SIZE))
+            if not chunk:
+                break
+            self.read_chunk(chunk)
+        return self.stats
+
+
+# Displays the given translation statistics as a table
+def display_stats(stats, tlb_levels, table_width):
+    table = Table.create_stats_table("Translation", TLB_STATS_COL_NAMES, table_width)
+
+    rows = [
+        ("L{} TLB ({})".format(level_num, tlb_level), level_stats)
+        for level_num, (tlb_level, level_stats) in enumerate(
+            zip(tlb_levels, stats.tlb_stats), 1
+        )
+    ]
+    rows.append(("Cache", stats.cache_stats))
+    if stats.page_walk_cache_stats.get_num_accesses():
+        rows.append(("Cache (Walks)", stats.page_walk_cache_stats))
+    for name, access_stats in rows:
+        table.rows.append(
+            (
+                name,
+                format_count(access_stats.get_num_accesses()),
+                format_count(access_stats.num_hits),
+                format_count(access_stats.num_misses),
+                format_rate(access_stats.get_hit_rate()),
+            )
+        )
+    table.rows.append(("Page Walks", format_count(stats.num_page_walks), "", "", ""))
+
+    print(table)
+
+
+# Parses a TLB level for argparse, reporting invalid levels as usage errors
+def parse_tlb_level(level_str):
+    try:
+        return TlbLevel.parse(level_str)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(
+            "invalid TLB level {!r}: {}".format(level_str, error)
+        ) from None
+
+
+# Parse command-line arguments passed to the tlb subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator tlb",
+        description="simulate address translation in front of a cache",
+    )
+
+    parser.add_argument("trace_file", help="the path of the trace file to simulate")
+
+    parser.add_argument(
+        "--cache-size", type=int, required=True, help="the size of the cache in words"
+    )
+
+    parser.add_argument(
+        "--num-blocks-per-set", type=int, default=1, help="the number of blocks per set"
+    )
+
+    parser.add_argument(
+        "--num-words-per-block",
+        type=int,
+        default=1,
+        help="the number of words per block",
+    )
+
+    parser.add_argument(
+        "--word-size",
+        type=int,
+        default=4,
+        help="the size of each word in bytes",
+    )
+
+    parser.add_argument(
+        "--addr-unit",
+        choices=("word", "byte"),
+        default="word",
+        help="whether the given addresses are word addresses or byte addresses",
+    )
+
+    parser.add_argument(
+        "--replacement-policy",
+        choices=("lru", "mru"),
+        default="lru",
+        type=str.lower,
+        help="the replacement policy of the cache and TLB (LRU or MRU)",
+    )
+
+    parser.add_argument(
+        "--tlb",
+        type=parse_tlb_level,
+        action="append",
+        metavar="ENTRIES[:ENTRIES_PER_SET]",
+        help="a level of the TLB, given once per level from the first "
+        "(defaults to a single 64-entry, 4-way level)",
+    )
+
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=DEFAULT_PAGE_SIZE,
+        help="the size of each page in bytes",
+    )
+
+    parser.add_argument(
+        "--page-walk-levels",
+        type=int,
+        default=DEFAULT_NUM_PAGE_WALK_LEVELS,
+        help="the number of levels of the page table",
+    )
+
+    parser.add_argument(
+        "--inject-page-walks",
+        action="store_true",
+        help="read the page table entries of each page walk into the cache",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of a JSON file to which the statistics will be written",
+    )
+
+    cli_args = parser.parse_args(args)
+    if cli_args.tlb is None:
+        cli_args.tlb = [TlbLevel(64, 4)]
+    page_size = cli_args.page_size
+    if page_size & (page_size - 1) or page_size < cli_args.word_size:
+        parser.error("--page-size must be a power of two no smaller than --word-size")
+    if cli_args.page_walk_levels < 1:
+        parser.error("--page-walk-levels must be positive")
+    return cli_args
+
+
+def main(args):
+    cli_args = parse_cli_args(args)
+    geometry = CacheGeometry(
+        cli_args.cache_size,
+        cli_args.num_blocks_per_set,
+        cli_args.num_words_per_block,
+        num_byte_offset_bits=get_num_byte_offset_bits(
+            cli_args.word_size, cli_args.addr_unit
+        ),
+    )
+    simulator = TlbSimulator(
+        geometry,
+        cli_args.tlb,
+        page_size=cli_args.page_size,
+        word_size=cli_args.word_size,
+        replacement_policy=cli_args.replacement_policy,
+        num_page_walk_levels=(
+            cli_args.page_walk_levels if cli_args.inject_page_walks else 0
+        ),
+    )
+    stats = simulator.read_addrs(read_trace(cli_args.trace_file))
+    if cli_args.output is not None:
+        with open(cli_args.output, "w") as stats_file:
+            json.dump(stats.to_dict(), stats_file)
+            stats_file.write("\n")
+    table_width = get_table_width()
+    print()
+    display_stats(stats, cli_args.tlb, table_width)
+    print()
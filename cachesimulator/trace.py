@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+
+import itertools
+
+# The number of addresses written to a trace file at a time
+WRITE_CHUNK_SIZE = 65536
+
+
+# The largest address which may be simulated; addresses are stored (and
+# simulated by the kernel) as unsigned 64-bit integers
+MAX_TRACE_ADDR = 2**64 - 1
+
+
+# Parses a single address from a trace file, which may be written in base-10
+# or (if prefixed with 0x) in hexadecimal, raising a ValueError if it is not
+# a valid address
+def parse_trace_addr(token):
+    if token[:2].lower() == "0x":
+        addr = int(token, 16)
+    else:
+        addr = int(token)
+    if not 0 <= addr <= MAX_TRACE_ADDR:
+        raise ValueError(
+            "address out of range (must be from 0 to 2**64 - 1): {}".format(token)
+        )
+    return addr
+
+
+# Lazily reads the addresses from the given trace file; a trace file lists
+# addresses separated by whitespace (usually one per line), and any text
+# following a # on a line is ignored. An invalid address raises a ValueError
+# giving its line
+def read_trace(trace_path):
+    with open(trace_path) as trace_file:
+        for line_num, line in enumerate(trace_file, start=1):
+            try:
+                line_addrs = list(map(parse_trace_addr, line.partition("#")[0].split()))
+            except ValueError as error:
+                raise ValueError(
+                    "{}, line {}: {}".format(trace_path, line_num, error)
+                ) from None
+            yield from line_addrs
+
+
+# Writes the given addresses (which may be any iterable, including a
+# generator) to the given file object using the trace file format
+def write_trace(trace_file, word_addrs):
+    word_addrs = iter(word_addrs)
+    while True:
+        chunk = list(itertools.islice(word_addrs, WRITE_CHUNK_SIZE))
+        if not chunk:
+            break
+        trace_file.write("\n".join(map(str, chunk)))
+        trace_file.write("\n")
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import random
+import sys
+
+from cachesimulator.trace import write_trace
+
+# The names of all address patterns which can be generated
+PATTERNS = (
+    "sequential",
+    "strided",
+    "uniform",
+    "zipfian",
+    "matmul",
+    "stencil",
+    "pointer-chase",
+)
+# The number of random addresses drawn at a time by the random generators
+CHUNK_SIZE = 65536
+# The number of words in the footprint of the random and pointer-chasing
+# patterns if none is given (strided addresses are unbounded by default)
+DEFAULT_NUM_WORDS = 1024
+
+
+# Shifts every address in the given iterable by the given base address
+def _offset_addrs(addrs, start):
+    if start:
+        return map(start.__add__, addrs)
+    else:
+        return iter(addrs)
+
+
+# Repeatedly draws chunks of addresses from the given function (which accepts
+# the number of addresses to draw) until num_refs addresses have been yielded
+def _generate_chunks(num_refs, draw_chunk):
+    while num_refs > 0:
+        chunk_size = min(num_refs, CHUNK_SIZE)
+        yield from draw_chunk(chunk_size)
+        num_refs -= chunk_size
+
+
+# Yields the addresses of consecutive words, beginning at the start address
+def generate_sequential(num_refs, start=0):
+    return iter(range(start, start + num_refs))
+
+
+# Yields every stride-th word address; if num_words is given, the addresses
+# wrap around so as to stay within a footprint of that many words
+def generate_strided(num_refs, stride, num_words=None, start=0):
+    if num_words is None:
+        return iter(range(start, start + num_refs * stride, stride))
+    addrs = itertools.cycle(range(0, num_words, stride))
+    return _offset_addrs(itertools.islice(addrs, num_refs), start)
+
+
+# Yields addresses drawn uniformly at random from a footprint of num_words
+# words
+def generate_uniform(num_refs, num_words, seed=None, start=0):
+    rng = random.Random(seed)
+    population = range(num_words)
+    addrs = _generate_chunks(num_refs, lambda k: rng.choices(population, k=k))
+    return _offset_addrs(addrs, start)
+
+
+# Yields addresses from a footprint of num_words words whose popularity
+# follows a Zipf distribution with the given exponent; the ranking of
+# addresses is shuffled so that the most popular words are scattered across
+# the footprint rather than packed at its beginning
+def generate_zipfian(num_refs, num_words, exponent=1.0, seed=None, start=0):
+    rng = random.Random(seed)
+    population = list(range(num_words))
+    rng.shuffle(population)
+    cum_weights = list(
+        itertools.accumulate(1 / (rank**exponent) for rank in range(1, num_words + 1))
+    )
+    addrs = _generate_chunks(
+        num_refs,
+        lambda k: rng.choices(population, cum_weights=cum_weights, k=k),
+    )
+    return _offset_addrs(addrs, start)
+
+
+# Yields the addresses referenced by a naive multiplication of two square
+# matrices of the given size (C = A * B), where A, B, and C are stored
+# consecutively in row-major order
+def _generate_matmul_pass(size):
+    a_start = 0
+    b_start = a_start + size * size
+    c_start = b_start + size * size
+    for i in range(size):
+        for j in range(size):
+            for k in range(size):
+                yield a_start + i * size + k
+                yield b_start + k * size + j
+            yield c_start + i * size + j
+
+
+# Yields the addresses referenced by a 5-point stencil which reads each
+# interior point of a square grid (and its four neighbors) and writes the
+# result to a second grid
+def _generate_stencil_pass(size):
+    a_start = 0
+    b_start = a_start + size * size
+    for i in range(1, size - 1):
+        for j in range(1, size - 1):
+            center = i * size + j
+            yield a_start + center - size
+            yield a_start + center - 1
+            yield a_start + center
+            yield a_start + center + 1
+            yield a_start + center + size
+            yield b_start + center
+
+
+# Yields addresses from the given loop nest, repeating the entire nest as many
+# times as needed to produce num_refs addresses
+def _repeat_loop_nest(num_refs, generate_pass, size):
+    def generate_passes():
+        while True:
+            yield from generate_pass(size)
+
+    return itertools.islice(generate_passes(), num_refs)
+
+
+# Yields the addresses referenced by repeated multiplications of two square
+# matrices of the given size
+def generate_matmul(num_refs, size, start=0):
+    return _offset_addrs(
+        _repeat_loop_nest(num_refs, _generate_matmul_pass, size), start
+    )
+
+
+# Yields the addresses referenced by repeated sweeps of a 5-point stencil over
+# a square grid of the given size
+def generate_stencil(num_refs, size, start=0):
+    if size < 3:
+        raise ValueError("stencil grid size must be at least 3")
+    return _offset_addrs(
+        _repeat_loop_nest(num_refs, _generate_stencil_pass, size), start
+    )
+
+
+# Yields the addresses of a linked list of num_words / stride nodes (each
+# stride words long) whose nodes are linked in a random order, such that
+# every node is visited once before the traversal repeats
+def generate_pointer_chase(num_refs, num_words, stride=1, seed=None, start=0):
+    rng = random.Random(seed)
+    num_nodes = max(1, num_words // stride)
+    # Use Sattolo's algorithm to link all nodes into a single random cycle
+    next_nodes = list(range(num_nodes))
+    for i in range(num_nodes - 1, 0, -1):
+        j = rng.randrange(i)
+        next_nodes[i], next_nodes[j] = next_nodes[j], next_nodes[i]
+
+    def chase_pointers():
+        node = 0
+        for _ in range(num_refs):
+            yield start + node * stride
+            node = next_nodes[node]
+
+    return chase_pointers()
+
+
+# Yields num_refs addresses following the address pattern with the given
+# name; parameters which are irrelevant to the pattern are ignored
+def generate_trace(
+    pattern,
+    num_refs,
+    num_words=None,
+    stride=1,
+    size=32,
+    exponent=1.0,
+    seed=None,
+    start=0,
+):
+    # Strided addresses wrap around only if a footprint is given
+    if num_words is None and pattern != "strided":
+        num_words = DEFAULT_NUM_WORDS
+    if pattern == "sequential":
+        return generate_sequential(num_refs, start=start)
+    elif pattern == "strided":
+        return generate_strided(num_refs, stride, num_words=num_words, start=start)
+    elif pattern == "uniform":
+        return generate_uniform(num_refs, num_words, seed=seed, start=start)
+    elif pattern == "zipfian":
+        return generate_zipfian(
+            num_refs, num_words, exponent=exponent, seed=seed, start=start
+        )
+    elif pattern == "matmul":
+        return generate_matmul(num_refs, size, start=start)
+    elif pattern == "stencil":
+        return generate_stencil(num_refs, size, start=start)
+    elif pattern == "pointer-chase":
+        return generate_pointer_chase(
+            num_refs, num_words, stride=stride, seed=seed, start=start
+        )
+    else:
+        raise ValueError("unknown address pattern: {}".format(pattern))
+
+
+# Parse command-line arguments passed to the generate subcommand
+def parse_cli_args(args):
+    parser = argparse.ArgumentParser(
+        prog="cache-simulator generate",
+        description="generate a synthetic trace of word addresses",
+    )
+
+    parser.add_argument(
+        "pattern", choices=PATTERNS, help="the pattern of the generated addresses"
+    )
+
+    parser.add_argument(
+        "--num-refs",
+        type=int,
+        required=True,
+        help="the number of addresses to generate",
+    )
+
+    parser.add_argument(
+        "--num-words",
+        type=int,
+        help="the number of words in the footprint of the generated addresses"
+        " (defaults to {}, or to an unbounded footprint for strided"
+        " addresses)".format(DEFAULT_NUM_WORDS),
+    )
+
+    parser.add_argument(
+        "--stride",
+        type=int,
+        default=1,
+        help="the distance in words between strided addresses or chased nodes",
+    )
+
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=32,
+        help="the width of each matrix or grid in a loop nest",
+    )
+
+    parser.add_argument(
+        "--exponent",
+        type=float,
+        default=1.0,
+        help="the exponent of the Zipf distribution",
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="the seed for randomly generated addresses",
+    )
+
+    parser.add_argument(
+        "--start",
+        type=int,
+        default=0,
+        help="the word address at which the footprint begins",
+    )
+
+    parser.add_argument(
+        "--output",
+        help="the path of the trace file to write (defaults to stdout)",
+    )
+
+    cli_args = parser.parse_args(args)
+    if cli_args.num_refs < 0:
+        parser.error("--num-refs must not be negative")
+    if cli_args.num_words is not None and cli_args.num_words < 1:
+        parser.error("--num-words must be positive")
+    if cli_args.stride < 1:
+        parser.error("--stride must be positive")
+    if cli_args.size < 1 or (cli_args.pattern == "stencil" and cli_args.size < 3):
+        parser.error("--size must be positive (and at least 3 for a stencil)")
+    if cli_args.start < 0:
+        parser.error("--start must not be negative")
+
+    return cli_args
+
+
+def main(args):
+    cli_args = vars(parse_cli_args(args))
+    output = cli_args.pop("output")
+    word_addrs = generate_trace(**cli_args)
+    if output is None:
+        write_trace(sys.stdout, word_addrs)
+    else:
+        with open(output, "w") as trace_file:
+            write_trace(trace_file, word_addrs)
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.batch import (
+    get_job_sim_args,
+    read_manifest,
+    run_jobs,
+    simulate_job,
+)
+from cachesimulator.simulator import Simulator
+from cachesimulator.stats import SimulationStats
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+
+
+def write_manifest(tmp_path, jobs):
+    (tmp_path / "trace.txt").write_text("\n".join(map(str, WORD_ADDRS)))
+    manifest_path = tmp_path / "manifest.jsonl"
+    manifest_path.write_text("\n".join(map(json.dumps, jobs)) + "\n\n")
+    return manifest_path
+
+
+def get_expected_stats(**sim_args):
+    refs, _ = Simulator().simulate(num_addr_bits=1, word_addrs=WORD_ADDRS, **sim_args)
+    return SimulationStats.from_refs(refs).to_dict()
+
+
+def test_simulation_stats():
+    """should tally hits and misses and compute rates"""
+    stats = SimulationStats(num_hits=3, num_misses=9)
+    assert stats.get_num_refs() == 12
+    assert stats.get_hit_rate() == 0.25
+    assert stats.get_miss_rate() == 0.75
+    assert SimulationStats().get_hit_rate() == 0.0
+    assert SimulationStats().get_miss_rate() == 0.0
+
+
+def test_simulation_stats_from_refs():
+    """should tally the same statistics for batches and lists"""
+    refs, _ = Simulator().simulate(
+        num_blocks_per_set=3,
+        num_words_per_block=2,
+        cache_size=24,
+        replacement_policy="lru",
+        num_addr_bits=1,
+        word_addrs=WORD_ADDRS,
+    )
+    batch_stats = SimulationStats.from_refs(refs).to_dict()
+    list_stats = SimulationStats.from_refs(list(refs)).to_dict()
+    assert batch_stats == list_stats
+    assert batch_stats["num_hits"] == 3
+    assert batch_stats["num_misses"] == 9
+
+
+def test_read_manifest(tmp_path):
+    """should resolve trace files relative to the manifest"""
+    manifest_path = write_manifest(
+        tmp_path, [{"trace_file": "trace.txt", "cache_size": 8}]
+    )
+    assert read_manifest(manifest_path) == [
+        {"trace_file": str(tmp_path / "trace.txt"), "cache_size": 8}
+    ]
+
+
+def test_get_job_sim_args():
+    """should fill in default parameters and reject invalid jobs"""
+    sim_args = get_job_sim_args({"trace_file": "t.txt", "cache_size": 8})
+    assert sim_args["cache_size"] == 8
+    assert sim_args["replacement_policy"] == "lru"
+    with pytest.raises(ValueError):
+        get_job_sim_args({"cache_size": 8})
+    with pytest.raises(ValueError):
+        get_job_sim_args({"trace_file": "t.txt"})
+    with pytest.raises(ValueError):
+        get_job_sim_args({"trace_file": "t.txt", "cache_size": 8, "colour": 1})
+
+
+@pytest.mark.parametrize("replacement_policy", ("MRU", "Opt", "lru"))
+def test_get_job_sim_args_replacement_policy(replacement_policy):
+    """should accept replacement policies in any case"""
+    sim_args = get_job_sim_args(
+        {
+            "trace_file": "t.txt",
+            "cache_size": 8,
+            "replacement_policy": replacement_policy,
+        }
+    )
+    assert sim_args["replacement_policy"] == replacement_policy.lower()
+
+
+@pytest.mark.parametrize("replacement_policy", ("opt", "OPT"))
+def test_get_job_sim_args_optimal_compress(replacement_policy):
+    """should reject compressing a trace simulated with OPT"""
+    with pytest.raises(ValueError, match="opt replacement policy"):
+        get_job_sim_args(
+            {
+                "trace_file": "t.txt",
+                "cache_size": 8,
+                "replacement_policy": replacement_policy,
+                "compress": True,
+            }
+        )
+
+
+def test_simulate_job_optimal_compress():
+    """simulating a job should reject compressing a trace simulated with OPT"""
+    sim_args = get_job_sim_args({"trace_file": "t.txt", "cache_size": 4})
+    sim_args.update(replacement_policy="opt", compress=True)
+    with pytest.raises(ValueError, match="opt replacement policy"):
+        simulate_job([0, 4, 8, 12, 16] * 20, sim_args)
+
+
+@pytest.mark.parametrize("replacement_policy", ("fifo", "", None, 1))
+def test_get_job_sim_args_unknown_replacement_policy(replacement_policy):
+    """should reject unknown replacement policies"""
+    with pytest.raises(ValueError, match="unknown replacement policy"):
+        get_job_sim_args(
+            {
+                "trace_file": "t.txt",
+                "cache_size": 8,
+                "replacement_policy": replacement_policy,
+            }
+        )
+
+
+def test_run_jobs(tmp_path):
+    """should run every job, isolating failed jobs"""
+    manifest_path = write_manifest(
+        tmp_path,
+        [
+            {"name": "direct", "trace_file": "trace.txt", "cache_size": 16},
+            {
+                "name": "mru",
+                "trace_file": "trace.txt",
+                "cache_size": 8,
+                "num_blocks_per_set": 4,
+                "num_words_per_block": 2,
+                "replacement_policy": "mru",
+            },
+            {"name": "missing", "trace_file": "missing.txt", "cache_size": 8},
+        ],
+    )
+    results = sorted(
+        run_jobs(read_manifest(manifest_path), num_workers=2),
+        key=lambda result: result["job"],
+    )
+    assert [result["name"] for result in results] == ["direct", "mru", "missing"]
+    assert results[0]["stats"] == get_expected_stats(
+        num_blocks_per_set=1,
+        num_words_per_block=1,
+        cache_size=16,
+        replacement_policy="lru",
+    )
+    assert results[1]["stats"] == get_expected_stats(
+        num_blocks_per_set=4,
+        num_words_per_block=2,
+        cache_size=8,
+        replacement_policy="mru",
+    )
+    assert results[1]["elapsed_time"] > 0
+    assert "stats" not in results[2]
+    assert results[2]["error"].startswith("FileNotFoundError")
+
+
+def test_main_batch(tmp_path):
+    """should write all results to the output file and report failures"""
+    manifest_path = write_manifest(
+        tmp_path,
+        [
+            {"trace_file": "trace.txt", "cache_size": 16},
+            {"trace_file": "trace.txt"},
+        ],
+    )
+    results_path = tmp_path / "results.jsonl"
+    err = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "batch",
+                str(manifest_path),
+                "--output",
+                str(results_path),
+                "--num-workers",
+                "1",
+                "--cache-dir",
+                str(tmp_path / "cache"),
+            ],
+        ),
+        contextlib.redirect_stderr(err),
+        pytest.raises(SystemExit) as exit_info,
+    ):
+        main.main()
+    assert exit_info.value.code == "1 of 2 jobs failed"
+    results = [json.loads(line) for line in results_path.read_text().splitlines()]
+    assert len(results) == 2
+    assert "[2/2]" in err.getvalue()
+    assert "failed (ValueError: job has no cache_size)" in err.getvalue()
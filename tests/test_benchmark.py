@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import re
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.benchmark import BenchmarkResult
+
+
+def run_main(*args):
+    out = io.StringIO()
+    with (
+        patch("sys.argv", [main.__file__, "benchmark", *args]),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    return out.getvalue()
+
+
+def test_benchmark_result():
+    """should compute throughput and speedup relative to the baseline"""
+    result = BenchmarkResult("name", "workload", 1000, 0.5, baseline_time=1.5)
+    assert result.get_refs_per_sec() == 2000
+    assert result.get_speedup() == 3
+    assert BenchmarkResult("name", "workload", 1000, 0.5).get_speedup() is None
+
+
+def test_main_hit_runs():
+    """should report the speedup of reading runs of hits in bulk"""
+    main_output = run_main("hit-runs", "--num-refs", "500")
+    assert re.search(r"\bBenchmarks\b", main_output)
+    assert re.search(r"\bhit-runs\s+strided\s+500\s+[\d,]+\s+\d+\.\d+x", main_output)
+    assert re.search(r"\bhit-runs\s+zipfian\s+500\s+[\d,]+\s+\d+\.\d+x", main_output)
+
+
+def test_main_unknown_benchmark():
+    """should reject unknown benchmark names"""
+    with pytest.raises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+        run_main("nonexistent")
+
+
+def test_main_compress():
+    """should report the speedup of simulating a compressed trace"""
+    main_output = run_main("compress", "--num-refs", "500")
+    for workload in ("strided", "matmul"):
+        assert re.search(
+            r"\bcompress\s+{}\s+500\s+[\d,]+\s+\d+\.\d+x".format(workload),
+            main_output,
+        )
+
+
+def test_main_associativity():
+    """should report the throughput of caches of increasing associativity"""
+    main_output = run_main("associativity", "--num-refs", "500")
+    for num_blocks_per_set in (1, 4096):
+        assert re.search(
+            r"\bassociativity\s+{}-way\s+500\s+[\d,]+\s+n/a".format(num_blocks_per_set),
+            main_output,
+        )
+        assert re.search(
+            r"\bassociativity-cache\s+{}-way\s+500\s+[\d,]+\s+n/a".format(
+                num_blocks_per_set
+            ),
+            main_output,
+        )
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+import re
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.coherence import (
+    EXCLUSIVE,
+    MODIFIED,
+    SHARED,
+    CoherenceSimulator,
+    read_coherence_trace,
+)
+from cachesimulator.geometry import CacheGeometry
+
+# Two cores reading and writing the same block in turn, then a third core
+# writing another block
+ACCESSES = [
+    (0, 16, False),
+    (1, 16, False),
+    (0, 16, True),
+    (1, 16, False),
+    (1, 16, True),
+    (0, 16, False),
+    (2, 100, True),
+]
+
+
+def get_simulator(protocol="mesi", cache_size=16, num_blocks_per_set=2):
+    return CoherenceSimulator(
+        CacheGeometry(cache_size, num_blocks_per_set, 1), protocol=protocol
+    )
+
+
+def get_block_state(simulator, core, block_addr):
+    blocks = simulator.caches[core][block_addr & (simulator.geometry.num_sets - 1)]
+    return blocks.get(block_addr)
+
+
+def test_mesi_transitions():
+    """should count the bus transactions and invalidations of MESI"""
+    simulator = get_simulator()
+    stats = simulator.read_accesses(ACCESSES)
+    assert stats.num_bus_reads == 4
+    assert stats.num_bus_read_exclusives == 1
+    assert stats.num_bus_upgrades == 2
+    assert stats.num_write_backs == 2
+    assert stats.get_num_bus_transactions() == 9
+    assert [core_stats.num_invalidations for core_stats in stats.core_stats] == [
+        1,
+        1,
+        0,
+    ]
+    assert [core_stats.num_coherence_misses for core_stats in stats.core_stats] == [
+        1,
+        1,
+        0,
+    ]
+    assert get_block_state(simulator, 0, 16) == SHARED
+    assert get_block_state(simulator, 1, 16) == SHARED
+    assert get_block_state(simulator, 2, 100) == MODIFIED
+
+
+def test_mesi_exclusive_write():
+    """should write a block read by only one core without a bus transaction"""
+    simulator = get_simulator()
+    simulator.read_accesses([(0, 5, False)])
+    assert get_block_state(simulator, 0, 5) == EXCLUSIVE
+    stats = simulator.read_accesses([(0, 5, True)])
+    assert stats.get_num_bus_transactions() == 1
+    assert get_block_state(simulator, 0, 5) == MODIFIED
+
+
+def test_msi_shared_write():
+    """should upgrade a block read by only one core under MSI"""
+    simulator = get_simulator(protocol="msi")
+    simulator.read_accesses([(0, 5, False)])
+    assert get_block_state(simulator, 0, 5) == SHARED
+    stats = simulator.read_accesses([(0, 5, True)])
+    assert stats.num_bus_upgrades == 1
+    assert get_block_state(simulator, 0, 5) == MODIFIED
+
+
+def test_replacement_write_back():
+    """should write back modified blocks which are replaced"""
+    simulator = get_simulator(cache_size=2, num_blocks_per_set=1)
+    stats = simulator.read_accesses([(0, 0, True), (0, 2, False), (1, 0, False)])
+    assert stats.num_write_backs == 1
+    assert stats.get_num_invalidations() == 0
+    # The replaced block is no longer held by the core which replaced it
+    assert simulator.sharers == {2: 0b01, 0: 0b10}
+    assert get_block_state(simulator, 1, 0) == EXCLUSIVE
+
+
+def test_stats_accumulate():
+    """should add the statistics of successive calls"""
+    simulator = get_simulator()
+    simulator.read_accesses(ACCESSES[:3])
+    stats = simulator.read_accesses(ACCESSES[3:])
+    assert stats.to_dict() == get_simulator().read_accesses(ACCESSES).to_dict()
+
+
+@pytest.mark.parametrize("protocol", ("msi", "mesi"))
+def test_coherence_invariants(protocol):
+    """should keep every private cache coherent with the directory"""
+    rng = random.Random(0)
+    simulator = get_simulator(protocol=protocol, cache_size=16, num_blocks_per_set=4)
+    accesses = [
+        (rng.randrange(4), rng.randrange(48), rng.random() < 0.3) for _ in range(5000)
+    ]
+    stats = simulator.read_accesses(accesses)
+    holders = {}
+    for core, cache_sets in enumerate(simulator.caches):
+        for blocks in cache_sets:
+            assert len(blocks) <= 4
+            for block_addr, state in blocks.items():
+                holders.setdefault(block_addr, []).append((core, state))
+    assert set(holders) == set(simulator.sharers)
+    for block_addr, block_holders in holders.items():
+        assert simulator.sharers[block_addr] == sum(
+            1 << core for core, _ in block_holders
+        )
+        # A modified or exclusive block is held by no other core
+        if len(block_holders) > 1:
+            assert all(state == SHARED for _, state in block_holders)
+    assert sum(core_stats.get_num_accesses() for core_stats in stats.core_stats) == len(
+        accesses
+    )
+
+
+def test_read_coherence_trace(tmp_path):
+    """should read the core, address, and type of each access"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("# core addr type\n0 0x10 R\n\n3 42 w  # write\n")
+    assert list(read_coherence_trace(trace_path)) == [
+        (0, 16, False),
+        (3, 42, True),
+    ]
+
+
+@pytest.mark.parametrize("line", ("0 16", "0 16 X", "-1 16 R"))
+def test_read_coherence_trace_invalid(tmp_path, line):
+    """should reject malformed accesses"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("0 1 R\n" + line + "\n")
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_coherence_trace(trace_path))
+
+
+def test_main_coherence(tmp_path):
+    """should display and write the statistics of a coherence trace"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text(
+        "".join(
+            "{} {} {}\n".format(core, addr, "W" if is_write else "R")
+            for core, addr, is_write in ACCESSES
+        )
+    )
+    output_path = tmp_path / "stats.json"
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "coherence",
+                str(trace_path),
+                "--cache-size",
+                "16",
+                "--num-blocks-per-set",
+                "2",
+                "--output",
+                str(output_path),
+            ],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert re.search(r"\bTotal\s+9\b", out.getvalue())
+    stats = json.loads(output_path.read_text())
+    assert stats["num_bus_transactions"] == 9
+    assert stats["num_coherence_misses"] == 2
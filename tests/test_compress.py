@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import random
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.benchmark import time_call
+from cachesimulator.cache import Cache
+from cachesimulator.compress import compress_trace, expand_trace, is_compressible
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.simulator import Simulator
+from cachesimulator.tracegen import generate_trace
+
+
+def get_loop_trace(seed):
+    rng = random.Random(seed)
+    word_addrs = []
+    for _ in range(20):
+        body = [rng.randrange(64) for _ in range(rng.randrange(1, 8))]
+        word_addrs.extend(body * rng.randrange(1, 6))
+        word_addrs.extend(rng.randrange(64) for _ in range(rng.randrange(3)))
+    return word_addrs
+
+
+def test_compress_trace_loops():
+    """should compress repeated loop bodies and single addresses"""
+    word_addrs = [5, 1, 2, 3, 1, 2, 3, 1, 2, 3, 7, 7, 7, 7, 9]
+    assert compress_trace(word_addrs) == [
+        ((5,), 1),
+        ((1, 2, 3), 3),
+        ((7,), 4),
+        ((9,), 1),
+    ]
+
+
+def test_compress_trace_longest_loop():
+    """should prefer the loop which covers the most addresses"""
+    word_addrs = [1, 1, 2, 1, 1, 2, 1, 1, 2]
+    assert compress_trace(word_addrs) == [((1, 1, 2), 3)]
+
+
+def test_compress_trace_max_loop_length():
+    """should not detect loops longer than the maximum loop length"""
+    word_addrs = [1, 2, 3, 1, 2, 3]
+    assert compress_trace(word_addrs, max_loop_length=2) == [((1, 2, 3, 1, 2, 3), 1)]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_expand_trace(seed):
+    """expanding a compressed trace should produce the original trace"""
+    word_addrs = get_loop_trace(seed)
+    assert list(expand_trace(compress_trace(word_addrs))) == word_addrs
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru"))
+@pytest.mark.parametrize("num_blocks_per_set", (1, 2, 4))
+@pytest.mark.parametrize("seed", range(5))
+def test_read_compressed_trace(replacement_policy, num_blocks_per_set, seed):
+    """simulating a compressed trace should match simulating the original"""
+    word_addrs = get_loop_trace(seed)
+    geometry = CacheGeometry(
+        cache_size=16,
+        num_blocks_per_set=num_blocks_per_set,
+        num_words_per_block=2,
+        max_word_addr=max(word_addrs),
+    )
+    sim = Simulator()
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    refs = sim.read_compressed_trace(
+        cache, compress_trace(word_addrs), geometry, replacement_policy
+    )
+    expected_refs = sim.get_addr_refs(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    expected_cache = Cache(
+        num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+    )
+    expected_cache.read_refs(num_blocks_per_set, 2, replacement_policy, expected_refs)
+    assert [ref.word_addr for ref in refs] == word_addrs
+    assert [ref.cache_status for ref in refs] == [
+        ref.cache_status for ref in expected_refs
+    ]
+    assert cache == expected_cache
+    assert cache.recently_used_addrs == expected_cache.recently_used_addrs
+
+
+def test_is_compressible():
+    """should only compress traces which are mostly loops"""
+    assert is_compressible(list(generate_trace("strided", 10000, num_words=32)))
+    assert not is_compressible(list(generate_trace("matmul", 10000, size=32)))
+    assert not is_compressible([])
+
+
+def test_simulate_optimal_compress():
+    """should reject compressing a trace simulated with OPT"""
+    word_addrs = ([0, 4, 8, 12, 16] * 20 + [1, 2, 3]) * 3
+    with pytest.raises(ValueError, match="opt replacement policy"):
+        Simulator().simulate(4, 1, 4, "opt", 1, word_addrs, compress=True)
+
+
+def test_compress_faster():
+    """simulating a loop-heavy trace should be faster with compression"""
+    sim_args = dict(
+        num_blocks_per_set=4,
+        num_words_per_block=4,
+        cache_size=256,
+        replacement_policy="lru",
+        num_addr_bits=1,
+        word_addrs=list(generate_trace("strided", 100000, stride=2, num_words=64)),
+    )
+    sim = Simulator()
+    compressed_time = min(
+        time_call(sim.simulate, compress=True, **sim_args) for _ in range(3)
+    )
+    uncompressed_time = min(time_call(sim.simulate, **sim_args) for _ in range(3))
+    assert compressed_time < uncompressed_time / 2
+
+
+def test_main_compress():
+    """--compress should not change the output of the simulation"""
+    args = [
+        "--cache-size",
+        "8",
+        "--num-blocks-per-set",
+        "2",
+        "--num-words-per-block",
+        "2",
+        "--word-addrs",
+        *map(str, [3, 180, 43, 2, 191] * 4 + [88, 190, 14, 181, 44, 186, 253]),
+    ]
+    outputs = []
+    for extra_args in ([], ["--compress"]):
+        out = io.StringIO()
+        with (
+            patch("sys.argv", [main.__file__, *args, *extra_args]),
+            contextlib.redirect_stdout(out),
+        ):
+            main.main()
+        outputs.append(out.getvalue())
+    assert outputs[0] == outputs[1]
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+import cachesimulator.fuzz as fuzz
+from cachesimulator.cache import Cache
+from cachesimulator.fuzz import (
+    ENGINES,
+    FuzzCase,
+    find_divergence,
+    minimize_case,
+    run_fuzz,
+    run_oracle,
+)
+from cachesimulator.reference import ReferenceCacheStatus
+
+
+# An engine which wrongly reports every reference to word address 5 as a hit
+def run_broken_engine(case):
+    statuses = bytearray(run_oracle(case)["statuses"])
+    for position, word_addr in enumerate(case.word_addrs):
+        if word_addr == 5:
+            statuses[position] = ReferenceCacheStatus.hit.value
+    return {"statuses": bytes(statuses)}
+
+
+def get_case(word_addrs, replacement_policy="lru"):
+    return FuzzCase(8, 2, 2, replacement_policy, "word", word_addrs)
+
+
+@pytest.mark.parametrize("engine_name", tuple(ENGINES))
+def test_engines_match_oracle(engine_name):
+    """every engine should match the reference simulator on random cases"""
+    assert [
+        minimized
+        for _, minimized in run_fuzz([engine_name], num_cases=30, max_refs=100)
+        if minimized is not None
+    ] == []
+
+
+def test_compressed_engine_rejects_optimal():
+    """the compressed engine should reject the optimal policy"""
+    case = get_case([0, 4, 8, 12, 16] * 20, replacement_policy="opt")
+    with pytest.raises(ValueError, match="opt replacement policy"):
+        fuzz.run_compressed_engine(case)
+    assert not fuzz.is_supported(case, "compressed")
+
+
+def test_oracle_catches_replacement_regression():
+    """should catch a change to Cache.replace_block, which the oracle lacks"""
+
+    # Always replaces the first block of a set, whatever the policy
+    def replace_first_block(self, blocks, replacement_policy, addr_index, new_entry):
+        blocks[0] = new_entry
+
+    with patch.object(Cache, "replace_block", replace_first_block):
+        case = get_case([0, 4, 0, 8, 4, 12])
+        assert find_divergence(case, "ref") is not None
+        assert find_divergence(case, "refs") is not None
+
+
+@pytest.mark.parametrize("replacement_policy", fuzz.REPLACEMENT_POLICIES)
+def test_oracle_policies(replacement_policy):
+    """the oracle should replace the expected block under each policy"""
+    # Words 0, 4, 8, and 12 are in different blocks of the same set of two
+    result = run_oracle(get_case([0, 4, 0, 8, 4, 12], replacement_policy))
+    statuses = [ReferenceCacheStatus(status) for status in result["statuses"]]
+    assert [str(status) for status in statuses] == {
+        "lru": ["miss", "miss", "HIT", "miss", "miss", "miss"],
+        "mru": ["miss", "miss", "HIT", "miss", "HIT", "miss"],
+        "opt": ["miss", "miss", "HIT", "miss", "HIT", "miss"],
+    }[replacement_policy]
+
+
+def test_generate_case():
+    """should generate caches whose sets are a power of two"""
+    rng = random.Random(0)
+    for _ in range(100):
+        case = FuzzCase.generate(rng, 50)
+        geometry = case.get_geometry()
+        assert 1 <= len(case.word_addrs) <= 50
+        assert geometry.num_sets == 2**geometry.num_index_bits
+        assert geometry.num_tag_bits >= 0
+
+
+def test_find_divergence():
+    """should describe the first reference whose status differs"""
+    with patch.dict(ENGINES, broken=(run_broken_engine, ("lru",))):
+        assert find_divergence(get_case([1, 2, 3]), "broken") is None
+        assert find_divergence(get_case([1, 5, 2, 5]), "broken") == (
+            "reference 1 (address 5) was a HIT, but the oracle's was a miss"
+        )
+
+
+def test_find_divergence_error():
+    """should report an engine which raises an error as diverging"""
+
+    def run_failing_engine(case):
+        raise RuntimeError("engine failed")
+
+    with patch.dict(ENGINES, failing=(run_failing_engine, ("lru",))):
+        assert find_divergence(get_case([1]), "failing") == (
+            "raised RuntimeError: engine failed"
+        )
+
+
+def test_minimize_case():
+    """should remove every reference not needed for the divergence"""
+    rng = random.Random(0)
+    word_addrs = [rng.randrange(32) for _ in range(200)] + [5]
+    case = get_case(word_addrs)
+    with patch.dict(ENGINES, broken=(run_broken_engine, ("lru",))):
+        divergence = find_divergence(case, "broken")
+        minimized_case, minimized_divergence = minimize_case(case, "broken", divergence)
+    assert minimized_case.word_addrs == [5]
+    assert minimized_case.cache_size == case.cache_size
+    assert minimized_divergence.startswith("reference 0 (address 5)")
+
+
+def test_main_fuzz(tmp_path):
+    """should display the number of cases compared by each engine"""
+    output_path = tmp_path / "divergences.json"
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "fuzz",
+                "--engine",
+                "batch",
+                "--num-cases",
+                "10",
+                "--output",
+                str(output_path),
+            ],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert "batch" in out.getvalue()
+    assert json.loads(output_path.read_text()) == []
+
+
+def test_main_fuzz_divergence(tmp_path):
+    """should write each minimized divergence and exit with an error"""
+    output_path = tmp_path / "divergences.json"
+    with (
+        patch.dict(ENGINES, broken=(run_broken_engine, fuzz.REPLACEMENT_POLICIES)),
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "fuzz",
+                "--engine",
+                "broken",
+                "--num-cases",
+                "20",
+                "--output",
+                str(output_path),
+            ],
+        ),
+        contextlib.redirect_stdout(io.StringIO()),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
+    divergences = json.loads(output_path.read_text())
+    assert divergences
+    assert all(divergence["case"]["word_addrs"] == [5] for divergence in divergences)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+import re
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+import cachesimulator.incremental as incremental
+from cachesimulator.batch import JOB_PARAMS, simulate_job
+from cachesimulator.incremental import IncrementalSimulation, get_default_state_path
+
+SIM_ARGS = {
+    "cache_size": 64,
+    "num_blocks_per_set": 4,
+    "num_words_per_block": 2,
+    "word_size": 4,
+    "addr_unit": "word",
+    "replacement_policy": "lru",
+}
+
+
+def get_random_trace(num_refs, num_words=512, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(num_words) for _ in range(num_refs)]
+
+
+def append_trace(trace_path, word_addrs):
+    with open(trace_path, "a") as trace_file:
+        trace_file.write("".join("{}\n".format(addr) for addr in word_addrs))
+
+
+def get_expected_stats(word_addrs, sim_args=SIM_ARGS):
+    return simulate_job(word_addrs, dict(JOB_PARAMS, **sim_args))
+
+
+def update(trace_path, sim_args=SIM_ARGS):
+    simulation = IncrementalSimulation(trace_path, sim_args)
+    simulation.load_state()
+    num_new_refs = simulation.update()
+    return simulation.stats, num_new_refs
+
+
+@pytest.mark.parametrize(
+    ("num_blocks_per_set", "replacement_policy"), ((4, "lru"), (4, "mru"), (64, "lru"))
+)
+def test_update_appended(tmp_path, num_blocks_per_set, replacement_policy):
+    """should only read what has been appended, as if read all at once"""
+    sim_args = dict(
+        SIM_ARGS,
+        cache_size=128,
+        num_blocks_per_set=num_blocks_per_set,
+        replacement_policy=replacement_policy,
+    )
+    word_addrs = get_random_trace(3000)
+    trace_path = tmp_path / "trace.txt"
+    for start, end in ((0, 1000), (1000, 1001), (1001, 1001), (1001, 3000)):
+        append_trace(trace_path, word_addrs[start:end])
+        stats, num_new_refs = update(trace_path, sim_args)
+        assert num_new_refs == end - start
+        assert stats.to_dict() == get_expected_stats(word_addrs[:end], sim_args)
+
+
+def test_update_chunks(tmp_path):
+    """should read a long tail in chunks"""
+    word_addrs = get_random_trace(1000)
+    trace_path = tmp_path / "trace.txt"
+    append_trace(trace_path, word_addrs)
+    with patch.object(incremental, "READ_CHUNK_SIZE", 64):
+        stats, _ = update(trace_path)
+    assert stats.to_dict() == get_expected_stats(word_addrs)
+
+
+def test_update_partial_line(tmp_path):
+    """should leave a final line without a newline for a later update"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("1\n2 # comment\n0x3")
+    _, num_new_refs = update(trace_path)
+    assert num_new_refs == 2
+    with open(trace_path, "a") as trace_file:
+        trace_file.write("0\n")
+    stats, num_new_refs = update(trace_path)
+    assert num_new_refs == 1
+    assert stats.to_dict() == get_expected_stats([1, 2, 0x30])
+
+
+def test_update_rewritten(tmp_path):
+    """should simulate a trace from the start once it has been rewritten"""
+    trace_path = tmp_path / "trace.txt"
+    append_trace(trace_path, get_random_trace(500))
+    update(trace_path)
+    word_addrs = get_random_trace(600, seed=1)
+    trace_path.write_text("")
+    append_trace(trace_path, word_addrs)
+    stats, num_new_refs = update(trace_path)
+    assert num_new_refs == 600
+    assert stats.to_dict() == get_expected_stats(word_addrs)
+
+
+def test_update_changed_params(tmp_path):
+    """should not resume a state saved with different cache parameters"""
+    trace_path = tmp_path / "trace.txt"
+    append_trace(trace_path, get_random_trace(500))
+    update(trace_path)
+    assert not IncrementalSimulation(
+        trace_path, dict(SIM_ARGS, cache_size=128)
+    ).load_state()
+    assert IncrementalSimulation(trace_path, SIM_ARGS).load_state()
+
+
+def test_main_update(tmp_path):
+    """should display and write the updated statistics of a trace"""
+    word_addrs = get_random_trace(300)
+    trace_path = tmp_path / "trace.txt"
+    append_trace(trace_path, word_addrs[:200])
+    output_path = tmp_path / "stats.json"
+    argv = [
+        main.__file__,
+        "update",
+        str(trace_path),
+        "--cache-size",
+        "64",
+        "--num-blocks-per-set",
+        "4",
+        "--num-words-per-block",
+        "2",
+        "--output",
+        str(output_path),
+    ]
+    with patch("sys.argv", argv), contextlib.redirect_stdout(io.StringIO()):
+        main.main()
+    assert get_default_state_path(trace_path).exists()
+    append_trace(trace_path, word_addrs[200:])
+    out = io.StringIO()
+    with patch("sys.argv", argv), contextlib.redirect_stdout(out):
+        main.main()
+    assert re.search(r"\b300\s+100\b", out.getvalue())
+    stats = json.loads(output_path.read_text())
+    assert stats == dict(get_expected_stats(word_addrs), num_new_refs=100)
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+
+import importlib.util
+import random
+from pathlib import Path
+
+import pytest
+
+import cachesimulator.kernel as kernel
+from cachesimulator.cache import Cache
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.reference import ReferenceBatch
+from cachesimulator.simulator import Simulator
+
+
+# Imports the pure-Python source of the kernel, even if a compiled kernel is
+# installed in its place
+def import_python_kernel():
+    spec = importlib.util.spec_from_file_location(
+        "python_kernel", Path(kernel.__file__).with_suffix(".py")
+    )
+    python_kernel = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(python_kernel)
+    return python_kernel
+
+
+def get_geometry(num_blocks_per_set, num_words_per_block, word_addrs):
+    return CacheGeometry(
+        cache_size=16,
+        num_blocks_per_set=num_blocks_per_set,
+        num_words_per_block=num_words_per_block,
+        max_word_addr=max(word_addrs),
+    )
+
+
+def get_batch(geometry, word_addrs):
+    return ReferenceBatch(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+
+
+# The parameters of every cache configuration to check for parity: the
+# replacement policy, number of blocks per set, number of words per block, and
+# random seed of the trace
+PARITY_PARAMS = [
+    (replacement_policy, num_blocks_per_set, num_words_per_block, seed)
+    for replacement_policy in ("lru", "mru")
+    for num_blocks_per_set in (1, 2, 4, 8)
+    for num_words_per_block in (1, 2)
+    for seed in range(3)
+]
+
+
+@pytest.mark.parametrize(
+    ("replacement_policy", "num_blocks_per_set", "num_words_per_block", "seed"),
+    PARITY_PARAMS,
+)
+def test_kernel_parity(
+    replacement_policy, num_blocks_per_set, num_words_per_block, seed
+):
+    """reading a batch with the kernel should match reading each reference"""
+    rng = random.Random(seed)
+    word_addrs = [rng.randrange(64) for _ in range(200)]
+    geometry = get_geometry(num_blocks_per_set, num_words_per_block, word_addrs)
+    batch = get_batch(geometry, word_addrs)
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    cache.read_refs(num_blocks_per_set, num_words_per_block, replacement_policy, batch)
+    refs = Simulator().get_addr_refs(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    expected_cache = Cache(
+        num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+    )
+    for ref in refs:
+        expected_cache.read_ref(
+            num_blocks_per_set, num_words_per_block, replacement_policy, ref
+        )
+    assert [ref.cache_status for ref in batch] == [ref.cache_status for ref in refs]
+    assert cache == expected_cache
+    assert cache.recently_used_addrs == expected_cache.recently_used_addrs
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru"))
+def test_kernel_hashed_sets(replacement_policy):
+    """sets too large to scan should be read as if they were scanned"""
+    rng = random.Random(3)
+    word_addrs = [rng.randrange(256) for _ in range(1000)]
+    num_blocks_per_set = kernel.MAX_SCANNED_BLOCKS_PER_SET * 2
+    geometry = CacheGeometry(
+        cache_size=num_blocks_per_set * 2,
+        num_blocks_per_set=num_blocks_per_set,
+        num_words_per_block=1,
+        max_word_addr=max(word_addrs),
+    )
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    # Reading the trace in two batches restores the hashed sets in between
+    chunk_batches = [
+        get_batch(geometry, word_addrs[:500]),
+        get_batch(geometry, word_addrs[500:]),
+    ]
+    for chunk_batch in chunk_batches:
+        cache.read_refs(num_blocks_per_set, 1, replacement_policy, chunk_batch)
+    refs = Simulator().get_addr_refs(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    expected_cache = Cache(
+        num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+    )
+    for ref in refs:
+        expected_cache.read_ref(num_blocks_per_set, 1, replacement_policy, ref)
+    assert [
+        ref.cache_status for chunk_batch in chunk_batches for ref in chunk_batch
+    ] == [ref.cache_status for ref in refs]
+    assert cache == expected_cache
+    assert cache.recently_used_addrs == expected_cache.recently_used_addrs
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru"))
+def test_kernel_chunks(replacement_policy):
+    """reading batches into a warm cache should match reading a single batch"""
+    rng = random.Random(1)
+    word_addrs = [rng.randrange(64) for _ in range(300)]
+    geometry = get_geometry(2, 2, word_addrs)
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    chunks = [word_addrs[:100], word_addrs[100:101], word_addrs[101:]]
+    chunk_batches = [get_batch(geometry, chunk) for chunk in chunks]
+    for chunk_batch in chunk_batches:
+        cache.read_refs(2, 2, replacement_policy, chunk_batch)
+    batch = get_batch(geometry, word_addrs)
+    expected_cache = Cache(
+        num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+    )
+    expected_cache.read_refs(2, 2, replacement_policy, batch)
+    assert b"".join(
+        chunk_batch.cache_statuses for chunk_batch in chunk_batches
+    ) == bytes(batch.cache_statuses)
+    assert cache == expected_cache
+    assert cache.recently_used_addrs == expected_cache.recently_used_addrs
+
+
+def test_kernel_unrepresentable_cache():
+    """should fall back to reading each reference if the kernel cannot"""
+    cache = Cache(num_sets=1, num_index_bits=0)
+    # A resident block which was never used can never be replaced
+    cache["0"].append({"tag": "00", "data": [0]})
+    batch = ReferenceBatch(
+        [1, 2], num_addr_bits=2, num_offset_bits=0, num_index_bits=0, num_tag_bits=2
+    )
+    cache.read_refs(1, 1, "lru", batch)
+    assert cache["0"] == [{"tag": "00", "data": [0]}]
+    assert cache.recently_used_addrs == [(None, "01"), (None, "10")]
+
+
+@pytest.mark.parametrize("evict_mru", (False, True))
+def test_compiled_kernel_parity(evict_mru):
+    """the installed (possibly compiled) kernel should match the Python kernel"""
+    rng = random.Random(2)
+    addrs = [rng.randrange(1 << 12) for _ in range(2000)]
+    kernels = [
+        kernel_module.CacheKernel(
+            num_index_bits=3,
+            num_offset_bits=1,
+            num_blocks_per_set=4,
+            evict_mru=evict_mru,
+        )
+        for kernel_module in (kernel, import_python_kernel())
+    ]
+    all_statuses = [bytearray(len(addrs)) for _ in kernels]
+    all_num_hits = [
+        cache_kernel.read_addrs(addrs, 2, statuses)
+        for cache_kernel, statuses in zip(kernels, all_statuses)
+    ]
+    assert all_num_hits[0] == all_num_hits[1] == all_statuses[0].count(1)
+    assert all_statuses[0] == all_statuses[1]
+    assert kernels[0].slots == kernels[1].slots
+    assert (
+        kernels[0].get_recently_used_blocks() == kernels[1].get_recently_used_blocks()
+    )
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru", "opt"))
+def test_kernel_bounded_state(replacement_policy):
+    """the kernel should only track the recency of resident blocks"""
+    geometry = CacheGeometry(cache_size=16, num_blocks_per_set=4, num_words_per_block=1)
+    if replacement_policy == "opt":
+        cache_kernel = kernel.OptimalCacheKernel(2, 0, 4)
+    else:
+        cache_kernel = kernel.CacheKernel(
+            2, 0, 4, evict_mru=replacement_policy == "mru"
+        )
+    addrs = list(range(1000))
+    cache_kernel.read_addrs(addrs, 0, bytearray(len(addrs)))
+    assert len(cache_kernel.last_used) == geometry.num_sets * 4
+    assert sorted(cache_kernel.get_recently_used_blocks()) == sorted(
+        block_addr for slots in cache_kernel.slots for block_addr in slots
+    )
+
+
+def test_kernel_kept_between_batches():
+    """should keep the kernel between batches rather than recreating it"""
+    geometry = get_geometry(2, 1, [1000])
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    cache.read_refs(2, 1, "lru", get_batch(geometry, range(1000)))
+    cache_kernel = cache.kernel
+    cache.read_refs(2, 1, "lru", get_batch(geometry, [3, 999]))
+    assert cache.kernel is cache_kernel
+    assert len(cache.recently_used_addrs) == 16
+    assert cache.recently_used_addrs[-2:] == [
+        ("011", "0000000"),
+        ("111", "1111100"),
+    ]
+
+
+def test_kernel_released():
+    """reading references after a batch should continue from the batch"""
+    rng = random.Random(4)
+    word_addrs = [rng.randrange(64) for _ in range(300)]
+    geometry = get_geometry(4, 1, word_addrs)
+    refs = Simulator().get_addr_refs(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    cache.read_refs(4, 1, "lru", get_batch(geometry, word_addrs[:100]))
+    cache.read_refs(4, 1, "lru", refs[100:200])
+    cache.read_refs(4, 1, "lru", get_batch(geometry, word_addrs[200:]))
+    expected_cache = Cache(
+        num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+    )
+    expected_cache.read_refs(4, 1, "lru", refs)
+    assert cache == expected_cache
+    assert cache.recently_used_addrs == expected_cache.recently_used_addrs
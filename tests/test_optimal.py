@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.batch import JOB_PARAMS, simulate_job
+from cachesimulator.cache import Cache
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.kernel import NO_NEXT_USE, OptimalCacheKernel, get_next_uses
+from cachesimulator.optimal import iter_next_use_chunks
+from cachesimulator.reference import ReferenceBatch, ReferenceCacheStatus
+from cachesimulator.session import CacheSession
+from cachesimulator.simulator import Simulator
+from cachesimulator.sweep import get_configs, run_config, share_trace
+
+
+def get_random_trace(num_refs, num_words=64, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(num_words) for _ in range(num_refs)]
+
+
+# Counts the hits of Belady's optimal policy by searching the rest of the
+# trace for the next use of every resident block on each replacement
+def get_expected_num_hits(block_addrs, num_sets, num_blocks_per_set):
+    sets = [[] for _ in range(num_sets)]
+    num_hits = 0
+    for position, block_addr in enumerate(block_addrs):
+        blocks = sets[block_addr % num_sets]
+        if block_addr in blocks:
+            num_hits += 1
+            continue
+        if len(blocks) == num_blocks_per_set:
+            future = block_addrs[position + 1 :]
+            blocks.remove(
+                max(
+                    blocks,
+                    key=lambda block: (
+                        future.index(block) if block in future else len(future)
+                    ),
+                )
+            )
+        blocks.append(block_addr)
+    return num_hits
+
+
+def test_get_next_uses():
+    """should find the next use of the block of each address"""
+    next_seen = {}
+    next_uses = get_next_uses([4, 5, 2, 4, 6], 1, 10, next_seen)
+    assert list(next_uses) == [11, 13, NO_NEXT_USE, NO_NEXT_USE, NO_NEXT_USE]
+    assert next_seen == {2: 10, 1: 12, 3: 14}
+
+
+@pytest.mark.parametrize(
+    ("num_index_bits", "num_blocks_per_set"), ((0, 1), (0, 4), (2, 2), (1, 8))
+)
+def test_optimal_kernel(num_index_bits, num_blocks_per_set):
+    """should hit as often as Belady's optimal policy"""
+    word_addrs = get_random_trace(1000, num_words=32, seed=num_blocks_per_set)
+    kernel = OptimalCacheKernel(num_index_bits, 0, num_blocks_per_set)
+    statuses = bytearray(len(word_addrs))
+    num_hits = kernel.read_addrs(word_addrs, 0, statuses)
+    assert num_hits == statuses.count(1)
+    assert num_hits == get_expected_num_hits(
+        word_addrs, 2**num_index_bits, num_blocks_per_set
+    )
+
+
+def test_optimal_kernel_chunks():
+    """should read chunks with given next uses as if read all at once"""
+    word_addrs = get_random_trace(5000, num_words=256)
+    kernel = OptimalCacheKernel(2, 1, 4)
+    statuses = bytearray(len(word_addrs))
+    kernel.read_addrs(word_addrs, 0, statuses)
+    chunk_kernel = OptimalCacheKernel(2, 1, 4)
+    chunk_statuses = bytearray()
+    for chunk, next_uses in iter_next_use_chunks(word_addrs, 1, chunk_size=700):
+        chunk_statuses.extend(bytes(len(chunk)))
+        chunk_kernel.read_addrs(
+            chunk,
+            0,
+            chunk_statuses,
+            start=len(chunk_statuses) - len(chunk),
+            next_uses=next_uses,
+        )
+    assert chunk_statuses == statuses
+    assert chunk_kernel.slots == kernel.slots
+
+
+@pytest.mark.parametrize("as_sequence", (False, True))
+def test_iter_next_use_chunks(as_sequence):
+    """should compute the next uses of a trace one chunk at a time"""
+    word_addrs = get_random_trace(1000)
+    chunks = list(
+        iter_next_use_chunks(
+            word_addrs if as_sequence else iter(word_addrs), 2, chunk_size=64
+        )
+    )
+    assert [addr for chunk, _ in chunks for addr in chunk] == word_addrs
+    assert [next_use for _, next_uses in chunks for next_use in next_uses] == list(
+        get_next_uses(word_addrs, 2, 0, {})
+    )
+
+
+def test_optimal_cache_parity():
+    """reading a batch with OPT should match reading each reference"""
+    word_addrs = get_random_trace(300)
+    geometry = CacheGeometry(
+        cache_size=16,
+        num_blocks_per_set=4,
+        num_words_per_block=2,
+        max_word_addr=max(word_addrs),
+    )
+    batch = ReferenceBatch(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    cache = Cache(num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits)
+    cache.read_refs(4, 2, "opt", batch)
+    refs = Simulator().get_addr_refs(
+        word_addrs,
+        geometry.num_addr_bits,
+        geometry.num_offset_bits,
+        geometry.num_index_bits,
+        geometry.num_tag_bits,
+    )
+    expected_cache = Cache(
+        num_sets=geometry.num_sets, num_index_bits=geometry.num_index_bits
+    )
+    expected_cache.read_refs(4, 2, "opt", refs)
+    assert [ref.cache_status for ref in batch] == [ref.cache_status for ref in refs]
+    assert cache == expected_cache
+    assert cache.recently_used_addrs == expected_cache.recently_used_addrs
+
+
+def test_optimal_beats_lru():
+    """OPT should never hit less often than LRU or MRU"""
+    word_addrs = get_random_trace(2000)
+    num_hits = {}
+    for replacement_policy in ("lru", "mru", "opt"):
+        refs, _ = Simulator().simulate(
+            num_blocks_per_set=4,
+            num_words_per_block=1,
+            cache_size=16,
+            replacement_policy=replacement_policy,
+            num_addr_bits=6,
+            word_addrs=word_addrs,
+        )
+        num_hits[replacement_policy] = sum(
+            ref.cache_status == ReferenceCacheStatus.hit for ref in refs
+        )
+    assert num_hits["opt"] >= max(num_hits["lru"], num_hits["mru"])
+
+
+def test_optimal_sweep():
+    """should sweep OPT configurations from a trace in shared memory"""
+    word_addrs = get_random_trace(3000, num_words=512)
+    (config,) = get_configs([64], [4], [2], ["opt"])
+    shared_trace, num_addrs = share_trace(word_addrs)
+    try:
+        stats = run_config(shared_trace.name, num_addrs, config)
+    finally:
+        shared_trace.close()
+        shared_trace.unlink()
+    assert stats == simulate_job(
+        word_addrs, dict(JOB_PARAMS, num_addr_bits=1, **config)
+    )
+
+
+def test_optimal_session():
+    """sessions should reject OPT, which needs the whole trace in advance"""
+    with pytest.raises(ValueError):
+        CacheSession(cache_size=8, replacement_policy="opt")
+
+
+def test_main_optimal_jsonl(tmp_path):
+    """should stream the results of OPT as JSON Lines"""
+    word_addrs = get_random_trace(500)
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("\n".join(map(str, word_addrs)))
+    stats_path = tmp_path / "stats.json"
+    with patch(
+        "sys.argv",
+        [
+            main.__file__,
+            "--trace-file",
+            str(trace_path),
+            "--cache-size",
+            "16",
+            "--num-blocks-per-set",
+            "4",
+            "--replacement-policy",
+            "OPT",
+            "--output-format",
+            "jsonl",
+            "--output",
+            str(tmp_path / "results.jsonl"),
+            "--stats-output",
+            str(stats_path),
+        ],
+    ):
+        main.main()
+    refs, _ = Simulator().simulate(
+        num_blocks_per_set=4,
+        num_words_per_block=1,
+        cache_size=16,
+        replacement_policy="opt",
+        num_addr_bits=6,
+        word_addrs=word_addrs,
+    )
+    stats = json.loads(stats_path.read_text())
+    assert stats["num_hits"] == sum(
+        ref.cache_status == ReferenceCacheStatus.hit for ref in refs
+    )
+
+
+def test_main_optimal_compress():
+    """should reject compressing a trace simulated with OPT"""
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "--cache-size",
+                "8",
+                "--replacement-policy",
+                "opt",
+                "--compress",
+                "--word-addrs",
+                "1",
+            ],
+        ),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
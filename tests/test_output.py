@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import contextlib
+import csv
+import io
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.kernel import CacheKernel
+from cachesimulator.output import (
+    read_npy_statuses,
+    stream_results,
+    write_simulation_results,
+)
+from cachesimulator.reference import ReferenceCacheStatus
+from cachesimulator.simulator import Simulator
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+SIM_ARGS = dict(
+    num_blocks_per_set=3, num_words_per_block=2, cache_size=24, replacement_policy="lru"
+)
+
+
+def get_expected_refs(word_addrs=WORD_ADDRS):
+    refs, _ = Simulator().simulate(num_addr_bits=8, word_addrs=word_addrs, **SIM_ARGS)
+    return refs
+
+
+def get_ref_dict(ref):
+    return {
+        "word_addr": ref.word_addr,
+        "tag": int(ref.tag, 2),
+        "index": int(ref.index, 2),
+        "offset": int(ref.offset, 2),
+        "status": "hit" if ref.cache_status == ReferenceCacheStatus.hit else "miss",
+    }
+
+
+def test_jsonl_output():
+    """should write each reference as a line of JSON"""
+    results_file = io.StringIO()
+    stats_file = io.StringIO()
+    write_simulation_results(
+        word_addrs=WORD_ADDRS,
+        output_format="jsonl",
+        results_file=results_file,
+        stats_file=stats_file,
+        **SIM_ARGS,
+    )
+    ref_dicts = [json.loads(line) for line in results_file.getvalue().splitlines()]
+    assert ref_dicts == [get_ref_dict(ref) for ref in get_expected_refs()]
+    stats = json.loads(stats_file.getvalue())
+    assert stats["num_hits"] == 3
+    assert stats["num_misses"] == 9
+
+
+def test_csv_output():
+    """should write each reference as a row of CSV"""
+    results_file = io.StringIO()
+    stats_file = io.StringIO()
+    write_simulation_results(
+        word_addrs=iter(WORD_ADDRS),
+        output_format="csv",
+        results_file=results_file,
+        stats_file=stats_file,
+        **SIM_ARGS,
+    )
+    rows = list(csv.DictReader(io.StringIO(results_file.getvalue())))
+    assert rows == [
+        {name: str(value) for name, value in get_ref_dict(ref).items()}
+        for ref in get_expected_refs()
+    ]
+    (stats,) = csv.DictReader(io.StringIO(stats_file.getvalue()))
+    assert stats["num_refs"] == "12"
+    assert stats["num_hits"] == "3"
+
+
+def test_csv_output_no_index():
+    """should leave out components of references which have no bits"""
+    results_file = io.StringIO()
+    write_simulation_results(
+        num_blocks_per_set=4,
+        num_words_per_block=1,
+        cache_size=4,
+        replacement_policy="lru",
+        word_addrs=[5],
+        output_format="csv",
+        results_file=results_file,
+    )
+    assert results_file.getvalue().splitlines()[1] == "5,5,,,miss"
+
+
+@pytest.mark.parametrize("word_addrs", (WORD_ADDRS, iter(WORD_ADDRS)))
+def test_binary_output(word_addrs):
+    """should write the status of each reference as a .npy array"""
+    results_file = io.BytesIO()
+    write_simulation_results(
+        word_addrs=word_addrs,
+        output_format="binary",
+        results_file=results_file,
+        **SIM_ARGS,
+    )
+    assert len(results_file.getvalue()) == 128 + len(WORD_ADDRS)
+    results_file.seek(0)
+    statuses = read_npy_statuses(results_file)
+    assert list(statuses) == [ref.cache_status.value for ref in get_expected_refs()]
+
+
+def test_byte_addr_output():
+    """should write the word address of each byte address"""
+    results_file = io.StringIO()
+    write_simulation_results(
+        word_addrs=[addr * 4 + 1 for addr in WORD_ADDRS],
+        output_format="jsonl",
+        results_file=results_file,
+        addr_unit="byte",
+        **SIM_ARGS,
+    )
+    ref_dicts = [json.loads(line) for line in results_file.getvalue().splitlines()]
+    assert ref_dicts == [get_ref_dict(ref) for ref in get_expected_refs()]
+
+
+def test_stream_results_incrementally():
+    """should write results for each chunk before reading the next"""
+    rng = random.Random(0)
+    word_addrs = [rng.randrange(256) for _ in range(25)]
+    num_addrs_read = 0
+
+    def read_addrs():
+        nonlocal num_addrs_read
+        for addr in word_addrs:
+            num_addrs_read += 1
+            yield addr
+
+    class RecordingWriter(object):
+        def __init__(self):
+            self.chunks = []
+
+        def write_chunk(self, chunk_addrs, statuses):
+            self.chunks.append((num_addrs_read, list(chunk_addrs), list(statuses)))
+
+        def close(self):
+            pass
+
+    results_writer = RecordingWriter()
+    geometry = CacheGeometry(24, 3, 2)
+    with patch("cachesimulator.output.WRITE_CHUNK_SIZE", 10):
+        stats = stream_results(read_addrs(), geometry, "lru", results_writer)
+    assert [chunk[0] for chunk in results_writer.chunks] == [10, 20, 25]
+    assert [addr for chunk in results_writer.chunks for addr in chunk[1]] == word_addrs
+    assert [status for chunk in results_writer.chunks for status in chunk[2]] == [
+        ref.cache_status.value for ref in get_expected_refs(word_addrs)
+    ]
+    assert stats.get_num_refs() == 25
+
+
+def test_stream_results_bounded_state():
+    """should keep no state for blocks which are no longer resident"""
+    kernels = []
+
+    class RecordingKernel(CacheKernel):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            kernels.append(self)
+
+    class NullWriter(object):
+        def write_chunk(self, chunk_addrs, statuses):
+            pass
+
+        def close(self):
+            pass
+
+    geometry = CacheGeometry(24, 3, 2)
+    with (
+        patch("cachesimulator.output.CacheKernel", RecordingKernel),
+        patch("cachesimulator.output.WRITE_CHUNK_SIZE", 100),
+    ):
+        stream_results(range(0, 20000, 2), geometry, "lru", NullWriter())
+    (kernel,) = kernels
+    num_blocks = geometry.num_sets * geometry.num_blocks_per_set
+    assert len(kernel.last_used) == num_blocks
+    assert sum(len(recency) for recency in kernel.recency) == num_blocks
+
+
+def test_main_output_format(tmp_path):
+    """--output-format should write results and statistics to files"""
+    results_path = tmp_path / "results.npy"
+    stats_path = tmp_path / "stats.json"
+    args = ["--cache-size", "24", "--num-blocks-per-set", "3"]
+    args += ["--num-words-per-block", "2", "--output-format", "binary"]
+    args += ["--output", str(results_path), "--stats-output", str(stats_path)]
+    with patch(
+        "sys.argv",
+        [main.__file__, *args, "--word-addrs", *map(str, WORD_ADDRS)],
+    ):
+        main.main()
+    with results_path.open("rb") as results_file:
+        assert read_npy_statuses(results_file).count(1) == 3
+    assert json.loads(stats_path.read_text())["num_hits"] == 3
+
+
+def test_main_output_requires_format():
+    """--output should require a machine-readable --output-format"""
+    with (
+        patch(
+            "sys.argv",
+            [main.__file__, "--cache-size", "8", "--output", "x", "--word-addrs", "1"],
+        ),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import os
+from unittest.mock import patch
+
+import cachesimulator.__main__ as main
+from cachesimulator.batch import get_job_sim_args, run_jobs
+from cachesimulator.resultcache import ResultCache
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+
+
+def write_trace(tmp_path, word_addrs=WORD_ADDRS, name="trace.txt"):
+    trace_path = tmp_path / name
+    trace_path.write_text("\n".join(map(str, word_addrs)))
+    return str(trace_path)
+
+
+def test_result_cache_keys(tmp_path):
+    """keys should depend on the trace contents and simulation parameters"""
+    result_cache = ResultCache(tmp_path / "cache")
+    sim_args = get_job_sim_args({"trace_file": "", "cache_size": 8})
+    trace_path = write_trace(tmp_path)
+    key = result_cache.get_key(trace_path, sim_args)
+    copy_path = write_trace(tmp_path, name="copy.txt")
+    assert result_cache.get_key(copy_path, sim_args) == key
+    other_path = write_trace(tmp_path, WORD_ADDRS[::-1], name="other.txt")
+    assert result_cache.get_key(other_path, sim_args) != key
+    assert result_cache.get_key(trace_path, dict(sim_args, cache_size=16)) != key
+
+
+def test_result_cache_get_put(tmp_path):
+    """should retrieve stored results and nothing else"""
+    result_cache = ResultCache(tmp_path / "cache")
+    assert result_cache.get("abc") is None
+    result_cache.put("abc", {"num_hits": 3})
+    assert result_cache.get("abc") == {"num_hits": 3}
+    assert list((tmp_path / "cache").iterdir()) == [tmp_path / "cache" / "abc.json"]
+
+
+def test_result_cache_eviction(tmp_path):
+    """should evict the least-recently used results once over its size"""
+    result_cache = ResultCache(tmp_path / "cache", max_size=25)
+    # Each result is 10 bytes, so only two fit in the cache
+    result_cache.put("a", {"n": 100})
+    result_cache.put("b", {"n": 200})
+    os.utime(result_cache.get_result_path("a"), ns=(1, 1))
+    os.utime(result_cache.get_result_path("b"), ns=(2, 2))
+    # Using a result should make it the most recently used
+    assert result_cache.get("a") == {"n": 100}
+    result_cache.put("c", {"n": 300})
+    assert result_cache.get("b") is None
+    assert result_cache.get("a") == {"n": 100}
+    assert result_cache.get("c") == {"n": 300}
+
+
+def test_run_jobs_cached(tmp_path):
+    """should return stored statistics when a job is run again"""
+    result_cache = ResultCache(tmp_path / "cache")
+    jobs = [{"trace_file": write_trace(tmp_path), "cache_size": 8}]
+    (first_result,) = run_jobs(jobs, num_workers=1, result_cache=result_cache)
+    (second_result,) = run_jobs(jobs, num_workers=1, result_cache=result_cache)
+    assert not first_result["cached"]
+    assert second_result["cached"]
+    assert second_result["stats"] == first_result["stats"]
+    (uncached_result,) = run_jobs(jobs, num_workers=1)
+    assert not uncached_result["cached"]
+
+
+def test_main_batch_no_cache(tmp_path):
+    """--no-cache should neither read nor store cached results"""
+    manifest_path = tmp_path / "manifest.jsonl"
+    manifest_path.write_text('{"trace_file": "trace.txt", "cache_size": 8}\n')
+    write_trace(tmp_path)
+    cache_dir = tmp_path / "cache"
+    args = [str(manifest_path), "--output", os.devnull, "--num-workers", "1"]
+    args += ["--cache-dir", str(cache_dir)]
+    for _ in range(2):
+        err = io.StringIO()
+        with (
+            patch("sys.argv", [main.__file__, "batch", *args]),
+            contextlib.redirect_stderr(err),
+        ):
+            main.main()
+    assert "done (cached)" in err.getvalue()
+    cached_result_paths = list(cache_dir.iterdir())
+    err = io.StringIO()
+    with (
+        patch("sys.argv", [main.__file__, "batch", *args, "--no-cache"]),
+        contextlib.redirect_stderr(err),
+    ):
+        main.main()
+    assert "done (cached)" not in err.getvalue()
+    assert list(cache_dir.iterdir()) == cached_result_paths
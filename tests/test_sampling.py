@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import random
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.batch import JOB_PARAMS, simulate_job
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.sampling import SampledStats, simulate_sampled
+from cachesimulator.simulator import Simulator
+from cachesimulator.stats import SimulationStats
+
+GEOMETRY_ARGS = dict(cache_size=1024, num_blocks_per_set=2, num_words_per_block=4)
+
+
+def get_random_trace(num_refs, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(8192) for _ in range(num_refs)]
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru"))
+def test_sampled_sets_exact(replacement_policy):
+    """each sampled set should behave exactly as in a full simulation"""
+    word_addrs = get_random_trace(5000)
+    geometry = CacheGeometry(**GEOMETRY_ARGS)
+    stats = simulate_sampled(
+        word_addrs, geometry, replacement_policy, sample_interval=8, sample_offset=3
+    )
+    refs, _ = Simulator().simulate(
+        replacement_policy=replacement_policy,
+        num_addr_bits=1,
+        word_addrs=word_addrs,
+        **GEOMETRY_ARGS,
+    )
+    sampled_sets = range(3, geometry.num_sets, 8)
+    assert stats.num_refs == len(word_addrs)
+    assert stats.get_num_sampled_sets() == len(sampled_sets)
+    for set_index, num_refs, num_misses in zip(
+        sampled_sets, stats.set_num_refs, stats.set_num_misses
+    ):
+        set_refs = [ref for ref in refs if int(ref.index, 2) == set_index]
+        assert num_refs == len(set_refs)
+        assert num_misses == SimulationStats.from_refs(set_refs).num_misses
+
+
+def test_sample_every_set():
+    """sampling every set should give exact statistics"""
+    word_addrs = get_random_trace(2000)
+    stats = simulate_sampled(word_addrs, CacheGeometry(**GEOMETRY_ARGS), "lru", 1)
+    refs, _ = Simulator().simulate(
+        replacement_policy="lru",
+        num_addr_bits=1,
+        word_addrs=word_addrs,
+        **GEOMETRY_ARGS,
+    )
+    assert stats.get_miss_rate() == SimulationStats.from_refs(refs).get_miss_rate()
+    assert stats.get_miss_rate_error() == 0.0
+
+
+def test_sampled_error_bounds():
+    """the estimated miss rate should fall within its error bound"""
+    word_addrs = get_random_trace(20000, seed=1)
+    stats = simulate_sampled(word_addrs, CacheGeometry(**GEOMETRY_ARGS), "lru", 4)
+    refs, _ = Simulator().simulate(
+        replacement_policy="lru",
+        num_addr_bits=1,
+        word_addrs=word_addrs,
+        **GEOMETRY_ARGS,
+    )
+    miss_rate = SimulationStats.from_refs(refs).get_miss_rate()
+    assert 0 < stats.get_miss_rate_error() < 0.05
+    assert abs(stats.get_miss_rate() - miss_rate) <= stats.get_miss_rate_error()
+    assert stats.get_num_sampled_refs() < len(word_addrs) / 2
+
+
+def test_sampled_error_unknown():
+    """should not estimate an error bound from a single sampled set"""
+    stats = SampledStats(num_refs=10, num_sets=4, set_num_refs=[5], set_num_misses=[2])
+    assert stats.get_miss_rate() == 0.4
+    assert stats.get_miss_rate_error() is None
+    assert stats.get_est_num_misses() == 4
+
+
+def test_invalid_sample_interval():
+    """should reject invalid sample intervals and offsets"""
+    geometry = CacheGeometry(**GEOMETRY_ARGS)
+    with pytest.raises(ValueError):
+        simulate_sampled([1], geometry, "lru", sample_interval=0)
+    with pytest.raises(ValueError):
+        simulate_sampled([1], geometry, "lru", sample_interval=4, sample_offset=4)
+
+
+def test_simulate_job_sampled():
+    """batch jobs should report extrapolated statistics when sampled"""
+    sim_args = dict(JOB_PARAMS, sample_interval=4, **GEOMETRY_ARGS)
+    stats = simulate_job(get_random_trace(2000), sim_args)
+    assert stats["num_sampled_sets"] == 32
+    assert stats["num_sets"] == 128
+    assert "miss_rate_error" in stats
+
+
+def test_main_sample_interval():
+    """--sample-interval should display extrapolated statistics"""
+    args = ["--cache-size", "64", "--sample-interval", "4", "--word-addrs"]
+    out = io.StringIO()
+    with (
+        patch("sys.argv", [main.__file__, *args, *map(str, range(200))]),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert "Sampled Statistics" in out.getvalue()
+    assert "16 of 64" in out.getvalue()
+
+
+def test_main_sample_interval_compress():
+    """--sample-interval should not be combined with --compress"""
+    args = ["--cache-size", "64", "--sample-interval", "4", "--compress"]
+    with (
+        patch("sys.argv", [main.__file__, *args, "--word-addrs", "1"]),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
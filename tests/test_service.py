@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import asyncio
+import json
+
+import pytest
+
+from cachesimulator.service import SimulationService
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+CACHE_ARGS = {"cache_size": 24, "num_blocks_per_set": 3, "num_words_per_block": 2}
+
+
+# Starts a service on a Unix socket, runs the given coroutine function with
+# the path of the socket, and then shuts the service down
+def run_with_service(tmp_path, client, **service_args):
+    socket_path = str(tmp_path / "sim.sock")
+
+    async def run():
+        service = SimulationService(num_workers=2, **service_args)
+        server = await service.start(socket_path=socket_path)
+        try:
+            return await client(socket_path)
+        finally:
+            server.close()
+            await server.wait_closed()
+            service.shutdown()
+
+    return asyncio.run(run())
+
+
+# Sends each of the given requests over a new connection, returning the
+# responses
+async def send_requests(socket_path, requests):
+    reader, writer = await asyncio.open_unix_connection(socket_path)
+    responses = []
+    for request in requests:
+        if isinstance(request, dict):
+            request = json.dumps(request)
+        writer.write(request.encode() + b"\n")
+        await writer.drain()
+        responses.append(json.loads(await reader.readline()))
+    writer.close()
+    return responses
+
+
+def test_simulate(tmp_path):
+    """should simulate an entire trace given in a single request"""
+
+    async def client(socket_path):
+        return await send_requests(
+            socket_path,
+            [{"op": "simulate", "id": 7, "word_addrs": WORD_ADDRS, **CACHE_ARGS}],
+        )
+
+    (response,) = run_with_service(tmp_path, client)
+    assert response["ok"]
+    assert response["id"] == 7
+    assert response["stats"]["num_hits"] == 3
+    assert response["stats"]["num_misses"] == 9
+
+
+def test_simulate_trace_file(tmp_path):
+    """should simulate a trace file given by path"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("\n".join(map(str, WORD_ADDRS)))
+
+    async def client(socket_path):
+        return await send_requests(
+            socket_path,
+            [{"op": "simulate", "trace_file": str(trace_path), **CACHE_ARGS}],
+        )
+
+    (response,) = run_with_service(tmp_path, client)
+    assert response["stats"]["num_hits"] == 3
+
+
+def test_session_chunks(tmp_path):
+    """should keep a session's cache warm across chunks"""
+
+    async def client(socket_path):
+        return await send_requests(
+            socket_path,
+            [
+                {"op": "open", "session": "s", "num_addr_bits": 8, **CACHE_ARGS},
+                {"op": "read", "session": "s", "word_addrs": WORD_ADDRS[:5]},
+                {"op": "read", "session": "s", "word_addrs": WORD_ADDRS[5:]},
+                {"op": "close", "session": "s"},
+                {"op": "read", "session": "s", "word_addrs": [1]},
+            ],
+        )
+
+    responses = run_with_service(tmp_path, client)
+    assert all(response["ok"] for response in responses[:4])
+    assert responses[1]["chunk_stats"]["num_hits"] == 1
+    assert responses[2]["chunk_stats"]["num_hits"] == 2
+    assert responses[2]["stats"]["num_hits"] == 3
+    assert responses[3]["stats"]["num_refs"] == len(WORD_ADDRS)
+    assert not responses[4]["ok"]
+    assert "no such session" in responses[4]["error"]
+
+
+def test_session_closed_on_disconnect(tmp_path):
+    """should close every session left open when its connection ends"""
+    open_request = {"op": "open", "session": "s", **CACHE_ARGS}
+    close_request = {"op": "close", "session": "s"}
+
+    async def client(socket_path):
+        await send_requests(socket_path, [open_request])
+        # The session is closed once the service notices the disconnection
+        for _ in range(100):
+            (response,) = await send_requests(
+                socket_path, [{"op": "read", "session": "s", "word_addrs": [1]}]
+            )
+            if not response["ok"]:
+                break
+            await asyncio.sleep(0.05)
+        # Sessions are opened on each of the two workers in turn, so the name
+        # is reopened on the worker which held the original session as well;
+        # this fails if that worker still holds it
+        return response, await send_requests(
+            socket_path, [open_request, close_request, open_request, close_request]
+        )
+
+    read_response, responses = run_with_service(tmp_path, client)
+    assert "no such session" in read_response["error"]
+    assert all(response["ok"] for response in responses)
+
+
+def test_request_too_large(tmp_path, monkeypatch):
+    """should respond with an error to an oversized request and disconnect"""
+    monkeypatch.setattr("cachesimulator.service.MAX_REQUEST_SIZE", 1024)
+
+    async def client(socket_path):
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        request = {"op": "simulate", "word_addrs": [1] * 1024, **CACHE_ARGS}
+        writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        response = json.loads(await reader.readline())
+        remaining = await reader.read()
+        writer.close()
+        return response, remaining
+
+    response, remaining = run_with_service(tmp_path, client)
+    assert not response["ok"]
+    assert "request exceeds 1024 bytes" in response["error"]
+    assert remaining == b""
+
+
+def test_concurrent_sessions(tmp_path):
+    """should serve many concurrent connections with a bounded job queue"""
+
+    async def run_session(socket_path, session_name):
+        responses = await send_requests(
+            socket_path,
+            [
+                {"op": "open", "session": session_name, **CACHE_ARGS},
+                *(
+                    {"op": "read", "session": session_name, "word_addrs": [addr]}
+                    for addr in WORD_ADDRS
+                ),
+                {"op": "close", "session": session_name},
+            ],
+        )
+        return responses[-1]["stats"]
+
+    async def client(socket_path):
+        return await asyncio.gather(
+            *(run_session(socket_path, "s{}".format(i)) for i in range(8))
+        )
+
+    all_stats = run_with_service(tmp_path, client, max_pending_jobs=2)
+    assert [stats["num_hits"] for stats in all_stats] == [3] * 8
+
+
+@pytest.mark.parametrize(
+    ("request_line", "error"),
+    (
+        ("not json", "invalid JSON"),
+        ("[1, 2]", "must be a JSON object"),
+        ('{"op": "explode"}', "unknown op"),
+        ('{"op": "simulate", "word_addrs": [1]}', "no cache_size"),
+        ('{"op": "simulate", "cache_size": 8}', "no word_addrs"),
+        ('{"op": "open", "cache_size": 8}', "no session"),
+        (
+            '{"op": "open", "session": "s", "cache_size": 8, '
+            '"replacement_policy": "fifo"}',
+            "unknown replacement policy",
+        ),
+    ),
+)
+def test_invalid_requests(tmp_path, request_line, error):
+    """should respond with an error to invalid requests"""
+
+    async def client(socket_path):
+        return await send_requests(socket_path, [request_line, {"op": "ping"}])
+
+    response, ping_response = run_with_service(tmp_path, client)
+    assert not response["ok"]
+    assert error in response["error"]
+    assert ping_response["ok"]
+
+
+def test_simulate_optimal_compress(tmp_path):
+    """should respond with an error to compressing a trace simulated with OPT"""
+
+    async def client(socket_path):
+        return await send_requests(
+            socket_path,
+            [
+                {
+                    "op": "simulate",
+                    "word_addrs": WORD_ADDRS,
+                    "replacement_policy": "opt",
+                    "compress": True,
+                    **CACHE_ARGS,
+                }
+            ],
+        )
+
+    (response,) = run_with_service(tmp_path, client)
+    assert not response["ok"]
+    assert "cannot be combined with the opt replacement policy" in response["error"]
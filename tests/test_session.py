@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from cachesimulator.reference import ReferenceCacheStatus
+from cachesimulator.session import CacheSession
+from cachesimulator.simulator import Simulator
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+
+
+def test_read_chunks():
+    """reading a trace in chunks should match simulating it all at once"""
+    session = CacheSession(
+        cache_size=24, num_blocks_per_set=3, num_words_per_block=2, num_addr_bits=8
+    )
+    first_refs, first_stats = session.read_chunk(WORD_ADDRS[:5])
+    second_refs, second_stats = session.read_chunk(WORD_ADDRS[5:])
+    refs, cache = Simulator().simulate(
+        num_blocks_per_set=3,
+        num_words_per_block=2,
+        cache_size=24,
+        replacement_policy="lru",
+        num_addr_bits=8,
+        word_addrs=WORD_ADDRS,
+    )
+    assert [ref.cache_status for ref in (*first_refs, *second_refs)] == [
+        ref.cache_status for ref in refs
+    ]
+    assert session.cache == cache
+    assert first_stats.num_hits == 1
+    assert second_stats.num_hits == 2
+    assert session.stats.num_hits == 3
+    assert session.stats.num_misses == 9
+
+
+def test_read_chunk_byte_addrs():
+    """should read byte addresses into the cache"""
+    session = CacheSession(cache_size=8, addr_unit="byte", word_size=8)
+    refs, _ = session.read_chunk([0, 7, 8, 2**64 - 1])
+    assert [ref.cache_status for ref in refs] == [
+        ReferenceCacheStatus.miss,
+        ReferenceCacheStatus.hit,
+        ReferenceCacheStatus.miss,
+        ReferenceCacheStatus.miss,
+    ]
+    assert refs[3].word_addr == 2**61 - 1
+
+
+def test_read_chunk_addr_too_large():
+    """should reject addresses which do not fit in the address bits"""
+    session = CacheSession(cache_size=8, num_addr_bits=8)
+    with pytest.raises(ValueError):
+        session.read_chunk([255, 256])
+
+
+def test_read_chunks_bounded_state():
+    """should read each chunk without revisiting the session's history"""
+    session = CacheSession(cache_size=64, num_blocks_per_set=4, num_addr_bits=16)
+    session.read_chunk(range(1000))
+    kernel = session.cache.kernel
+    for start in range(1000, 20000, 1000):
+        session.read_chunk(range(start, start + 1000))
+    # The kernel is kept between chunks, and only tracks resident blocks
+    assert session.cache.kernel is kernel
+    assert len(kernel.last_used) == 64
+    assert len(session.cache.recently_used_addrs) == 64
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.simulator import Simulator
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+
+
+def run_main(*args):
+    out = io.StringIO()
+    with (
+        patch("sys.argv", [main.__file__, *args]),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    return out.getvalue()
+
+
+def get_addr_args(addrs):
+    return ["--word-addrs", *map(str, addrs)]
+
+
+def test_geometry_64_bit():
+    """should allocate exactly 64 bits to the largest 64-bit address"""
+    geometry = CacheGeometry(
+        cache_size=1024,
+        num_blocks_per_set=4,
+        num_words_per_block=16,
+        max_word_addr=2**64 - 1,
+    )
+    assert geometry.num_addr_bits == 64
+    assert geometry.num_offset_bits == 4
+    assert geometry.num_index_bits == 4
+    assert geometry.num_tag_bits == 56
+
+
+def test_geometry_num_addr_bits():
+    """should not shrink the given number of address bits"""
+    geometry = CacheGeometry(
+        cache_size=4, num_blocks_per_set=1, num_words_per_block=1, num_addr_bits=8
+    )
+    assert geometry.num_addr_bits == 8
+    assert geometry.num_tag_bits == 6
+
+
+def test_get_addr_refs_byte_addrs():
+    """should convert byte addresses to word addresses"""
+    refs = Simulator().get_addr_refs(
+        word_addrs=[720, 723, 2**64 - 1],
+        num_addr_bits=62,
+        num_tag_bits=58,
+        num_index_bits=3,
+        num_offset_bits=1,
+        num_byte_offset_bits=2,
+    )
+    assert [ref.word_addr for ref in refs] == [180, 180, 2**62 - 1]
+    assert refs[0].bin_addr == "10110100".zfill(62)
+    assert refs[0].tag == "1011".zfill(58)
+    assert refs[0].index == "010"
+    assert refs[0].offset == "0"
+    assert refs[2].tag == "1" * 58
+
+
+def test_main_byte_addrs():
+    """byte addresses should produce the same results as word addresses"""
+    byte_addrs = [hex(addr * 8 + 5) for addr in WORD_ADDRS]
+    word_output = run_main(
+        "--cache-size", "8", "--num-words-per-block", "2", *get_addr_args(WORD_ADDRS)
+    )
+    byte_output = run_main(
+        "--cache-size",
+        "8",
+        "--num-words-per-block",
+        "2",
+        "--addr-unit",
+        "byte",
+        "--word-size",
+        "8",
+        *get_addr_args(byte_addrs),
+    )
+    assert byte_output == word_output
+
+
+def test_main_block_size():
+    """--block-size should determine the number of words per block"""
+    words_output = run_main(
+        "--cache-size", "8", "--num-words-per-block", "4", *get_addr_args(WORD_ADDRS)
+    )
+    bytes_output = run_main(
+        "--cache-size", "8", "--block-size", "16", *get_addr_args(WORD_ADDRS)
+    )
+    assert bytes_output == words_output
+
+
+@pytest.mark.parametrize(
+    "args",
+    (
+        ("--word-size", "3"),
+        ("--word-size", "0"),
+        ("--block-size", "12"),
+        ("--block-size", "2"),
+    ),
+)
+def test_main_invalid_sizes(args):
+    """should reject word and block sizes which are not powers of two"""
+    with pytest.raises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+        run_main("--cache-size", "8", "--word-addrs", "1", *args)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import pstats
+import re
+import time
+import tracemalloc
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.profiler import Profiler, format_mem_size
+from cachesimulator.simulator import Simulator
+
+SIM_ARGS = [
+    "--cache-size",
+    "4",
+    "--num-blocks-per-set",
+    "1",
+    "--word-addrs",
+    "0",
+    "8",
+    "0",
+    "6",
+    "8",
+]
+
+
+def run_main(*args):
+    out = io.StringIO()
+    with (
+        patch("sys.argv", [main.__file__, *SIM_ARGS, *args]),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    return out.getvalue()
+
+
+def test_profiler_stage():
+    """should record the elapsed time and peak memory of each stage"""
+    profiler = Profiler()
+    profiler.start()
+    with profiler.stage("first", num_refs=100):
+        data = [0] * 10000
+    with profiler.stage("second") as stage:
+        stage.num_refs = len(data)
+    profiler.stop()
+    assert [stage.name for stage in profiler.stages] == ["first", "second"]
+    assert profiler.stages[0].num_refs == 100
+    assert profiler.stages[0].peak_mem >= 10000
+    assert profiler.stages[1].num_refs == 10000
+    assert profiler.stages[0].get_refs_per_sec() > 0
+
+
+def test_profiler_stage_no_refs():
+    """refs per second should be None for stages without references"""
+    profiler = Profiler()
+    profiler.start()
+    with profiler.stage("empty"):
+        pass
+    profiler.stop()
+    assert profiler.stages[0].get_refs_per_sec() is None
+
+
+def test_format_mem_size():
+    """should format memory sizes using the largest appropriate unit"""
+    assert format_mem_size(512) == "512 B"
+    assert format_mem_size(1536) == "1.5 KiB"
+    assert format_mem_size(3 * 1024**2) == "3.0 MiB"
+    assert format_mem_size(5 * 1024**4) == "5120.0 GiB"
+
+
+def test_main_no_profile():
+    """should not display a profile unless profiling is enabled"""
+    assert "Profile" not in run_main()
+
+
+def test_main_profile():
+    """should display a profile of each stage if --profile is given"""
+    main_output = run_main("--profile")
+    assert re.search(r"\bProfile\b", main_output)
+    assert re.search(r"\bStage\s+Time \(s\)\s+Refs/s\s+Peak Mem\b", main_output)
+    for stage_name in ("parse", "refs", "simulate", "display"):
+        assert re.search(r"\b{}\s+\d+\.\d+".format(stage_name), main_output)
+
+
+def test_main_profile_output(tmp_path):
+    """should write cProfile stats to the file given by --profile-output"""
+    stats_path = tmp_path / "sim.pstats"
+    run_main("--profile-output", str(stats_path))
+    stats = pstats.Stats(str(stats_path))
+    assert any(func[2] == "read_refs" for func in stats.stats)
+
+
+def test_main_profile_trace_file(tmp_path):
+    """the parse stage should include reading and decoding the trace file"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("\n".join(map(str, range(1000))))
+    read_times = []
+    read_trace = main.read_trace
+
+    def timed_read_trace(trace_path):
+        for word_addr in read_trace(trace_path):
+            read_times.append(time.perf_counter())
+            yield word_addr
+
+    stages = []
+    record_stage = Profiler.stage
+
+    def timed_stage(profiler, name, num_refs=0):
+        stages.append((name, time.perf_counter()))
+        return record_stage(profiler, name, num_refs=num_refs)
+
+    args = ["--cache-size", "4", "--trace-file", str(trace_path), "--profile"]
+    with (
+        patch("sys.argv", [main.__file__, *args]),
+        patch.object(main, "read_trace", timed_read_trace),
+        patch.object(Profiler, "stage", timed_stage),
+        contextlib.redirect_stdout(io.StringIO()),
+    ):
+        main.main()
+    assert len(read_times) == 1000
+    assert stages[0][0] == "parse"
+    assert stages[0][1] < read_times[0]
+    assert read_times[-1] < stages[1][1]
+
+
+def test_main_profile_overhead():
+    """the profile should report that its times include tracing overhead"""
+    assert "times include tracing overhead" in run_main("--profile")
+
+
+def test_run_simulation_stops_profiler():
+    """profiling should stop even if a stage of the simulation fails"""
+    profiler = Profiler()
+    sim = Simulator()
+    with patch.object(Simulator, "simulate", side_effect=RuntimeError):
+        with pytest.raises(RuntimeError):
+            sim.run_simulation(
+                num_blocks_per_set=1,
+                num_words_per_block=1,
+                cache_size=4,
+                replacement_policy="lru",
+                num_addr_bits=1,
+                word_addrs=[0, 8],
+                profiler=profiler,
+            )
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+import tracemalloc
+
+import pytest
+
+from cachesimulator.cache import Cache
+from cachesimulator.reference import ReferenceBatch, ReferenceCacheStatus
+from cachesimulator.simulator import Simulator
+
+WORD_ADDRS = [3, 180, 43, 2, 191, 88, 190, 14, 181, 44, 186, 253]
+BIT_COUNTS = dict(num_addr_bits=8, num_tag_bits=5, num_index_bits=2, num_offset_bits=1)
+
+
+def test_reference_slots():
+    """references should not carry a __dict__"""
+    ref = Simulator().get_addr_refs(word_addrs=[180], **BIT_COUNTS)[0]
+    assert not hasattr(ref, "__dict__")
+
+
+def test_batch_refs():
+    """references in a batch should match individually-created references"""
+    batch = ReferenceBatch(WORD_ADDRS, **BIT_COUNTS)
+    refs = Simulator().get_addr_refs(word_addrs=WORD_ADDRS, **BIT_COUNTS)
+    assert len(batch) == len(refs)
+    assert [str(ref) for ref in batch] == [str(ref) for ref in refs]
+    assert str(batch[-1]) == str(refs[-1])
+
+
+def test_batch_index_error():
+    """should raise IndexError for positions outside the batch"""
+    batch = ReferenceBatch(WORD_ADDRS, **BIT_COUNTS)
+    with pytest.raises(IndexError):
+        batch[len(WORD_ADDRS)]
+    with pytest.raises(IndexError):
+        batch[-len(WORD_ADDRS) - 1]
+
+
+def test_batch_cache_status():
+    """cache statuses set on a reference should be stored in the batch"""
+    batch = ReferenceBatch(WORD_ADDRS, **BIT_COUNTS)
+    assert batch[2].cache_status is None
+    batch[2].cache_status = ReferenceCacheStatus.hit
+    batch[3].cache_status = ReferenceCacheStatus.miss
+    assert batch[2].cache_status == ReferenceCacheStatus.hit
+    assert batch[3].cache_status == ReferenceCacheStatus.miss
+    batch[3].cache_status = None
+    assert batch[3].cache_status is None
+
+
+def test_batch_byte_addrs():
+    """should decode byte addresses into word addresses"""
+    batch = ReferenceBatch(
+        [addr * 4 + 3 for addr in WORD_ADDRS], num_byte_offset_bits=2, **BIT_COUNTS
+    )
+    assert [ref.word_addr for ref in batch] == WORD_ADDRS
+
+
+def test_batch_read_refs():
+    """reading a batch into a cache should match reading a list"""
+    batch = ReferenceBatch(WORD_ADDRS, **BIT_COUNTS)
+    refs = Simulator().get_addr_refs(word_addrs=WORD_ADDRS, **BIT_COUNTS)
+    batch_cache = Cache(num_sets=4, num_index_bits=2)
+    batch_cache.read_refs(3, 2, "lru", batch)
+    cache = Cache(num_sets=4, num_index_bits=2)
+    cache.read_refs(3, 2, "lru", refs)
+    assert batch_cache == cache
+    assert [ref.cache_status for ref in batch] == [ref.cache_status for ref in refs]
+
+
+def test_batch_footprint():
+    """a batch should be at least an order of magnitude smaller than a list"""
+    word_addrs = list(range(10000))
+    tracemalloc.start()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    refs = Simulator().get_addr_refs(word_addrs=word_addrs, **BIT_COUNTS)
+    refs_mem = tracemalloc.get_traced_memory()[0] - start_mem
+    start_mem = tracemalloc.get_traced_memory()[0]
+    batch = ReferenceBatch(word_addrs, **BIT_COUNTS)
+    batch_mem = tracemalloc.get_traced_memory()[0] - start_mem
+    tracemalloc.stop()
+    assert len(refs) == len(batch)
+    assert batch_mem * 10 < refs_mem
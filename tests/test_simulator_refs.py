@@ -167,4 +167,41 @@ def test_get_ref_str():
         num_index_bits=3,
         num_offset_bits=1,
     )
-    assert str(ref) == str(OrderedDict(sorted(ref.__dict__.items())))
+    assert str(ref) == str(
+        OrderedDict(
+            [
+                ("bin_addr", "10110100"),
+                ("cache_status", None),
+                ("index", "010"),
+                ("offset", "0"),
+                ("tag", "1011"),
+                ("word_addr", 180),
+            ]
+        )
+    )
+
+
+def test_read_refs_hit_runs():
+    """read_refs should match reading refs one at a time for runs of hits"""
+    word_addrs = [0, 1, 1, 0, 8, 9, 8, 2, 3, 3, 3, 16, 17, 0, 0, 1, 24, 25]
+    for replacement_policy in ("lru", "mru"):
+        sim = Simulator()
+        args = dict(
+            word_addrs=word_addrs,
+            num_addr_bits=5,
+            num_tag_bits=3,
+            num_index_bits=1,
+            num_offset_bits=1,
+        )
+        refs = sim.get_addr_refs(**args)
+        cache = Cache(num_sets=2, num_index_bits=1)
+        cache.read_refs(2, 2, replacement_policy, refs)
+        expected_refs = sim.get_addr_refs(**args)
+        expected_cache = Cache(num_sets=2, num_index_bits=1)
+        for ref in expected_refs:
+            expected_cache.read_ref(2, 2, replacement_policy, ref)
+        assert cache == expected_cache
+        assert cache.recently_used_addrs == expected_cache.recently_used_addrs
+        assert [ref.cache_status for ref in refs] == [
+            ref.cache_status for ref in expected_refs
+        ]
@@ -88,3 +88,61 @@ def test_no_replacement():
     )
     assert cache is not original_cache
     assert cache == original_cache
+
+
+def test_tag_index_updated():
+    """set_block should keep the tag index of the set up to date"""
+    cache, recently_used_addrs, new_entry = reset_state()
+    cache.recently_used_addrs = recently_used_addrs
+    assert cache.is_hit("010", "1101")
+    cache.set_block(
+        replacement_policy="lru",
+        num_blocks_per_set=4,
+        addr_index="010",
+        new_entry=new_entry,
+    )
+    assert cache.is_hit("010", "1111")
+    assert not cache.is_hit("010", "1101")
+    assert cache.get_tag_ways("010", cache["010"]) == {
+        "1000": 0,
+        "1100": 1,
+        "1111": 2,
+        "1110": 3,
+    }
+
+
+def test_tag_index_rebuilt():
+    """the tag index should be rebuilt if a set is changed directly"""
+    cache, _, _ = reset_state()
+    assert cache.is_hit("010", "1000")
+    cache["010"][:] = [{"tag": "0001"}]
+    assert not cache.is_hit("010", "1000")
+    assert cache.is_hit("010", "0001")
+
+
+def test_tag_index_block_replaced_in_place():
+    """the tag index should not be trusted once a block is replaced in place"""
+    cache = Cache({"0": [{"tag": "01"}, {"tag": "10"}]})
+    assert cache.is_hit(None, "01")
+    cache["0"][0] = {"tag": "11"}
+    assert not cache.is_hit(None, "01")
+    assert cache.is_hit(None, "11")
+    assert cache.is_hit(None, "10")
+    assert cache.get_tag_ways("0", cache["0"]) == {"11": 0, "10": 1}
+
+
+def test_tag_index_replace_block_in_place():
+    """replacing a block should not use a tag index which is out of date"""
+    cache = Cache({"0": [{"tag": "01"}, {"tag": "10"}]})
+    cache.recently_used_addrs = [(None, "11"), (None, "10")]
+    assert cache.is_hit(None, "10")
+    cache["0"][0] = {"tag": "11"}
+    cache.set_block(
+        replacement_policy="lru",
+        num_blocks_per_set=2,
+        addr_index=None,
+        new_entry={"tag": "00"},
+    )
+    assert cache["0"] == [{"tag": "00"}, {"tag": "10"}]
+    assert cache.is_hit(None, "00")
+    assert not cache.is_hit(None, "11")
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.simulator import Simulator
+from cachesimulator.snapshot import (
+    CacheSnapshot,
+    diff_snapshots,
+    get_snapshot_sets,
+    replay_snapshots,
+    take_snapshots,
+)
+from cachesimulator.stats import SimulationStats
+
+GEOMETRY_ARGS = dict(cache_size=16, num_blocks_per_set=2, num_words_per_block=2)
+
+
+def get_random_trace(num_refs, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(64) for _ in range(num_refs)]
+
+
+# Retrieves the full contents of the given cache in the form used by snapshots
+def get_cache_sets(cache):
+    return {
+        int(index, 2): tuple(block["data"][0] for block in blocks)
+        for index, blocks in cache.items()
+        if blocks
+    }
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru"))
+def test_take_snapshots(replacement_policy):
+    """snapshots should replay to the contents of the cache at each point"""
+    word_addrs = get_random_trace(230)
+    geometry = CacheGeometry(**GEOMETRY_ARGS)
+    snapshots = list(
+        take_snapshots(word_addrs, geometry, replacement_policy, range(50, 1000, 50))
+    )
+    assert [snapshot.num_refs for snapshot in snapshots] == [50, 100, 150, 200, 230]
+    for snapshot, cache_sets in replay_snapshots(snapshots):
+        refs, cache = Simulator().simulate(
+            replacement_policy=replacement_policy,
+            num_addr_bits=1,
+            word_addrs=word_addrs[: snapshot.num_refs],
+            **GEOMETRY_ARGS,
+        )
+        assert cache_sets == get_cache_sets(cache)
+        assert snapshot.num_hits == SimulationStats.from_refs(refs).num_hits
+
+
+def test_snapshots_store_changed_sets():
+    """each snapshot should store only the sets which changed"""
+    geometry = CacheGeometry(**GEOMETRY_ARGS)
+    # The first 4 references fill sets 0 and 1; the remaining references are
+    # all hits except for the last, which misses in set 2
+    word_addrs = [0, 2, 8, 10, 0, 2, 8, 10, 4]
+    snapshots = list(take_snapshots(word_addrs, geometry, "lru", [4, 8]))
+    assert [snapshot.changed_sets for snapshot in snapshots] == [
+        {0: (0, 8), 1: (2, 10)},
+        {},
+        {2: (4,)},
+    ]
+
+
+def test_take_snapshots_exact_end():
+    """should not take an extra snapshot if the trace ends at a snapshot"""
+    geometry = CacheGeometry(**GEOMETRY_ARGS)
+    snapshots = list(take_snapshots(range(10), geometry, "lru", [0, 5, 10, 15]))
+    assert [snapshot.num_refs for snapshot in snapshots] == [5, 10]
+
+
+def test_snapshot_serialization():
+    """snapshots should be restored from their serialized form"""
+    snapshot = CacheSnapshot(num_refs=8, num_hits=3, changed_sets={2: (4, 12)})
+    restored = CacheSnapshot.from_dict(json.loads(json.dumps(snapshot.to_dict())))
+    assert vars(restored) == vars(snapshot)
+
+
+def test_diff_snapshots():
+    """should report the blocks removed from and added to each changed set"""
+    snapshots = [
+        CacheSnapshot(4, 0, {0: (0, 8), 1: (2, 10)}),
+        CacheSnapshot(8, 2, {0: (16, 8)}),
+        CacheSnapshot(9, 2, {2: (4,)}),
+    ]
+    old_sets = get_snapshot_sets(snapshots, 4)
+    new_sets = get_snapshot_sets(snapshots, 9)
+    assert diff_snapshots(old_sets, new_sets) == {0: ((0,), (16,)), 2: ((), (4,))}
+    assert diff_snapshots(new_sets, new_sets) == {}
+    with pytest.raises(ValueError):
+        get_snapshot_sets(snapshots, 5)
+
+
+def test_main_snapshot(tmp_path):
+    """should record snapshots to a file and diff two of them"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("0\n2\n8\n10\n0\n16\n")
+    snapshots_path = tmp_path / "snapshots.jsonl"
+    record_args = ["--cache-size", "16", "--num-blocks-per-set", "2"]
+    record_args += ["--num-words-per-block", "2", "--every", "4"]
+    with patch(
+        "sys.argv",
+        [main.__file__, "snapshot", "record", str(trace_path), *record_args]
+        + ["--output", str(snapshots_path)],
+    ):
+        main.main()
+    snapshot_dicts = [json.loads(line) for line in snapshots_path.open()]
+    assert [snapshot["num_refs"] for snapshot in snapshot_dicts] == [4, 6]
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [main.__file__, "snapshot", "diff", str(snapshots_path), "4", "6"],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert out.getvalue() == "set 0: -8 +16\n"
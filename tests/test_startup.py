@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import subprocess
+import sys
+
+import pytest
+
+# Modules which should not be imported merely to start the program (e.g. to
+# run --help), since they are slow to import and only needed by the
+# simulation itself or by particular subcommands
+LAZY_MODULES = (
+    "asyncio",
+    "concurrent.futures",
+    "cProfile",
+    "multiprocessing",
+    "json",
+    "tracemalloc",
+    "cachesimulator.simulator",
+    "cachesimulator.service",
+    "cachesimulator.batch",
+)
+# Runs the program with the arguments given on the command line, then writes
+# the names of all modules it imported to stderr (one per line)
+LIST_MODULES_SCRIPT = """
+import sys
+import cachesimulator.__main__ as main
+try:
+    main.main()
+except SystemExit:
+    pass
+sys.stderr.write("\\n".join(sys.modules))
+"""
+
+
+# Runs the program with the given arguments, returning the names of all
+# modules which were imported by the time it finished
+def get_imported_modules(*args):
+    result = subprocess.run(
+        [sys.executable, "-c", LIST_MODULES_SCRIPT, *args],
+        capture_output=True,
+        text=True,
+    )
+    assert result.returncode == 0
+    return set(result.stderr.splitlines())
+
+
+@pytest.mark.parametrize("args", (("--help",), ("generate", "--help")))
+def test_help_lazy_imports(args):
+    """--help should not import the simulator or any heavy modules"""
+    imported_modules = get_imported_modules(*args)
+    assert "cachesimulator.__main__" in imported_modules
+    for module_name in LAZY_MODULES:
+        assert module_name not in imported_modules
+
+
+def test_subcommand_lazy_imports():
+    """a subcommand should not import the simulator or other subcommands"""
+    imported_modules = get_imported_modules("generate", "sequential", "--num-refs", "1")
+    assert "cachesimulator.tracegen" in imported_modules
+    for module_name in LAZY_MODULES:
+        assert module_name not in imported_modules
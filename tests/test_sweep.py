@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+from multiprocessing.shared_memory import SharedMemory
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.batch import JOB_PARAMS, simulate_job
+from cachesimulator.sweep import get_configs, run_config, run_configs, share_trace
+
+
+def get_random_trace(num_refs, seed=0):
+    rng = random.Random(seed)
+    return [rng.randrange(512) for _ in range(num_refs)]
+
+
+def get_expected_stats(word_addrs, config):
+    return simulate_job(word_addrs, dict(JOB_PARAMS, num_addr_bits=1, **config))
+
+
+def test_get_configs():
+    """should combine every given cache parameter"""
+    configs = get_configs([8, 16], [1, 2], [1], ["lru", "mru"])
+    assert len(configs) == 8
+    assert configs[-1] == {
+        "cache_size": 16,
+        "num_blocks_per_set": 2,
+        "num_words_per_block": 1,
+        "replacement_policy": "mru",
+        "word_size": 4,
+        "addr_unit": "word",
+    }
+
+
+def test_run_config():
+    """should simulate a configuration from a trace in shared memory"""
+    word_addrs = get_random_trace(200000)
+    (config,) = get_configs([64], [4], [2], ["mru"])
+    shared_trace, num_addrs = share_trace(word_addrs)
+    try:
+        stats = run_config(shared_trace.name, num_addrs, config)
+    finally:
+        shared_trace.close()
+        shared_trace.unlink()
+    assert stats == get_expected_stats(word_addrs, config)
+
+
+def test_run_configs():
+    """should simulate every configuration and then free the shared trace"""
+    word_addrs = get_random_trace(2000)
+    configs = get_configs([64, 256], [1, 4], [1, 2], ["lru", "mru"])
+    configs.append(dict(configs[0], num_blocks_per_set=128))
+    shared_memory_names = []
+    original_share_trace = share_trace
+
+    def record_share_trace(word_addrs):
+        shared_trace, num_addrs = original_share_trace(word_addrs)
+        shared_memory_names.append(shared_trace.name)
+        return shared_trace, num_addrs
+
+    with patch("cachesimulator.sweep.share_trace", record_share_trace):
+        results = sorted(
+            run_configs(iter(word_addrs), configs, num_workers=2),
+            key=lambda result: result["config"],
+        )
+    assert len(results) == len(configs)
+    for result, config in zip(results[:-1], configs):
+        assert result["stats"] == get_expected_stats(word_addrs, config)
+    assert results[-1]["error"].startswith("ValueError")
+    with pytest.raises(FileNotFoundError):
+        SharedMemory(name=shared_memory_names[0])
+
+
+def test_run_configs_empty_trace():
+    """should simulate an empty trace"""
+    (result,) = run_configs([], get_configs([8], [1], [1], ["lru"]), num_workers=1)
+    assert result["stats"]["num_refs"] == 0
+
+
+def test_main_sweep(tmp_path):
+    """should display and write the result of every configuration"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("\n".join(map(str, get_random_trace(100))))
+    results_path = tmp_path / "results.jsonl"
+    args = [str(trace_path), "--cache-size", "16", "32"]
+    args += ["--replacement-policy", "LRU", "mru", "--num-workers", "2"]
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [main.__file__, "sweep", *args, "--output", str(results_path)],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    results = [json.loads(line) for line in results_path.read_text().splitlines()]
+    assert [result["config"] for result in results] == [0, 1, 2, 3]
+    assert "Sweep" in out.getvalue()
+    assert out.getvalue().count("MRU") == 2
@@ -1,6 +1,15 @@
 #!/usr/bin/env python3
 
-from cachesimulator.table import Table
+import os
+from unittest.mock import patch
+
+from cachesimulator.table import (
+    DEFAULT_TABLE_WIDTH,
+    Table,
+    format_count,
+    format_rate,
+    get_table_width,
+)
 
 
 def test_init_default():
@@ -76,3 +85,28 @@ def test_str_align_center():
 def test_str_align_right():
     """should correctly display table when right-aligned"""
     _assert_table_alignment(alignment="right", just=str.rjust)
+
+
+def test_create_stats_table():
+    """should create a right-aligned table with the given title and header"""
+    table = Table.create_stats_table("Stats", ("Statistic", "Value"), 40)
+    assert table.title == "Stats"
+    assert table.header == ["Statistic", "Value"]
+    assert table.num_cols == 2
+    assert table.width == 40
+    assert table.alignment == "right"
+
+
+def test_format_count_and_rate():
+    """should format counts with separators and rates as percentages"""
+    assert format_count(1234567) == "1,234,567"
+    assert format_rate(0.25) == "25.00%"
+
+
+def test_get_table_width():
+    """should fit tables to the terminal, falling back to the default width"""
+    with patch("shutil.get_terminal_size", return_value=os.terminal_size((120, 40))):
+        assert get_table_width() == 120
+    with patch.dict(os.environ, {"COLUMNS": "0"}):
+        with patch("os.get_terminal_size", side_effect=OSError):
+            assert get_table_width() == DEFAULT_TABLE_WIDTH
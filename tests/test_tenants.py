@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+import re
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.kernel import CacheKernel
+from cachesimulator.tenants import (
+    PartitionedCache,
+    interleave_proportional,
+    interleave_round_robin,
+    interleave_timestamped,
+    read_timestamped_trace,
+)
+
+
+def get_cache(way_masks, num_blocks_per_set=4, num_sets=1, replacement_policy="lru"):
+    return PartitionedCache(
+        CacheGeometry(num_sets * num_blocks_per_set, num_blocks_per_set, 1),
+        way_masks,
+        replacement_policy=replacement_policy,
+    )
+
+
+def test_interleave_round_robin():
+    """should take one reference from each trace in turn"""
+    assert list(interleave_round_robin([[1, 2, 3], [4], [], [5, 6]])) == [
+        (0, 1),
+        (1, 4),
+        (3, 5),
+        (0, 2),
+        (3, 6),
+        (0, 3),
+    ]
+
+
+def test_interleave_proportional():
+    """should issue references in proportion to the weight of each trace"""
+    tenant_refs = list(interleave_proportional([range(100), range(100, 110)], [3, 1]))
+    assert [tenant for tenant, _ in tenant_refs[:8]] == [0, 1, 0, 0, 0, 1, 0, 0]
+    assert [addr for tenant, addr in tenant_refs if tenant == 1] == list(
+        range(100, 110)
+    )
+    assert len(tenant_refs) == 110
+
+
+def test_interleave_lazily():
+    """should never read further into a trace than needed"""
+    tenant_refs = interleave_round_robin([iter(int, 1), iter(int, 1)])
+    assert next(tenant_refs) == (0, 0)
+    tenant_refs = interleave_proportional([iter(int, 1)], [1])
+    assert next(tenant_refs) == (0, 0)
+
+
+def test_interleave_timestamped():
+    """should merge timestamped traces in order of time"""
+    assert list(
+        interleave_timestamped([[(0, 10), (5, 11)], [(0, 20), (3, 21), (9, 22)]])
+    ) == [(0, 10), (1, 20), (1, 21), (0, 11), (1, 22)]
+
+
+def test_read_timestamped_trace(tmp_path):
+    """should read the time and address of each reference"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("# time addr\n5 0x10\n\n5 3  # same time\n")
+    assert list(read_timestamped_trace(trace_path)) == [(5, 16), (5, 3)]
+
+
+@pytest.mark.parametrize("line", ("7", "7 1 2", "3 1"))
+def test_read_timestamped_trace_invalid(tmp_path, line):
+    """should reject malformed or out-of-order references"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("5 1\n" + line + "\n")
+    with pytest.raises(ValueError, match="line 2"):
+        list(read_timestamped_trace(trace_path))
+
+
+@pytest.mark.parametrize("replacement_policy", ("lru", "mru"))
+def test_single_tenant(replacement_policy):
+    """a single tenant with every way should match an unshared cache"""
+    rng = random.Random(0)
+    word_addrs = [rng.randrange(64) for _ in range(2000)]
+    cache = get_cache([0b1111], num_sets=4, replacement_policy=replacement_policy)
+    (stats,) = cache.read_refs((0, addr) for addr in word_addrs)
+    kernel = CacheKernel(2, 0, 4, evict_mru=replacement_policy == "mru")
+    statuses = bytearray(len(word_addrs))
+    assert stats.num_hits == kernel.read_addrs(word_addrs, 0, statuses)
+    assert stats.num_blocks == 16
+
+
+def test_way_partitioning():
+    """should only replace blocks in the ways of the missing tenant"""
+    cache = get_cache([0b0011, 0b1100])
+    # The second tenant streams through many blocks, but can only replace its
+    # own, so the first tenant's two blocks always hit
+    tenant_refs = [(0, 1), (0, 2)] + [(1, addr) for addr in range(100)]
+    tenant_refs += [(0, 1), (0, 2)]
+    stats = cache.read_refs(tenant_refs)
+    assert (stats[0].num_hits, stats[0].num_misses) == (2, 2)
+    assert stats[0].num_evicted_by_others == 0
+    assert (stats[0].num_blocks, stats[1].num_blocks) == (2, 2)
+
+
+def test_shared_interference():
+    """should count the blocks of a tenant replaced by another's"""
+    cache = get_cache([0b1111, 0b1111])
+    stats = cache.read_refs(
+        [(0, 1), (0, 2)] + [(1, addr) for addr in range(4)] + [(0, 1)]
+    )
+    assert stats[0].num_evicted_by_others == 2
+    assert stats[0].num_misses == 3
+    # Both tenants address the same block 1, but never share it
+    assert stats[1].num_evicted_by_others == 1
+
+
+def test_occupancy():
+    """should track the average and peak number of blocks of each tenant"""
+    cache = get_cache([0b0001, 0b1110])
+    stats = cache.read_refs([(0, 1), (1, 1), (1, 2), (0, 2)])
+    # The first tenant holds one block (in its only way) from its first
+    # reference on, and the second holds one block from its first reference
+    # and two from its second
+    assert stats[0].get_avg_num_blocks(cache.time) == 4 / 4
+    assert stats[1].get_avg_num_blocks(cache.time) == (1 + 2 + 2) / 4
+    assert stats[0].peak_num_blocks == 1
+    assert stats[1].peak_num_blocks == 2
+
+
+def test_invalid_way_mask():
+    """should reject way masks which select no ways or too many"""
+    with pytest.raises(ValueError):
+        get_cache([0])
+    with pytest.raises(ValueError):
+        get_cache([0b10000])
+
+
+def test_main_tenants(tmp_path):
+    """should display and write the statistics of every tenant"""
+    first_trace_path = tmp_path / "first.txt"
+    first_trace_path.write_text("1\n2\n1\n2\n")
+    second_trace_path = tmp_path / "second.txt"
+    second_trace_path.write_text("\n".join(map(str, range(20))))
+    output_path = tmp_path / "stats.json"
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "tenants",
+                str(first_trace_path),
+                str(second_trace_path),
+                "--cache-size",
+                "4",
+                "--num-blocks-per-set",
+                "4",
+                "--way-mask",
+                "0x3",
+                "--way-mask",
+                "0xc",
+                "--interleave",
+                "proportional",
+                "--weight",
+                "1",
+                "--weight",
+                "2",
+                "--output",
+                str(output_path),
+            ],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert re.search(r"\bfirst\.txt\s+4\s+2\s+2\b", out.getvalue())
+    stats = json.loads(output_path.read_text())
+    assert [tenant_stats["num_hits"] for tenant_stats in stats] == [2, 0]
+    assert stats[1]["trace_file"] == str(second_trace_path)
+
+
+@pytest.mark.parametrize(
+    "extra_args",
+    (
+        ["--interleave", "proportional"],
+        ["--weight", "1", "--weight", "1"],
+        ["--way-mask", "0x1"],
+        ["--way-mask", "0x1", "--way-mask", "0x10"],
+    ),
+)
+def test_main_tenants_invalid(extra_args):
+    """should reject weights or way masks which do not fit the tenants"""
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "tenants",
+                "a.txt",
+                "b.txt",
+                "--cache-size",
+                "4",
+                "--num-blocks-per-set",
+                "4",
+                *extra_args,
+            ],
+        ),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
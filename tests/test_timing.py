@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+import re
+from array import array
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.kernel import STATUS_HIT, STATUS_MISS, CacheKernel
+from cachesimulator.simulator import Simulator
+from cachesimulator.timing import TimingModel, read_timed_addrs
+
+
+def get_model(num_mshrs=8, transfer_cycles=0):
+    return TimingModel(
+        hit_latency=1,
+        miss_penalty=10,
+        num_mshrs=num_mshrs,
+        transfer_cycles=transfer_cycles,
+    )
+
+
+def test_overlapped_misses():
+    """should overlap misses to distinct blocks while MSHRs are free"""
+    stats = get_model().read_addrs([0, 1, 2, 3], 0, bytes(4))
+    # Each miss issues a cycle after the last and takes 11 cycles
+    assert stats.num_cycles == 14
+    assert stats.get_amat() == 11
+    assert stats.num_memory_requests == 4
+    assert stats.peak_mshr_occupancy == 4
+    assert stats.get_avg_mshr_occupancy() == pytest.approx(44 / 14)
+
+
+def test_hits():
+    """should take the hit latency for each hit"""
+    stats = get_model().read_addrs([0, 1], 0, bytes([STATUS_HIT, STATUS_HIT]))
+    assert stats.num_cycles == 2
+    assert stats.get_amat() == 1
+    assert stats.get_avg_mshr_occupancy() == 0
+
+
+def test_merged_misses():
+    """should merge references to a block which is still being fetched"""
+    statuses = bytes([STATUS_MISS, STATUS_HIT, STATUS_MISS])
+    stats = get_model().read_addrs([0, 1, 0], 1, statuses)
+    assert stats.num_merged_misses == 2
+    assert stats.num_memory_requests == 1
+    # Every reference waits for the block fetched by the first
+    assert stats.total_latency == 11 + 10 + 9
+    assert stats.num_cycles == 11
+
+
+def test_mshr_stall():
+    """should stall issue until an MSHR is freed"""
+    stats = get_model(num_mshrs=1).read_addrs([0, 1], 0, bytes(2))
+    assert stats.num_mshr_stall_cycles == 10
+    assert stats.num_cycles == 22
+    assert stats.total_latency == 11 + 21
+    assert stats.peak_mshr_occupancy == 1
+
+
+def test_memory_bandwidth():
+    """should serialize fetches which contend for the memory bus"""
+    stats = get_model(transfer_cycles=5).read_addrs([0, 1, 2], 0, bytes(3))
+    # The fetches are requested at cycles 1, 6 and 11
+    assert stats.num_cycles == 21
+    assert stats.total_latency == 11 + 15 + 19
+
+
+def test_read_refs():
+    """should time references read by the simulator as the kernel does"""
+    rng = random.Random(0)
+    word_addrs = [rng.randrange(256) for _ in range(2000)]
+    geometry = CacheGeometry(32, 4, 2, max_word_addr=max(word_addrs))
+    refs, _ = Simulator().simulate(
+        num_blocks_per_set=4,
+        num_words_per_block=2,
+        cache_size=32,
+        replacement_policy="lru",
+        num_addr_bits=geometry.num_addr_bits,
+        word_addrs=word_addrs,
+    )
+    ref_stats = get_model(num_mshrs=2, transfer_cycles=3).read_refs(refs, 1)
+    model = get_model(num_mshrs=2, transfer_cycles=3)
+    kernel = CacheKernel(geometry.num_index_bits, 1, 4, evict_mru=False)
+    cache_stats = read_timed_addrs(kernel, model, array("Q", word_addrs), geometry)
+    assert model.stats.to_dict() == ref_stats.to_dict()
+    assert cache_stats.num_misses == sum(
+        ref.cache_status.value == STATUS_MISS for ref in refs
+    )
+
+
+def test_main_timing(tmp_path):
+    """should display and write the timing statistics of a trace"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("0\n1\n2\n3\n0\n")
+    output_path = tmp_path / "stats.json"
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "timing",
+                str(trace_path),
+                "--cache-size",
+                "8",
+                "--miss-penalty",
+                "10",
+                "--memory-bandwidth",
+                "0.8",
+                "--output",
+                str(output_path),
+            ],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert re.search(r"\bMerged Misses\s+1\b", out.getvalue())
+    stats = json.loads(output_path.read_text())
+    assert stats["cache"]["num_hits"] == 1
+    # Each four-byte block takes five cycles to transfer, and the last
+    # reference waits for the first block to be fetched
+    assert stats["timing"]["num_cycles"] == 26
+
+
+def test_main_timing_invalid_mshrs():
+    """should reject a timing model without MSHRs"""
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "timing",
+                "trace.txt",
+                "--cache-size",
+                "8",
+                "--num-mshrs",
+                "0",
+            ],
+        ),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import json
+import random
+import re
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+import cachesimulator.tlb as tlb
+from cachesimulator.geometry import CacheGeometry
+from cachesimulator.tlb import PAGE_TABLE_BASE, PAGE_TABLE_LEVEL_SPAN, TlbLevel
+
+# Word addresses on pages 0, 0, 1, 0, 2, and 3 (with four words per page)
+WORD_ADDRS = [0, 1, 4, 0, 8, 12]
+
+
+def get_simulator(
+    tlb_levels, num_page_walk_levels=0, num_byte_offset_bits=0, num_blocks_per_set=2
+):
+    return tlb.TlbSimulator(
+        CacheGeometry(
+            16 * num_blocks_per_set,
+            num_blocks_per_set,
+            2,
+            num_byte_offset_bits=num_byte_offset_bits,
+        ),
+        tlb_levels,
+        page_size=16,
+        word_size=4,
+        num_page_walk_levels=num_page_walk_levels,
+    )
+
+
+def test_parse_tlb_level():
+    """should parse the number of entries and entries per set of a TLB level"""
+    tlb_level = TlbLevel.parse("64:4")
+    assert (tlb_level.num_entries, tlb_level.num_entries_per_set) == (64, 4)
+    assert tlb_level.num_index_bits == 4
+    assert TlbLevel.parse("32").num_index_bits == 0
+
+
+@pytest.mark.parametrize("level_str", ("64:3", "48:4", "64:0"))
+def test_parse_tlb_level_invalid(level_str):
+    """should reject TLB levels which cannot be divided into sets"""
+    with pytest.raises(ValueError):
+        TlbLevel.parse(level_str)
+
+
+def test_tlb_levels():
+    """should only access each TLB level on a miss in the level before it"""
+    stats = get_simulator([TlbLevel(2, 2), TlbLevel(4, 4)]).read_addrs(WORD_ADDRS)
+    assert [
+        (level_stats.num_hits, level_stats.num_misses)
+        for level_stats in stats.tlb_stats
+    ] == [(2, 4), (0, 4)]
+    assert stats.num_page_walks == 4
+    assert stats.cache_stats.get_num_accesses() == len(WORD_ADDRS)
+    assert stats.page_walk_cache_stats.get_num_accesses() == 0
+
+
+def test_page_walk_addrs():
+    """should find the page table entry read at each level of a page walk"""
+    simulator = get_simulator([TlbLevel(2, 2)], num_page_walk_levels=2)
+    # Page 0x345 with four words per page and four bytes per word
+    assert simulator.get_page_walk_addrs(0x345 * 4 + 3) == [
+        (PAGE_TABLE_BASE + 0x1 * 8) // 4,
+        (PAGE_TABLE_BASE + PAGE_TABLE_LEVEL_SPAN + 0x345 * 8) // 4,
+    ]
+    byte_simulator = get_simulator(
+        [TlbLevel(2, 2)], num_page_walk_levels=2, num_byte_offset_bits=2
+    )
+    assert byte_simulator.get_page_walk_addrs(0x345 * 16 + 15) == [
+        PAGE_TABLE_BASE + 0x1 * 8,
+        PAGE_TABLE_BASE + PAGE_TABLE_LEVEL_SPAN + 0x345 * 8,
+    ]
+
+
+def test_inject_page_walks():
+    """should read the references of each page walk into the cache"""
+    # A cache large enough that nothing is replaced
+    simulator = get_simulator(
+        [TlbLevel(2, 2)], num_page_walk_levels=3, num_blocks_per_set=8
+    )
+    stats = simulator.read_addrs(WORD_ADDRS)
+    assert stats.num_page_walks == 4
+    # Every walk reads the same entries from the first two levels, but a
+    # different entry from the last
+    assert stats.page_walk_cache_stats.num_hits == 6
+    assert stats.page_walk_cache_stats.num_misses == 6
+    # Pages 0 to 3 are words 0 to 15, which are read in blocks of two words
+    assert stats.cache_stats.num_hits == 2
+    assert stats.cache_stats.num_misses == 4
+
+
+def test_read_addrs_chunks():
+    """should simulate a trace in chunks as if it were read all at once"""
+    rng = random.Random(0)
+    word_addrs = [rng.randrange(1 << 12) for _ in range(2000)]
+    tlb_levels = [TlbLevel(4, 2), TlbLevel(16, 4)]
+    stats = get_simulator(tlb_levels, num_page_walk_levels=2).read_addrs(word_addrs)
+    with patch.object(tlb, "READ_CHUNK_SIZE", 150):
+        chunk_stats = get_simulator(tlb_levels, num_page_walk_levels=2).read_addrs(
+            word_addrs
+        )
+    assert chunk_stats.to_dict() == stats.to_dict()
+
+
+def test_main_tlb(tmp_path):
+    """should display and write translation and cache statistics"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("\n".join(map(str, WORD_ADDRS)))
+    output_path = tmp_path / "stats.json"
+    out = io.StringIO()
+    with (
+        patch(
+            "sys.argv",
+            [
+                main.__file__,
+                "tlb",
+                str(trace_path),
+                "--cache-size",
+                "16",
+                "--page-size",
+                "16",
+                "--tlb",
+                "2:2",
+                "--tlb",
+                "4",
+                "--inject-page-walks",
+                "--output",
+                str(output_path),
+            ],
+        ),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    assert re.search(r"\bL1 TLB \(2:2\)\s+6\s+2\s+4\b", out.getvalue())
+    assert re.search(r"\bPage Walks\s+4\b", out.getvalue())
+    stats = json.loads(output_path.read_text())
+    assert stats["num_page_walks"] == 4
+    assert stats["page_walk_cache"]["num_accesses"] == 16
+
+
+def test_main_tlb_invalid_level():
+    """should reject invalid TLB levels"""
+    with (
+        patch(
+            "sys.argv",
+            [main.__file__, "tlb", "trace.txt", "--cache-size", "8", "--tlb", "6:4"],
+        ),
+        contextlib.redirect_stderr(io.StringIO()),
+        pytest.raises(SystemExit),
+    ):
+        main.main()
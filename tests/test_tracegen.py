@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import contextlib
+import io
+import itertools
+import re
+from collections import Counter
+from unittest.mock import patch
+
+import pytest
+
+import cachesimulator.__main__ as main
+from cachesimulator import tracegen
+from cachesimulator.simulator import Simulator
+from cachesimulator.trace import read_trace, write_trace
+
+
+def run_main(*args):
+    out = io.StringIO()
+    with (
+        patch("sys.argv", [main.__file__, *args]),
+        contextlib.redirect_stdout(out),
+    ):
+        main.main()
+    return out.getvalue()
+
+
+def test_read_trace(tmp_path):
+    """should read base-10 and hex addresses, ignoring comments"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("# header\n3 180\n0x2b  # hex\n\n2\n")
+    assert list(read_trace(trace_path)) == [3, 180, 43, 2]
+
+
+@pytest.mark.parametrize("addr", ("-1", str(2**64), "0x10000000000000000"))
+def test_read_trace_out_of_range(tmp_path, addr):
+    """should reject addresses which are negative or wider than 64 bits"""
+    trace_path = tmp_path / "trace.txt"
+    trace_path.write_text("3\n{}\n".format(addr))
+    with pytest.raises(ValueError, match=r"line 2: address out of range"):
+        list(read_trace(trace_path))
+
+
+@pytest.mark.parametrize("addr", ("-1", str(2**64)))
+def test_main_word_addrs_out_of_range(addr):
+    """should report addresses which are negative or wider than 64 bits"""
+    err = io.StringIO()
+    with pytest.raises(SystemExit), contextlib.redirect_stderr(err):
+        run_main("--cache-size", "4", "--word-addrs", "3", addr)
+    assert "address out of range" in err.getvalue()
+
+
+def test_simulate_out_of_range():
+    """should raise a ValueError for addresses wider than 64 bits"""
+    sim = Simulator()
+    refs, _ = sim.simulate(1, 1, 4, "lru", 1, [0, 2**64 - 1])
+    assert refs[1].word_addr == 2**64 - 1
+    for word_addrs in ([0, 2**64], iter([0, -1])):
+        with pytest.raises(ValueError, match="2\\*\\*64 - 1"):
+            sim.simulate(1, 1, 4, "lru", 1, word_addrs)
+
+
+def test_write_trace_roundtrip(tmp_path):
+    """should write addresses from a generator which can be read back"""
+    trace_path = tmp_path / "trace.txt"
+    with open(trace_path, "w") as trace_file:
+        write_trace(trace_file, (addr * 3 for addr in range(100000)))
+    assert list(read_trace(trace_path)) == [addr * 3 for addr in range(100000)]
+
+
+def test_generate_sequential():
+    """should generate consecutive addresses from the start address"""
+    assert list(tracegen.generate_sequential(5, start=10)) == [10, 11, 12, 13, 14]
+
+
+def test_generate_strided():
+    """should generate strided addresses, wrapping within the footprint"""
+    assert list(tracegen.generate_strided(4, stride=3)) == [0, 3, 6, 9]
+    assert list(tracegen.generate_strided(6, stride=4, num_words=12, start=1)) == [
+        1,
+        5,
+        9,
+        1,
+        5,
+        9,
+    ]
+
+
+@pytest.mark.parametrize("pattern", ("uniform", "zipfian", "pointer-chase"))
+def test_generate_random_seeded(pattern):
+    """random patterns should be reproducible for the same seed"""
+    first = list(tracegen.generate_trace(pattern, 1000, num_words=64, seed=7))
+    second = list(tracegen.generate_trace(pattern, 1000, num_words=64, seed=7))
+    third = list(tracegen.generate_trace(pattern, 1000, num_words=64, seed=8))
+    assert first == second
+    assert first != third
+    assert len(first) == 1000
+    assert all(0 <= addr < 64 for addr in first)
+
+
+def test_generate_uniform_chunks():
+    """should generate the exact number of addresses across many chunks"""
+    num_refs = tracegen.CHUNK_SIZE * 2 + 5
+    addrs = tracegen.generate_uniform(num_refs, num_words=16, seed=1, start=100)
+    assert sum(1 for addr in addrs) == num_refs
+
+
+def test_generate_zipfian_skew():
+    """the most popular zipfian address should far outnumber the least"""
+    counts = Counter(tracegen.generate_zipfian(20000, num_words=100, seed=3))
+    most_common = counts.most_common()
+    assert most_common[0][1] > 10 * most_common[-1][1]
+
+
+def test_generate_pointer_chase_cycle():
+    """should visit every node exactly once before repeating"""
+    addrs = list(tracegen.generate_pointer_chase(32, num_words=32, stride=2, seed=5))
+    assert sorted(addrs[:16]) == list(range(0, 32, 2))
+    assert addrs[16:] == addrs[:16]
+
+
+def test_generate_matmul():
+    """should reference the rows of A, columns of B, and elements of C"""
+    addrs = list(tracegen.generate_matmul(2 * 2**3 + 2**2, size=2))
+    # C[0][0] = A[0][0] * B[0][0] + A[0][1] * B[1][0]
+    assert addrs[:5] == [0, 4, 1, 6, 8]
+    # The loop nest should repeat once complete
+    assert list(tracegen.generate_matmul(21, size=2))[-1] == 0
+
+
+def test_generate_stencil():
+    """should reference a point and its neighbors before writing the result"""
+    addrs = list(tracegen.generate_stencil(6, size=3))
+    assert addrs == [1, 3, 4, 5, 7, 13]
+    with pytest.raises(ValueError):
+        tracegen.generate_stencil(6, size=2)
+
+
+def test_generate_trace_unknown_pattern():
+    """should reject unknown patterns"""
+    with pytest.raises(ValueError):
+        tracegen.generate_trace("diagonal", 10)
+
+
+def test_run_simulation_generator():
+    """should simulate addresses given directly by a generator"""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        Simulator().run_simulation(
+            num_blocks_per_set=1,
+            num_words_per_block=2,
+            cache_size=8,
+            replacement_policy="lru",
+            num_addr_bits=1,
+            word_addrs=tracegen.generate_sequential(6),
+        )
+    assert len(re.findall(r"\bHIT\b", out.getvalue())) == 3
+
+
+def test_main_generate(tmp_path):
+    """should write a generated trace which can then be simulated"""
+    trace_path = tmp_path / "trace.txt"
+    run_main(
+        "generate",
+        "zipfian",
+        "--num-refs",
+        "50",
+        "--num-words",
+        "8",
+        "--output",
+        str(trace_path),
+    )
+    assert len(list(read_trace(trace_path))) == 50
+    main_output = run_main("--cache-size", "4", "--trace-file", str(trace_path))
+    assert len(re.findall(r"\b(HIT|miss)\b", main_output)) == 50
+
+
+def test_main_generate_stdout():
+    """should write a generated trace to stdout by default"""
+    main_output = run_main("generate", "strided", "--num-refs", "3", "--stride", "2")
+    assert main_output.split() == ["0", "2", "4"]
+
+
+@pytest.mark.parametrize(
+    ("pattern", "arg", "value", "error"),
+    (
+        ("strided", "--num-refs", "-1", "--num-refs must not be negative"),
+        ("strided", "--num-words", "0", "--num-words must be positive"),
+        ("uniform", "--num-words", "-4", "--num-words must be positive"),
+        ("strided", "--stride", "0", "--stride must be positive"),
+        ("pointer-chase", "--stride", "-2", "--stride must be positive"),
+        ("matmul", "--size", "0", "--size must be positive"),
+        ("stencil", "--size", "2", "at least 3 for a stencil"),
+        ("sequential", "--start", "-1", "--start must not be negative"),
+    ),
+)
+def test_main_generate_invalid_args(pattern, arg, value, error):
+    """should reject invalid arguments to the generate subcommand"""
+    args = ["generate", pattern, "--num-refs", "10", arg, value]
+    err = io.StringIO()
+    with pytest.raises(SystemExit), contextlib.redirect_stderr(err):
+        run_main(*args)
+    assert error in err.getvalue()
+
+
+def test_main_generate_strided_footprint():
+    """strided addresses should wrap only if --num-words is given"""
+    args = ("generate", "strided", "--num-refs", "600", "--stride", "2")
+    main_output = run_main(*args)
+    assert main_output.split()[-1] == "1198"
+    main_output = run_main(*args, "--num-words", "8")
+    assert main_output.split()[:6] == ["0", "2", "4", "6", "0", "2"]
+
+
+def test_generate_trace_default_footprint():
+    """random patterns should default to a footprint of 1024 words"""
+    addrs = list(tracegen.generate_trace("uniform", 5000, seed=0))
+    assert max(addrs) < tracegen.DEFAULT_NUM_WORDS
+    addrs = list(tracegen.generate_trace("strided", 600, stride=2))
+    assert addrs[-1] == 1198
+
+
+def test_main_word_addrs_or_trace_file():
+    """should require exactly one of --word-addrs and --trace-file"""
+    with pytest.raises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+        run_main("--cache-size", "4")
+    with pytest.raises(SystemExit), contextlib.redirect_stderr(io.StringIO()):
+        run_main("--cache-size", "4", "--word-addrs", "1", "--trace-file", "t.txt")
+
+
+def test_generate_lazy():
+    """generators should not materialize all addresses up front"""
+    addrs = tracegen.generate_trace("uniform", 10**12, num_words=8, seed=0)
+    assert len(list(itertools.islice(addrs, 10))) == 10